@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import mark_safe
+from task_manager.pagination import EstimatedCountPaginator
+from tasks.counters import owner_task_counts, task_count
+from tasks.shards import is_sharded
 from .models import User
+from .search import search_users
 
 
 class UserAdmin(admin.ModelAdmin):
@@ -13,6 +17,7 @@ class UserAdmin(admin.ModelAdmin):
         'is_staff',
         'is_active',
         'date_joined',
+        'task_count',
     )
 
     list_filter = (
@@ -33,5 +38,39 @@ class UserAdmin(admin.ModelAdmin):
 
     ordering = ('-date_joined',)
 
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if is_sharded():
+            # The counters are in each owner's shard: see get_changelist_instance.
+            return queryset
+        return queryset.annotate(task_count=task_count(queryset.db))
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        if is_sharded():
+            counts = owner_task_counts(changelist.result_list)
+            for user in changelist.result_list:
+                user.task_count = counts[user.pk]
+        return changelist
+
+    def get_sortable_by(self, request):
+        sortable_by = super().get_sortable_by(request)
+        if is_sharded():
+            return [name for name in sortable_by if name != 'task_count']
+        return sortable_by
+
+    @admin.display(description=_("tasks"), ordering='task_count')
+    def task_count(self, obj):
+        return obj.task_count
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        # The change list applies its own ordering: skip the relevance rank.
+        return search_users(queryset, search_term, ranked=False), False
+
 
 admin.site.register(User, UserAdmin)
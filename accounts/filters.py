@@ -1,13 +1,13 @@
 from django_filters import  rest_framework as filters
 from .models import User
-from django.db.models import Q, F
+from .search import search_users
 
 
 class UserFilter(filters.FilterSet):
     start_date = filters.DateTimeFilter(
-        field_name="created_at", lookup_expr="gte"
+        field_name="date_joined", lookup_expr="gte"
     )
-    end_date = filters.DateTimeFilter(field_name="created_at", lookup_expr="lte")
+    end_date = filters.DateTimeFilter(field_name="date_joined", lookup_expr="lte")
     search = filters.CharFilter(method="filter_by_search_param")
     order_by = filters.OrderingFilter(
         fields=("first_name", "last_name", "email", "date_joined"),
@@ -25,8 +25,4 @@ class UserFilter(filters.FilterSet):
         order_by = ["-updated_at"]
 
     def filter_by_search_param(self, queryset, name, value):
-        return queryset.filter(
-            Q(first_name__icontains=value)
-            | Q(last_name__icontains=value)
-            | Q(email__icontains=value)
-        )
+        return search_users(queryset, value)
@@ -0,0 +1,172 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 keeps a CPU busy for tens of milliseconds while holding the GIL, so a
+burst of logins on one worker stalls every other request it serves. Hashing
+and verification are therefore run in a bounded pool of worker processes;
+the calling thread only waits on a future, which releases the GIL.
+
+* ``make_password`` / ``check_password`` block the caller until the result
+  is ready; ``amake_password`` / ``acheck_password`` await it instead.
+* At most ``PASSWORD_HASHING_WORKERS * PASSWORD_HASHING_QUEUE`` operations
+  are in flight. Past that, callers wait up to
+  ``PASSWORD_HASHING_QUEUE_TIMEOUT`` seconds for a slot and then get
+  ``PasswordHashingBusy`` (503 with ``Retry-After``) rather than piling up.
+* ``PASSWORD_HASHING_WORKERS = 0`` hashes inline, like Django does.
+
+Workers are started with ``spawn`` so they never inherit locks from a
+multi-threaded server process; each one sets Django up once.
+"""
+import asyncio
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Too many password operations in progress, retry shortly.")
+    default_code = "password_hashing_busy"
+    wait = 1
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
+
+
+def _make_password(password):
+    return hashers.make_password(password)
+
+
+def _make_passwords(passwords):
+    return [hashers.make_password(password) for password in passwords]
+
+
+def _check_password(password, encoded):
+    """``(is_correct, must_update)`` for ``password`` against ``encoded``."""
+    outdated = []
+    correct = hashers.check_password(password, encoded, setter=outdated.append)
+    return correct, bool(outdated)
+
+
+class HashingPool:
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        return settings.PASSWORD_HASHING_WORKERS
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_setup_worker,
+                )
+                self._slots = threading.BoundedSemaphore(self.workers * settings.PASSWORD_HASHING_QUEUE)
+            return self._executor
+
+    def _submit(self, function, *args):
+        executor = self._get_executor()
+        slots = self._slots
+        try:
+            future = executor.submit(function, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OOM killer): start a new pool.
+            self.shutdown()
+            executor = self._get_executor()
+            slots = self._slots
+            future = executor.submit(function, *args)
+        future.add_done_callback(lambda _future: slots.release())
+        return future
+
+    def submit(self, function, *args):
+        """Run ``function(*args)`` in the pool; blocks while the pool is saturated."""
+        self._get_executor()
+        if not self._slots.acquire(timeout=settings.PASSWORD_HASHING_QUEUE_TIMEOUT):
+            raise PasswordHashingBusy()
+        return self._submit(function, *args)
+
+    async def asubmit(self, function, *args):
+        self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            acquired = await asyncio.get_running_loop().run_in_executor(
+                None, self._slots.acquire, True, settings.PASSWORD_HASHING_QUEUE_TIMEOUT
+            )
+            if not acquired:
+                raise PasswordHashingBusy()
+        return asyncio.wrap_future(self._submit(function, *args))
+
+    def run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        return self.submit(function, *args).result()
+
+    async def arun(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        return await (await self.asubmit(function, *args))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+pool = HashingPool()
+
+
+def make_password(password):
+    return pool.run(_make_password, password)
+
+
+async def amake_password(password):
+    return await pool.arun(_make_password, password)
+
+
+def make_passwords(passwords, chunk_size=16):
+    """
+    Hash ``passwords`` across the pool, in order.
+
+    Passwords are sent in chunks, with at most one chunk per worker in
+    flight, so a bulk job keeps every worker busy while leaving queue slots
+    to interactive logins.
+    """
+    if not pool.workers:
+        return _make_passwords(passwords)
+    pending, hashed = deque(), []
+    for start in range(0, len(passwords), chunk_size):
+        if len(pending) >= pool.workers:
+            hashed.extend(pending.popleft().result())
+        pending.append(pool.submit(_make_passwords, passwords[start:start + chunk_size]))
+    while pending:
+        hashed.extend(pending.popleft().result())
+    return hashed
+
+
+def check_password(password, encoded):
+    """``(is_correct, must_update)``; unusable hashes are rejected without hashing."""
+    if password is None or not hashers.is_password_usable(encoded):
+        return False, False
+    return pool.run(_check_password, password, encoded)
+
+
+async def acheck_password(password, encoded):
+    if password is None or not hashers.is_password_usable(encoded):
+        return False, False
+    return await pool.arun(_check_password, password, encoded)
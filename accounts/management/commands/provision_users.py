@@ -0,0 +1,48 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from accounts.provisioning import DEFAULT_BATCH_SIZE, UserProvisioner
+from tasks.importers import IMPORT_FORMATS, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create user accounts from a CSV or NDJSON file with email, first_name, "
+        "last_name and optional password columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or NDJSON file of users.")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="File format, detected from the extension when omitted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias to create the users in.",
+        )
+
+    def handle(self, *args, **options):
+        input_format = options["format"] or detect_format(options["path"])
+        if input_format is None:
+            raise CommandError("Cannot detect the file format, pass --format.")
+
+        provisioner = UserProvisioner(batch_size=options["batch_size"], using=options["database"])
+        started = time.perf_counter()
+        with open(options["path"], "rb") as stream:
+            report = provisioner.run(read_rows(stream, input_format))
+        elapsed = time.perf_counter() - started
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        rate = report["created"] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} users ({report['failed']} rejected) "
+            f"in {elapsed:.2f}s, {rate:,.0f} users/s."
+        ))
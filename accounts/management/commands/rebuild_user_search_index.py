@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from accounts.search import is_supported, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of users from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias whose search index should be rebuilt.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not is_supported(using):
+            raise CommandError("Full-text search is only available on SQLite databases.")
+        rebuild_search_index(using)
+        self.stdout.write(self.style.SUCCESS("User search index rebuilt."))
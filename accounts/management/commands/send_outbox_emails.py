@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from accounts.outbox import BATCH_SIZE, OutboxWorker
+
+
+class Command(BaseCommand):
+    help = "Send the queued outbox emails, polling for new ones every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the outbox once and exit.",
+        )
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between two polls.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias holding the outbox.",
+        )
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(batch_size=options["batch_size"], using=options["database"])
+        try:
+            while True:
+                sent, retried, failed = worker.drain()
+                if sent or retried or failed or options["once"]:
+                    self.stdout.write(
+                        self.style.SUCCESS(f"Sent {sent} emails, {retried} to retry, {failed} failed.")
+                    )
+                if options["once"]:
+                    return
+                try:
+                    time.sleep(options["interval"])
+                except KeyboardInterrupt:
+                    return
+        finally:
+            worker.close()
@@ -5,6 +5,8 @@ from django.contrib.auth.models import (AbstractBaseUser, PermissionsMixin)
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.shards import hash_shard
+from . import hashing
 from .managers import UserManager
 
 
@@ -38,6 +40,9 @@ class User(AbstractBaseUser, PermissionsMixin):
         help_text=_("Designates whether the user can log into this admin site."),
     )
     date_joined = models.DateTimeField(_("date joined"), default=timezone.now)
+    # Database holding the user's tasks, set on creation; empty means
+    # "default". See tasks/shards.py.
+    task_shard = models.CharField(max_length=100, blank=True, editable=False)
     objects = UserManager()
     EMAIL_FIELD = "email"
     USERNAME_FIELD = "email"
@@ -46,11 +51,56 @@ class User(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = _("user")
         verbose_name_plural = _("users")
+        # Backs the start_date/end_date filters of the user list; search
+        # goes through the FTS table of accounts.search.
+        indexes = [
+            models.Index(fields=["date_joined", "id"], name="user_date_joined_idx"),
+        ]
+
+    # True for the users StatelessJWTAuthentication builds from token claims.
+    from_token = False
+
+    def save(self, *args, **kwargs):
+        if self.from_token:
+            # Most of its fields are placeholders that would overwrite the row.
+            raise ValueError("A user built from token claims cannot be saved; load it from the database.")
+        if self._state.adding and not self.task_shard:
+            self.task_shard = hash_shard(self.pk)
+        super().save(*args, **kwargs)
 
     def clean(self):
         super().clean()
         self.email = self.__class__.objects.normalize_email(self.email)
 
+    def set_password(self, raw_password):
+        """Hash ``raw_password`` in the hashing pool (see accounts/hashing.py)."""
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    async def aset_password(self, raw_password):
+        self.password = await hashing.amake_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Verify ``raw_password`` in the hashing pool, upgrading the stored hash
+        when the hasher settings have changed.
+        """
+        correct, must_update = hashing.check_password(raw_password, self.password)
+        if correct and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+        return correct
+
+    async def acheck_password(self, raw_password):
+        correct, must_update = await hashing.acheck_password(raw_password, self.password)
+        if correct and must_update:
+            await self.aset_password(raw_password)
+            self._password = None
+            await self.asave(update_fields=["password"])
+        return correct
+
     def get_full_name(self):
         """
         Return the first_name plus the last_name, with a space in between.
@@ -74,3 +124,44 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent by ``manage.py send_outbox_emails``.
+
+    Rows are written in the same transaction as the change that triggers the
+    email, with the body already rendered, so requests never wait on SMTP.
+    See ``accounts.outbox``.
+    """
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "pending"),
+        (SENT, "sent"),
+        (FAILED, "failed"),
+    )
+
+    to = models.EmailField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at", "id"],
+                condition=models.Q(status="pending"),
+                name="outbox_email_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.to}: {self.subject}"
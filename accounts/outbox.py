@@ -0,0 +1,172 @@
+"""
+Transactional email outbox.
+
+``enqueue`` renders an email and stores it in ``OutboxEmail`` within the
+caller's transaction: if the request rolls back no email goes out, and the
+request itself never talks to the SMTP server. Templates come from Django's
+cached template loader, so each one is compiled once per process.
+
+``OutboxWorker`` (``manage.py send_outbox_emails``) drains the table:
+
+* due rows are claimed in batches by pushing their ``next_attempt_at``
+  a lease into the future, so concurrent workers do not pick the same rows
+  and rows held by a crashed worker become due again once the lease ends;
+* the SMTP connection is only opened once a batch has been claimed, so an
+  idle worker polling an empty outbox does not talk to the server. It is
+  then kept open across batches and polls, closed after an error (the next
+  email opens a fresh one) and closed once no email has been sent for
+  ``EMAIL_OUTBOX_IDLE_TIMEOUT`` seconds;
+* a failed email is retried with exponential backoff and jitter, and is
+  marked failed after ``EMAIL_OUTBOX_MAX_ATTEMPTS`` attempts.
+"""
+import logging
+import random
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connections, router, transaction
+from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+LEASE = timedelta(minutes=5)
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=6)
+
+
+def enqueue(to, subject, template, context, using=None):
+    """
+    Render ``<template>.txt`` (and ``<template>.html`` when it exists) and
+    queue the email for ``to``.
+    """
+    html_body = ""
+    try:
+        html_body = render_to_string(f"{template}.html", context)
+    except TemplateDoesNotExist:
+        pass
+    email = OutboxEmail(
+        to=to,
+        subject=subject,
+        body=render_to_string(f"{template}.txt", context),
+        html_body=html_body,
+    )
+    email.save(using=using)
+    return email
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: exponential, capped, with jitter."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class OutboxWorker:
+    def __init__(self, batch_size=BATCH_SIZE, connection=None, using=None):
+        self.batch_size = batch_size
+        self.using = using or router.db_for_write(OutboxEmail)
+        self.connection = connection or get_connection(fail_silently=False)
+        self.max_attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        self.idle_timeout = settings.EMAIL_OUTBOX_IDLE_TIMEOUT
+        self.connected = False
+        self.last_sent = None
+
+    def claim(self):
+        """Lease the next batch of due emails to this worker."""
+        now = timezone.now()
+        with transaction.atomic(using=self.using):
+            due = OutboxEmail.objects.using(self.using).filter(
+                status=OutboxEmail.PENDING, next_attempt_at__lte=now
+            ).order_by("next_attempt_at", "id")
+            if connections[self.using].features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            batch = list(due[:self.batch_size])
+            OutboxEmail.objects.using(self.using).filter(pk__in=[email.pk for email in batch]).update(
+                next_attempt_at=now + LEASE
+            )
+        return batch
+
+    def message(self, email):
+        message = EmailMultiAlternatives(
+            subject=email.subject,
+            body=email.body,
+            from_email=settings.EMAIL_HOST_USER,
+            to=[email.to],
+            connection=self.connection,
+        )
+        if email.html_body:
+            message.attach_alternative(email.html_body, "text/html")
+        return message
+
+    def process(self, batch):
+        sent, retried, failed = [], [], []
+        for email in batch:
+            try:
+                self.open()
+                self.connection.send_messages([self.message(email)])
+            except (smtplib.SMTPException, OSError) as exc:
+                # The connection may be unusable: the next email starts over
+                # on a fresh one.
+                self.close()
+                email.attempts += 1
+                email.last_error = str(exc)[:1000]
+                if email.attempts >= self.max_attempts:
+                    email.status = OutboxEmail.FAILED
+                    failed.append(email)
+                    logger.error("Giving up on outbox email %s to %s: %s", email.pk, email.to, exc)
+                else:
+                    email.next_attempt_at = timezone.now() + backoff(email.attempts)
+                    retried.append(email)
+            else:
+                email.status = OutboxEmail.SENT
+                email.sent_at = timezone.now()
+                sent.append(email)
+
+        objects = OutboxEmail.objects.using(self.using)
+        objects.bulk_update(sent, ["status", "sent_at"])
+        objects.bulk_update(retried, ["attempts", "last_error", "next_attempt_at"])
+        objects.bulk_update(failed, ["attempts", "last_error", "status"])
+        return len(sent), len(retried), len(failed)
+
+    def open(self):
+        if self.connected:
+            return
+        try:
+            self.connection.open()
+        except (smtplib.SMTPException, OSError):
+            # send_messages() will try again, and fail the email, if the
+            # server is still unreachable.
+            return
+        self.connected = True
+
+    def close(self):
+        self.connected = False
+        try:
+            self.connection.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def drain(self):
+        """Send every due email; returns ``(sent, retried, failed)`` counts."""
+        totals = [0, 0, 0]
+        try:
+            while True:
+                batch = self.claim()
+                if not batch:
+                    break
+                for index, count in enumerate(self.process(batch)):
+                    totals[index] += count
+                self.last_sent = time.monotonic()
+        except BaseException:
+            self.close()
+            raise
+        if self.connected and time.monotonic() - self.last_sent >= self.idle_timeout:
+            self.close()
+        return tuple(totals)
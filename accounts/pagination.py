@@ -0,0 +1,6 @@
+from task_manager.pagination import KeysetPagination
+
+
+class UserPagination(KeysetPagination):
+    # Matches user_date_joined_idx; the order_by filter can pick another ordering.
+    ordering = ("-date_joined", "-id")
@@ -0,0 +1,133 @@
+"""
+Bulk creation of user accounts.
+
+Rows go through ``UserProvisionSerializer`` with a single serializer
+instance and are handled in batches:
+
+* email uniqueness is checked with one query per batch (and against the
+  rows already seen, for duplicates within the input);
+* passwords are hashed across the hashing pool workers
+  (``hashing.make_passwords``); rows without a password get an unusable
+  one, and the user sets theirs through the password reset flow;
+* users are inserted with ``bulk_create`` inside a savepoint. When the
+  database rejects a batch (e.g. an email registered concurrently), the
+  batch is replayed row by row so only the offending rows are reported.
+"""
+from django.contrib.auth.hashers import make_password
+from django.db import DatabaseError, router, transaction
+from rest_framework import serializers
+
+from tasks.importers import UnreadableRow
+from tasks.shards import hash_shard
+
+from . import hashing
+from .models import User
+from .serializers import UserProvisionSerializer
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+
+class UserProvisioner:
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, using=None):
+        self.batch_size = batch_size
+        self.using = using or router.db_for_write(User)
+        self.serializer = UserProvisionSerializer()
+        self.seen = set()
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, rows):
+        """Provision every ``(line_number, row)`` of ``rows`` and return the report."""
+        batch = []
+        with transaction.atomic(using=self.using):
+            for line_number, row in rows:
+                data = self._validate(line_number, row)
+                if data is None:
+                    continue
+                batch.append((line_number, data))
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+        return self.report()
+
+    def report(self):
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+        }
+
+    def _validate(self, line_number, row):
+        if isinstance(row, UnreadableRow):
+            self._error(line_number, {"non_field_errors": [str(row)]})
+            return None
+        if not isinstance(row, dict):
+            self._error(line_number, {"non_field_errors": ["Expected a JSON object."]})
+            return None
+        try:
+            data = self.serializer.run_validation(row)
+        except serializers.ValidationError as exc:
+            self._error(line_number, exc.detail)
+            return None
+        if data["email"] in self.seen:
+            self._error(line_number, {"email": ["Duplicate email in the input."]})
+            return None
+        self.seen.add(data["email"])
+        return data
+
+    def _flush(self, batch):
+        existing = set(
+            User.objects.using(self.using)
+            .filter(email__in=[data["email"] for _, data in batch])
+            .values_list("email", flat=True)
+        )
+        duplicate = str(User._meta.get_field("email").error_messages["unique"])
+        accepted = []
+        for line_number, data in batch:
+            if data["email"] in existing:
+                self._error(line_number, {"email": [duplicate]})
+            else:
+                accepted.append((line_number, data))
+
+        with_password = [data["password"] for _, data in accepted if "password" in data]
+        hashed = iter(hashing.make_passwords(with_password))
+        users = [
+            (
+                line_number,
+                User(
+                    email=data["email"],
+                    first_name=data["first_name"],
+                    last_name=data["last_name"],
+                    password=next(hashed) if "password" in data else make_password(None),
+                ),
+            )
+            for line_number, data in accepted
+        ]
+        # bulk_create skips User.save, which assigns the task shard.
+        for _, user in users:
+            user.task_shard = hash_shard(user.pk)
+        try:
+            self._insert([user for _, user in users])
+        except DatabaseError:
+            for line_number, user in users:
+                try:
+                    self._insert([user])
+                except DatabaseError as exc:
+                    self._error(line_number, {"non_field_errors": [str(exc)]})
+                else:
+                    self.created += 1
+        else:
+            self.created += len(users)
+
+    def _insert(self, users):
+        with transaction.atomic(using=self.using):
+            User.objects.using(self.using).bulk_create(users)
+
+    def _error(self, line_number, detail):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "errors": detail})
@@ -0,0 +1,94 @@
+"""
+Prefix search over user names and emails.
+
+Works like the task search (see tasks/search.py): on SQLite the
+``accounts_user`` table is mirrored into an external-content FTS5 table
+kept in sync by triggers. Emails are split into words on ``@`` and ``.``,
+so ``jdupont@acme.fr``, ``jdup`` and ``acme`` all match. Run
+``manage.py rebuild_user_search_index`` after ``VACUUM``.
+
+Other database backends fall back to ``icontains`` lookups.
+"""
+from django.db import connections
+from django.db.models import Q
+
+from tasks.search import is_supported, match_expression, match_filter, match_rank
+
+from .models import User
+
+USERS_TABLE = User._meta.db_table
+SEARCH_TABLE = f"{USERS_TABLE}_fts"
+
+SEARCH_INDEX_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        first_name,
+        last_name,
+        email,
+        content='{USERS_TABLE}',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON {USERS_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, first_name, last_name, email)
+        VALUES (new.rowid, new.first_name, new.last_name, new.email);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON {USERS_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, first_name, last_name, email)
+        VALUES ('delete', old.rowid, old.first_name, old.last_name, old.email);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF first_name, last_name, email ON {USERS_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, first_name, last_name, email)
+        VALUES ('delete', old.rowid, old.first_name, old.last_name, old.email);
+        INSERT INTO {SEARCH_TABLE}(rowid, first_name, last_name, email)
+        VALUES (new.rowid, new.first_name, new.last_name, new.email);
+    END
+    """,
+]
+
+
+def install_search_index(using="default"):
+    """Create the FTS5 table and its triggers if they do not exist yet."""
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        for statement in SEARCH_INDEX_SQL:
+            cursor.execute(statement)
+
+
+def rebuild_search_index(using="default"):
+    """Repopulate the FTS5 table from ``accounts_user`` and refresh planner statistics."""
+    install_search_index(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"ANALYZE {USERS_TABLE}")
+
+
+def search_users(queryset, value, ranked=True):
+    """
+    Restrict ``queryset`` to users matching ``value``, best matches first
+    unless ``ranked`` is false (when the caller applies its own ordering).
+    """
+    if not is_supported(queryset.db):
+        return queryset.filter(
+            Q(first_name__icontains=value)
+            | Q(last_name__icontains=value)
+            | Q(email__icontains=value)
+        )
+
+    expression = match_expression(value)
+    if not expression:
+        return queryset
+
+    queryset = queryset.filter(match_filter(USERS_TABLE, SEARCH_TABLE, expression))
+    if not ranked:
+        return queryset
+    return queryset.annotate(search_rank=match_rank(USERS_TABLE, SEARCH_TABLE, expression)).order_by("search_rank")
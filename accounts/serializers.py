@@ -78,11 +78,25 @@ class UserRegisterSerializer(serializers.ModelSerializer):
             validate_password(password)
         except ValidationError as e:
             raise serializers.ValidationError({'password': list(e.messages)})
-        user = User.objects.create_user(**validated_data, password=password)
-        user.is_active = True
-        user.save()
+        return User.objects.create_user(**validated_data, password=password, is_active=True)
 
-        return user
+
+class UserProvisionSerializer(serializers.Serializer):
+    """One row of a bulk provisioning; email uniqueness is checked per batch."""
+    email = serializers.EmailField(max_length=254)
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+    password = serializers.CharField(required=False, write_only=True)
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def validate_password(self, value):
+        try:
+            validate_password(value)
+        except ValidationError as e:
+            raise serializers.ValidationError(list(e.messages))
+        return value
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -144,8 +158,8 @@ class PasswordResetRequestSerializer(serializers.Serializer):
 
     def validate(self, attrs):
         email = attrs.get("email")
-        if User.objects.filter(email=email).exists():
-            user = User.objects.get(email=email)
+        user = User.objects.filter(email=email).first()
+        if user is not None:
             uuid = urlsafe_base64_encode(force_bytes(user.pk))
             token = PasswordResetTokenGenerator().make_token(user)
             current_site = settings.FRONTEND_URL
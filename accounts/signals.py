@@ -0,0 +1,17 @@
+from django.db import router
+
+from .authentication import user_cache
+from .models import User
+from .search import install_search_index
+
+
+def install_database_objects(sender, using, **kwargs):
+    """Create the user search FTS table and its triggers; see tasks.signals."""
+    if not router.allow_migrate_model(using, User):
+        return
+    install_search_index(using)
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached copy of a user that was saved (deactivated, new password...) or deleted."""
+    user_cache.delete(instance.pk)
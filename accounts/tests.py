@@ -1,11 +1,43 @@
+import os
+import re
+import smtplib
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from task_manager.testing import QueryBudgetTestCase
+from tasks.shards import shard_for, task_databases
+from . import hashing
+from .authentication import StatelessJWTAuthentication, user_cache
+from .models import OutboxEmail
+from .pagination import UserPagination
+from .outbox import OutboxWorker, enqueue
 
 User = get_user_model()
 
+# Deleting a user also clears their task rows, in whichever shard they are.
+TASK_DATABASES = set(task_databases())
+
 class UserViewSetTests(APITestCase):
+    databases = TASK_DATABASES
+
     def setUp(self):
         self.client = APIClient()
         self.user = User.objects.create_user(
@@ -53,3 +85,468 @@ class UserViewSetTests(APITestCase):
         url = reverse('user-me')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            email="budget-admin@example.com",
+            password="adminpassword123",
+            first_name="Admin",
+            last_name="User",
+        )
+        for index in range(5):
+            User.objects.create_user(
+                email=f"member{index}@example.com",
+                password="testpassword123",
+                first_name="Member",
+                last_name=str(index),
+            )
+
+    def test_list(self):
+        self.authenticate(self.superuser)
+        self.assertWithinQueryBudget(self.client.get(reverse("user-list")))
+
+    def test_me(self):
+        self.authenticate(self.superuser)
+        self.assertWithinQueryBudget(self.client.get(reverse("user-me")))
+
+
+class FailingEmailBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.opened = self.closed = 0
+
+    def open(self):
+        self.opened += 1
+
+    def close(self):
+        self.closed += 1
+
+
+class EmailOutboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="forgot@example.com",
+            password="testpassword123",
+            first_name="Forgot",
+            last_name="Password",
+        )
+        self.url = reverse("user-reset-password")
+
+    def test_reset_password_queues_the_email(self):
+        response = self.client.post(self.url, {"email": "forgot@example.com"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mail.outbox, [])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, "forgot@example.com")
+        self.assertIn(f"{settings.FRONTEND_URL}/change-password?token=", email.body)
+        self.assertIn("Forgot Password", email.html_body)
+
+    def test_unknown_email_queues_nothing(self):
+        response = self.client.post(self.url, {"email": "nobody@example.com"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_worker_sends_and_marks_emails(self):
+        for _ in range(3):
+            enqueue("forgot@example.com", "Hello", "emails/reset_password", {"reset_link": "x"})
+        self.assertEqual(OutboxWorker(batch_size=2).drain(), (3, 0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.SENT).exists())
+        self.assertEqual(OutboxWorker().drain(), (0, 0, 0))
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        email = enqueue("forgot@example.com", "Hello", "emails/reset_password", {"reset_link": "x"})
+        worker = OutboxWorker(connection=FailingEmailBackend())
+        self.assertEqual(worker.drain(), (0, 1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn("unexpectedly closed", email.last_error)
+        # Not due yet: nothing to do.
+        self.assertEqual(worker.drain(), (0, 0, 0))
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now(), attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS - 1)
+        with self.assertLogs("accounts.outbox", "ERROR"):
+            self.assertEqual(worker.drain(), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.FAILED)
+
+    def test_connection_is_opened_lazily_and_kept_until_idle(self):
+        backend = CountingEmailBackend()
+        worker = OutboxWorker(connection=backend)
+        # Polling an empty outbox does not talk to the server.
+        worker.drain()
+        self.assertEqual((backend.opened, backend.closed), (0, 0))
+
+        worker.idle_timeout = 60
+        for _ in range(2):
+            enqueue("forgot@example.com", "Hello", "emails/reset_password", {"reset_link": "x"})
+            self.assertEqual(worker.drain(), (1, 0, 0))
+            worker.drain()
+        self.assertEqual((backend.opened, backend.closed), (1, 0))
+
+        worker.idle_timeout = 0
+        worker.drain()
+        self.assertEqual((backend.opened, backend.closed), (1, 1))
+
+    def test_connection_is_closed_after_an_error(self):
+        backend = FailingEmailBackend()
+        worker = OutboxWorker(connection=backend)
+        enqueue("forgot@example.com", "Hello", "emails/reset_password", {"reset_link": "x"})
+        with patch.object(backend, "close", wraps=backend.close) as close:
+            worker.drain()
+        self.assertEqual(close.call_count, 1)
+        self.assertFalse(worker.connected)
+
+    def test_command(self):
+        enqueue("forgot@example.com", "Hello", "emails/reset_password", {"reset_link": "x"})
+        out = StringIO()
+        call_command("send_outbox_emails", "--once", stdout=out)
+        self.assertIn("Sent 1 emails", out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    databases = TASK_DATABASES
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user(
+            email="cached@example.com",
+            password="testpassword123",
+            first_name="Cached",
+            last_name="User",
+        )
+        self.url = reverse("user-me")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.tokens()['access']}")
+
+    def user_lookups(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        lookups = [q for q in queries.captured_queries if User._meta.db_table in q["sql"]]
+        return response, len(lookups)
+
+    def test_user_is_loaded_once(self):
+        response, lookups = self.user_lookups()
+        self.assertEqual((response.status_code, lookups), (status.HTTP_200_OK, 1))
+        response, lookups = self.user_lookups()
+        self.assertEqual((response.status_code, lookups), (status.HTTP_200_OK, 0))
+        self.assertEqual(response.data["email"], "cached@example.com")
+
+    def test_saving_the_user_invalidates_the_cache(self):
+        self.user_lookups()
+        self.user.first_name = "Renamed"
+        self.user.save()
+        response, lookups = self.user_lookups()
+        self.assertEqual((response.data["first_name"], lookups), ("Renamed", 1))
+
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.user_lookups()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_is_not_cached(self):
+        self.user_lookups()
+        cached = user_cache.get(self.user.pk)
+        self.assertIn("password", cached.get_deferred_fields())
+        self.assertTrue(cached.check_password("testpassword123"))
+
+    @override_settings(AUTH_USER_CACHE_ALIAS="default")
+    def test_shared_cache_serves_other_processes(self):
+        self.addCleanup(caches["default"].clear)
+        self.user_lookups()
+        user_cache.clear()  # another process: cold local cache
+        response, lookups = self.user_lookups()
+        self.assertEqual((response.status_code, lookups), (status.HTTP_200_OK, 0))
+        self.user.save()
+        self.assertIsNone(caches["default"].get(f"auth-user:{self.user.pk}"))
+
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_cache_is_bounded(self):
+        others = [
+            User.objects.create_user(
+                email=f"other{i}@example.com",
+                password="testpassword123",
+                first_name="Other",
+                last_name=str(i),
+            )
+            for i in range(3)
+        ]
+        for user in others:
+            user_cache.set(user)
+        self.assertIsNone(user_cache.get(others[0].pk))
+        self.assertEqual(user_cache.get(others[2].pk), others[2])
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_entries_expire(self):
+        self.user_lookups()
+        _, lookups = self.user_lookups()
+        self.assertEqual(lookups, 1)
+
+    def test_stateless_user_from_claims(self):
+        token = AccessToken(str(self.user.tokens()["access"]))
+        with self.assertNumQueries(0):
+            user = StatelessJWTAuthentication().get_user(token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual((user.email, user.first_name, user.last_name), ("cached@example.com", "Cached", "User"))
+        self.assertFalse(user.is_staff)
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+    def test_stateless_user_is_read_only_and_has_no_shard(self):
+        token = AccessToken(str(self.user.tokens()["access"]))
+        user = StatelessJWTAuthentication().get_user(token)
+        with self.assertRaises(ValueError):
+            user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "Cached")
+        self.assertTrue(self.user.check_password("testpassword123"))
+
+        with override_settings(TASK_SHARDS=["default"]):
+            self.assertEqual(shard_for(user), "default")
+        with override_settings(TASK_SHARDS=["default", "tasks1"]):
+            with self.assertNumQueries(0), self.assertRaises(ImproperlyConfigured):
+                shard_for(user)
+            self.assertEqual(shard_for(self.user), self.user.task_shard or "default")
+
+
+class PasswordHashingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="hashing@example.com",
+            password="testpassword123",
+            first_name="Hashing",
+            last_name="User",
+        )
+        self.url = reverse("user-login")
+
+    def login(self, password):
+        return self.client.post(self.url, {"email": "hashing@example.com", "password": password})
+
+    def test_login_verifies_in_the_pool(self):
+        self.assertIsNotNone(hashing.pool._executor)
+        self.assertTrue(hashers.check_password("testpassword123", self.user.password))
+        response = self.login("testpassword123")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access_token", response.data)
+        response = self.login("wrongpassword")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_outdated_hash_is_upgraded(self):
+        User.objects.filter(pk=self.user.pk).update(
+            password=hashers.make_password("testpassword123", hasher="pbkdf2_sha1")
+        )
+        self.assertEqual(self.login("testpassword123").status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+
+    @override_settings(PASSWORD_HASHING_QUEUE_TIMEOUT=0)
+    def test_saturated_pool_answers_503(self):
+        slots = hashing.pool._slots
+        acquired = 0
+        while slots.acquire(blocking=False):
+            acquired += 1
+        try:
+            response = self.login("testpassword123")
+        finally:
+            for _ in range(acquired):
+                slots.release()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(self.login("testpassword123").status_code, status.HTTP_200_OK)
+
+    async def test_async_interface(self):
+        self.assertTrue(await self.user.acheck_password("testpassword123"))
+        self.assertFalse(await self.user.acheck_password("wrongpassword"))
+        await self.user.aset_password("otherpassword123")
+        self.assertTrue(hashers.check_password("otherpassword123", self.user.password))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_inline_hashing(self):
+        self.user.set_password("inlinepassword123")
+        self.assertTrue(self.user.check_password("inlinepassword123"))
+
+
+class UserProvisioningTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            password="adminpassword123",
+            first_name="Admin",
+            last_name="User",
+        )
+        self.url = reverse("user-provision")
+        self.client.force_authenticate(user=self.admin)
+
+    def test_provision_users(self):
+        rows = [
+            {"email": "one@example.com", "first_name": "One", "last_name": "User", "password": "onepassword123"},
+            {"email": "two@EXAMPLE.com", "first_name": "Two", "last_name": "User"},
+            {"email": "admin@example.com", "first_name": "Admin", "last_name": "Again"},
+            {"email": "one@example.com", "first_name": "One", "last_name": "Again"},
+            {"email": "not-an-email", "first_name": "Bad", "last_name": "Email"},
+            {"email": "weak@example.com", "first_name": "Weak", "last_name": "Password", "password": "123456"},
+        ]
+        response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 4))
+        self.assertEqual([error["line"] for error in response.data["errors"]], [3, 4, 5, 6])
+
+        one = User.objects.get(email="one@example.com")
+        self.assertTrue(one.is_active)
+        self.assertTrue(one.check_password("onepassword123"))
+        self.assertFalse(User.objects.get(email="two@example.com").has_usable_password())
+
+    def test_uniqueness_is_checked_with_one_query_per_batch(self):
+        rows = [
+            {"email": f"user{i}@example.com", "first_name": "User", "last_name": str(i)}
+            for i in range(20)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.data["created"], 20)
+        selects = [q for q in queries.captured_queries if q["sql"].startswith("SELECT") and "email" in q["sql"]]
+        inserts = [q for q in queries.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual((len(selects), len(inserts)), (1, 1))
+
+    def test_requires_superuser(self):
+        self.client.force_authenticate(user=User.objects.create_user(
+            email="plain@example.com", password="plainpassword123", first_name="Plain", last_name="User"
+        ))
+        response = self.client.post(self.url, [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "users.csv")
+        with open(path, "w") as stream:
+            stream.write("email,first_name,last_name\nthree@example.com,Three,User\n,No,Email\n")
+        out, err = StringIO(), StringIO()
+        call_command("provision_users", path, stdout=out, stderr=err)
+        self.assertIn("Created 1 users (1 rejected)", out.getvalue())
+        self.assertIn("line 3", err.getvalue())
+        self.assertTrue(User.objects.filter(email="three@example.com").exists())
+
+
+class UserSearchTests(APITestCase):
+    databases = TASK_DATABASES
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            password="adminpassword123",
+            first_name="Admin",
+            last_name="User",
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse("user-list")
+        self.dupont = User.objects.create_user(
+            email="jdupont@acme.fr", password="testpassword123", first_name="Jean", last_name="Dupont"
+        )
+        self.durand = User.objects.create_user(
+            email="marie@durand.org", password="testpassword123", first_name="Marie", last_name="Durand"
+        )
+
+    def search(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        if connection.vendor == "sqlite":
+            table_scan = re.compile(rf"SCAN {User._meta.db_table}\b(?!_)")
+            for query in queries.captured_queries:
+                if User._meta.db_table not in query["sql"]:
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                    plan = [row[-1] for row in cursor.fetchall()]
+                self.assertFalse([step for step in plan if table_scan.match(step)], plan)
+        return sorted(user["email"] for user in response.data["results"])
+
+    def test_prefix_match_on_names_and_email(self):
+        self.assertEqual(self.search(search="dup"), ["jdupont@acme.fr"])
+        self.assertEqual(self.search(search="acme"), ["jdupont@acme.fr"])
+        self.assertEqual(self.search(search="marie dur"), ["marie@durand.org"])
+        self.assertEqual(self.search(search="nobody"), [])
+
+    def test_index_follows_updates(self):
+        self.durand.last_name = "Martin"
+        self.durand.save()
+        self.assertEqual(self.search(search="martin"), ["marie@durand.org"])
+        self.assertEqual(self.search(search="durand"), ["marie@durand.org"])  # still in the email
+        self.durand.delete()
+        self.assertEqual(self.search(search="durand"), [])
+
+    def test_date_joined_filters(self):
+        User.objects.filter(pk=self.dupont.pk).update(date_joined=timezone.now() - timedelta(days=30))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        self.assertEqual(self.search(start_date=since), ["admin@example.com", "marie@durand.org"])
+        self.assertEqual(self.search(end_date=since), ["jdupont@acme.fr"])
+
+
+class UserPaginationTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            password="adminpassword123",
+            first_name="Admin",
+            last_name="User",
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse("user-list")
+        joined = timezone.now() - timedelta(days=10)
+        User.objects.bulk_create(
+            User(
+                email=f"member{index}@example.com",
+                first_name=f"Member{index % 3}",
+                last_name=str(index),
+                date_joined=joined + timedelta(hours=index % 4),
+            )
+            for index in range(7)
+        )
+
+    def collect(self, **params):
+        emails, response = [], self.client.get(self.url, {"page_size": 3, **params})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            emails += [user["email"] for user in response.data["results"]]
+            if not response.data["next"]:
+                return emails, response
+            response = self.client.get(response.data["next"])
+
+    def test_pages_follow_date_joined(self):
+        emails, _ = self.collect()
+        expected = list(User.objects.order_by("-date_joined", "-id").values_list("email", flat=True))
+        self.assertEqual(emails, expected)
+
+    def test_pages_follow_order_by(self):
+        emails, _ = self.collect(order_by="first_name")
+        expected = list(User.objects.order_by("first_name", "id").values_list("email", flat=True))
+        self.assertEqual(emails, expected)
+
+    def test_no_count_by_default(self):
+        response = self.client.get(self.url)
+        self.assertNotIn("count", response.data)
+
+    def test_exact_count(self):
+        response = self.client.get(self.url, {"count": "exact", "search": "member5"})
+        self.assertEqual((response.data["count"], response.data["count_exact"]), (1, True))
+
+    def test_estimated_count(self):
+        response = self.client.get(self.url, {"count": "estimate", "search": "member"})
+        self.assertEqual((response.data["count"], response.data["count_exact"]), (7, True))
+        with patch.object(UserPagination, "estimate_cap", 5):
+            response = self.client.get(self.url, {"count": "estimate", "search": "member"})
+        self.assertEqual((response.data["count"], response.data["count_exact"]), (5, False))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {User._meta.db_table}")
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"count": "estimate"})
+        self.assertEqual((response.data["count"], response.data["count_exact"]), (8, False))
@@ -1,18 +1,16 @@
 import uuid
-from django.core.mail import EmailMessage
-from django.core.mail import send_mail
-from django.conf import settings
-from django.template.loader import render_to_string
+
+from . import outbox
 
 
 def send_email(data):
-    email = EmailMessage(
+    """Queue an email; it is sent by ``manage.py send_outbox_emails``."""
+    return outbox.enqueue(
+        to=data["to_email"],
         subject=data["subject"],
-        body=data["body"],
-        from_email=settings.EMAIL_HOST_USER,
-        to=[data["to_email"]],
+        template=data["template"],
+        context=data["context"],
     )
-    email.send()
 
 def send_reset_password_email(email, full_name, reset_password_link):
     context_data = {
@@ -23,9 +21,9 @@ def send_reset_password_email(email, full_name, reset_password_link):
         "subject": (
             "Réinitialiser votre mot de passe"
         ),
-        "to_email": [email],
-        "text_content": render_to_string("emails/reset_password.txt", context_data),
-        "html_content": render_to_string("emails/reset_password.html", context_data),
+        "to_email": email,
+        "template": "emails/reset_password",
+        "context": context_data,
     }
 
     return send_email(email_data)
@@ -5,6 +5,8 @@ from accounts.serializers import *
 from rest_framework import viewsets, status, permissions
 from drf_yasg.utils import swagger_auto_schema
 from .filters import UserFilter
+from .pagination import UserPagination
+from .provisioning import UserProvisioner
 
 class IsSuperUser(permissions.BasePermission):
     """
@@ -19,9 +21,12 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = UserFilter
+    pagination_class = UserPagination
+    # Enforced by the test suite, see task_manager.middleware.
+    query_budgets = {"list": 2, "me": 1}
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve", "update", "partial_update", "delete"]:
+        if self.action in ["list", "retrieve", "update", "partial_update", "delete", "provision"]:
             self.permission_classes = [IsSuperUser]
         elif self.action in [
             "create",
@@ -243,6 +248,29 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer.data, status=status.HTTP_201_CREATED, headers=headers
         )
 
+    @swagger_auto_schema(
+        operation_description=(
+            "Création d'utilisateurs en masse : une liste d'objets avec email, "
+            "first_name, last_name et password (facultatif)"
+        ),
+        operation_summary="Bulk user provisioning",
+        request_body=UserProvisionSerializer(many=True),
+    )
+    @action_decorator(
+        detail=False,
+        methods=["post"],
+        url_path="provision",
+        permission_classes=[IsSuperUser],
+    )
+    def provision(self, request):
+        if not isinstance(request.data, list):
+            return Response(
+                {"non_field_errors": ["Expected a list of users."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        report = UserProvisioner().run(enumerate(request.data, start=1))
+        return Response(report, status=status.HTTP_200_OK)
+
     @swagger_auto_schema(
         operation_description="Retrieve the connected user information",
         operation_summary="Retrieve user",
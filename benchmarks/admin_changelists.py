@@ -0,0 +1,106 @@
+"""
+Response time of the task and user admin change lists on a large table.
+
+Fills a scratch SQLite database with ``--users`` users owning ``--tasks``
+tasks in total (through the same triggers as production), runs ``ANALYZE``
+and times a few change list pages as a superuser:
+
+    EMAIL_HOST_USER=x EMAIL_HOST_PASSWORD=x python benchmarks/admin_changelists.py --tasks 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_manager.settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+SCRATCH = os.path.join(tempfile.gettempdir(), "admin_changelists.sqlite3")
+settings.DATABASES["default"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": SCRATCH}
+settings.ALLOWED_HOSTS = ["*"]
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from tasks.models import Tasks  # noqa: E402
+
+PAGES = [
+    ("tasks", "/admin/tasks/tasks/"),
+    ("tasks, page 50", "/admin/tasks/tasks/?p=50"),
+    ("tasks, status filter", "/admin/tasks/tasks/?status__exact=completed"),
+    ("tasks, search", "/admin/tasks/tasks/?q=invoice"),
+    ("users", "/admin/accounts/user/"),
+    ("users, search", "/admin/accounts/user/?q=owner12"),
+]
+
+
+def populate(user_count, task_count):
+    now = timezone.now()
+    owners = [
+        User(email=f"owner{i}@example.com", first_name="Owner", last_name=str(i), password="!")
+        for i in range(user_count)
+    ]
+    User.objects.bulk_create(owners, batch_size=5000)
+    words = ["invoice", "report", "meeting", "review", "deploy", "budget"]
+    with transaction.atomic():
+        for start in range(0, task_count, 20000):
+            Tasks.objects.bulk_create(
+                Tasks(
+                    id=uuid.uuid4(),
+                    title=f"{words[i % len(words)]} {i}",
+                    status=("pending", "in_progress", "completed")[i % 3],
+                    owner=owners[i % user_count],
+                    created_at=now,
+                    updated_at=now,
+                )
+                for i in range(start, min(start + 20000, task_count))
+            )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--tasks", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    if os.path.exists(SCRATCH):
+        os.unlink(SCRATCH)
+    try:
+        call_command("migrate", run_syncdb=True, verbosity=0)
+        started = time.perf_counter()
+        populate(options.users, options.tasks)
+        print(f"{options.users} users, {options.tasks} tasks loaded in {time.perf_counter() - started:.0f}s")
+
+        admin = User.objects.create_superuser(
+            email="admin@example.com", password="adminpassword123", first_name="Admin", last_name="User"
+        )
+        client = Client()
+        client.force_login(admin)
+        for label, url in PAGES:
+            timings = []
+            for _ in range(options.repeat):
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append(time.perf_counter() - started)
+                assert response.status_code == 200, (url, response.status_code)
+            print(f"{label:<22} {statistics.median(timings) * 1000:8.1f} ms")
+    finally:
+        os.unlink(SCRATCH)
+
+
+if __name__ == "__main__":
+    main()
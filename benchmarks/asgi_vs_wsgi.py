@@ -0,0 +1,163 @@
+"""
+Throughput and tail latency of the task API under WSGI and ASGI.
+
+Starts the project three ways and drives the same authenticated
+``GET /tasks/`` load against each:
+
+* gunicorn (WSGI, sync workers with threads) serving the DRF route,
+* uvicorn (ASGI) serving the same DRF route through ``sync_to_async``,
+* uvicorn (ASGI) serving the native async route ``/async/tasks/``.
+
+Needs ``pip install gunicorn uvicorn`` and a migrated database; a
+``bench@example.com`` user with ``--tasks`` tasks is created in it:
+
+    EMAIL_HOST_USER=x EMAIL_HOST_PASSWORD=x python benchmarks/asgi_vs_wsgi.py --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_manager.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from tasks.models import Tasks  # noqa: E402
+
+EMAIL = "bench@example.com"
+
+
+def prepare(task_count):
+    user = User.objects.filter(email=EMAIL).first() or User.objects.create_user(
+        email=EMAIL, password="benchpassword", first_name="Bench", last_name="User"
+    )
+    missing = task_count - Tasks.objects.filter(owner=user).count()
+    if missing > 0:
+        Tasks.objects.bulk_create(
+            Tasks(title=f"Bench task {i}", description="Lorem ipsum", owner=user)
+            for i in range(missing)
+        )
+    return str(AccessToken.for_user(user))
+
+
+def servers(workers, threads, port):
+    return [
+        ("wsgi  /tasks/", [
+            sys.executable, "-m", "gunicorn", "task_manager.wsgi:application",
+            "--workers", str(workers), "--threads", str(threads),
+            "--bind", f"127.0.0.1:{port}", "--log-level", "warning",
+        ], "/tasks/"),
+        ("asgi  /tasks/", [
+            sys.executable, "-m", "uvicorn", "task_manager.asgi:application",
+            "--workers", str(workers), "--port", str(port), "--log-level", "warning",
+        ], "/tasks/"),
+        ("asgi  /async/tasks/", [
+            sys.executable, "-m", "uvicorn", "task_manager.asgi:application",
+            "--workers", str(workers), "--port", str(port), "--log-level", "warning",
+        ], "/async/tasks/"),
+    ]
+
+
+async def fetch(reader, writer, request):
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def client(port, request, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status_code = await fetch(reader, writer, request)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errors.append(1)
+                writer.close()
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                continue
+            latencies.append(time.perf_counter() - start)
+            if status_code != 200:
+                errors.append(status_code)
+    finally:
+        writer.close()
+
+
+async def load(port, path, token, concurrency, duration):
+    request = (
+        f"GET {path}?page_size=50 HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        f"Authorization: Bearer {token}\r\nConnection: keep-alive\r\n\r\n"
+    ).encode()
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        client(port, request, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    return latencies, errors
+
+
+def wait_until_listening(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            asyncio.run(asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), 1))
+            return
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8765)
+    options = parser.parse_args()
+
+    token = prepare(options.tasks)
+    print(f"{options.concurrency} concurrent clients, {options.duration:.0f}s per run")
+    print(f"{'deployment':<20} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for label, command, path in servers(options.workers, options.threads, options.port):
+        process = subprocess.Popen(command, cwd=ROOT)
+        try:
+            wait_until_listening(options.port)
+            asyncio.run(load(options.port, path, token, 4, 1.0))  # warm-up
+            latencies, errors = asyncio.run(
+                load(options.port, path, token, options.concurrency, options.duration)
+            )
+        finally:
+            process.terminate()
+            process.wait()
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else float("nan")
+        print(
+            f"{label:<20} {len(latencies) / options.duration:>8.0f} "
+            f"{statistics.median(latencies) * 1000:>8.1f} {p99 * 1000:>8.1f} {len(errors):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Latency of ordinary requests while the server absorbs a burst of logins.
+
+Starts gunicorn (sync workers with threads) twice, once hashing on the
+request thread (``PASSWORD_HASHING_WORKERS=0``) and once with the hashing
+pool, and runs against each:
+
+* ``--readers`` clients looping on an authenticated ``GET /tasks/``,
+* ``--logins`` clients looping on ``POST /users/login/``.
+
+Reports the reader latency, the login rate and how many logins were turned
+away with a 503 by the pool's backpressure.
+
+Needs ``pip install gunicorn`` and a migrated database; a
+``bench@example.com`` user is created in it:
+
+    EMAIL_HOST_USER=x EMAIL_HOST_PASSWORD=x python benchmarks/login_storm.py --pool-workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_manager.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from asgi_vs_wsgi import fetch, prepare, wait_until_listening  # noqa: E402
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchpassword"
+
+
+async def client(port, request, deadline, latencies, statuses):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status_code = await fetch(reader, writer, request)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                statuses.append(0)
+                writer.close()
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                continue
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status_code)
+    finally:
+        writer.close()
+
+
+async def load(port, token, readers, logins, duration):
+    read = (
+        f"GET /tasks/?page_size=50 HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        f"Authorization: Bearer {token}\r\nConnection: keep-alive\r\n\r\n"
+    ).encode()
+    body = json.dumps({"email": EMAIL, "password": PASSWORD})
+    login = (
+        f"POST /users/login/ HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n{body}"
+    ).encode()
+    read_latencies, read_statuses, login_latencies, login_statuses = [], [], [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(
+        *(client(port, read, deadline, read_latencies, read_statuses) for _ in range(readers)),
+        *(client(port, login, deadline, login_latencies, login_statuses) for _ in range(logins)),
+    )
+    return read_latencies, read_statuses, login_latencies, login_statuses
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16, help="gunicorn threads per worker")
+    parser.add_argument("--pool-workers", type=int, default=2, help="PASSWORD_HASHING_WORKERS")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8766)
+    options = parser.parse_args()
+
+    token = prepare(options.tasks)
+    command = [
+        sys.executable, "-m", "gunicorn", "task_manager.wsgi:application",
+        "--workers", str(options.workers), "--threads", str(options.threads),
+        "--bind", f"127.0.0.1:{options.port}", "--log-level", "warning",
+    ]
+    print(f"{options.readers} readers and {options.logins} login clients, {options.duration:.0f}s per run")
+    print(
+        f"{'hashing':<12} {'read/s':>7} {'read p50':>9} {'read p99':>9} "
+        f"{'login/s':>8} {'login p99':>10} {'503':>5}"
+    )
+    for label, pool_workers in (("inline", 0), (f"pool x{options.pool_workers}", options.pool_workers)):
+        env = dict(os.environ, PASSWORD_HASHING_WORKERS=str(pool_workers))
+        process = subprocess.Popen(command, cwd=ROOT, env=env)
+        try:
+            wait_until_listening(options.port)
+            asyncio.run(load(options.port, token, 2, 2, 2.0))  # warm-up, starts the pool
+            reads, _, logins, login_statuses = asyncio.run(
+                load(options.port, token, options.readers, options.logins, options.duration)
+            )
+        finally:
+            process.terminate()
+            process.wait()
+        accepted = login_statuses.count(200)
+        print(
+            f"{label:<12} {len(reads) / options.duration:>7.0f} "
+            f"{statistics.median(reads) * 1000:>8.1f}ms {percentile(reads, 0.99) * 1000:>7.1f}ms "
+            f"{accepted / options.duration:>8.1f} {percentile(logins, 0.99) * 1000:>8.1f}ms "
+            f"{login_statuses.count(503):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
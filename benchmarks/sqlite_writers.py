@@ -0,0 +1,124 @@
+"""
+Write throughput of several worker processes sharing the SQLite database.
+
+Each worker plays the request cycle of the task write endpoints for
+``--seconds``: in a transaction it reads one of its tasks, then either
+updates it or creates a new one (through the same triggers as production),
+and closes or keeps its connection as ``CONN_MAX_AGE`` says. The run is
+done once with Django's stock SQLite settings and once with the settings
+of task_manager/settings.py, each on a fresh scratch database:
+
+    EMAIL_HOST_USER=x EMAIL_HOST_PASSWORD=x python benchmarks/sqlite_writers.py --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_manager.settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+SCRATCH = os.path.join(tempfile.gettempdir(), "sqlite_writers.sqlite3")
+CONFIGS = ("stock", "tuned")
+
+
+def configure(config):
+    if config == "stock":
+        settings.DATABASES["default"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": SCRATCH}
+    else:
+        settings.DATABASES["default"] = {**settings.DATABASES["default"], "NAME": SCRATCH}
+    django.setup()
+
+
+def work(worker, seconds, results):
+    from django.db import OperationalError, close_old_connections, transaction
+
+    from accounts.models import User
+    from tasks.models import Tasks
+
+    owner = User.objects.get(email=f"worker{worker}@example.com")
+    done = locked = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            with transaction.atomic():
+                task = Tasks.objects.filter(owner=owner).order_by("?").first()
+                if done % 2:
+                    Tasks.objects.filter(pk=task.pk).update(status=("pending", "completed")[done % 4 == 1])
+                else:
+                    Tasks.objects.create(title=f"Task {worker}-{done}", owner=owner)
+            done += 1
+        except OperationalError as exc:
+            if "locked" not in str(exc):
+                raise
+            locked += 1
+        close_old_connections()
+    results.put((done, locked))
+
+
+def run(config, workers, seconds):
+    configure(config)
+    from django.core.management import call_command
+    from django.db import connections
+
+    from accounts.models import User
+    from tasks.models import Tasks
+
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(SCRATCH + suffix):
+            os.unlink(SCRATCH + suffix)
+    try:
+        call_command("migrate", run_syncdb=True, verbosity=0)
+        for worker in range(workers):
+            owner = User.objects.create(
+                email=f"worker{worker}@example.com", first_name="Worker", last_name=str(worker), password="!"
+            )
+            Tasks.objects.bulk_create(Tasks(title=f"Seed {i}", owner=owner) for i in range(20))
+        connections.close_all()
+
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [context.Process(target=work, args=(worker, seconds, results)) for worker in range(workers)]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        done = sum(total[0] for total in totals)
+        locked = sum(total[1] for total in totals)
+        print(f"{config:<6} {done / seconds:8.0f} writes/s {locked:6d} lock errors")
+    finally:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(SCRATCH + suffix):
+                os.unlink(SCRATCH + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--config", choices=CONFIGS)
+    options = parser.parse_args()
+
+    if options.config:
+        run(options.config, options.workers, options.seconds)
+        return
+    # Each configuration runs in its own interpreter: the database settings
+    # are read once, by django.setup().
+    for config in CONFIGS:
+        subprocess.run(
+            [sys.executable, __file__, "--config", config,
+             "--workers", str(options.workers), "--seconds", str(options.seconds)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
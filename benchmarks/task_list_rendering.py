@@ -0,0 +1,75 @@
+"""
+Compare rendering a task listing through ``TaskSerializer`` with the
+precompiled ``values()`` row path used by ``GET /tasks/``.
+
+Runs against a throw-away test database:
+
+    EMAIL_HOST_USER=x EMAIL_HOST_PASSWORD=x python benchmarks/task_list_rendering.py [sizes...]
+
+Each timing covers fetching the rows and rendering them to JSON bytes.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_manager.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from task_manager.rows import compile_row_serializer  # noqa: E402
+from tasks.models import Tasks  # noqa: E402
+from tasks.serializers import TaskSerializer  # noqa: E402
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def best_of(function, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), body
+
+
+def main(sizes):
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        owner = User.objects.create_user(
+            email="bench@example.com", password="benchpassword", first_name="B", last_name="B"
+        )
+        renderer = JSONRenderer()
+        columns, to_representation = compile_row_serializer(TaskSerializer)
+        created = 0
+        print(f"{'rows':>8} {'serializer':>12} {'rows path':>12} {'speedup':>8}")
+        for size in sorted(sizes):
+            Tasks.objects.bulk_create(
+                Tasks(title=f"Task {i}", description="Lorem ipsum dolor sit amet", owner=owner)
+                for i in range(created, size)
+            )
+            created = size
+            tasks = Tasks.objects.filter(owner=owner).order_by("-updated_at", "-id")
+
+            slow, expected = best_of(
+                lambda: renderer.render(TaskSerializer(tasks.all(), many=True).data)
+            )
+            fast, body = best_of(
+                lambda: renderer.render([to_representation(row) for row in tasks.values(*columns)])
+            )
+            assert body == expected, "row rendering differs from TaskSerializer"
+            print(f"{size:>8} {slow:>11.3f}s {fast:>11.3f}s {slow / fast:>7.1f}x")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,86 @@
+"""
+Time repeated reads of the task list, detail and dashboard endpoints with
+and without the response cache (``tasks.cache``).
+
+Runs against a throw-away test database:
+
+    EMAIL_HOST_USER=x EMAIL_HOST_PASSWORD=x python benchmarks/task_response_cache.py [tasks] [requests]
+
+Each request goes through the full middleware and view stack with the test
+client. The cached run writes a task every 20 requests, so it also pays for
+the misses that follow an invalidation.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_manager.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from tasks.cache import response_cache  # noqa: E402
+from tasks.models import Tasks  # noqa: E402
+
+DEFAULT_TASKS = 5_000
+DEFAULT_REQUESTS = 400
+WRITE_EVERY = 20
+
+
+def run(client, owner, urls, requests):
+    start = time.perf_counter()
+    for index in range(requests):
+        if index % WRITE_EVERY == WRITE_EVERY - 1:
+            Tasks.objects.create(title=f"Write {index}", owner=owner)
+        response = client.get(urls[index % len(urls)])
+        assert response.status_code == 200, response.status_code
+    return requests / (time.perf_counter() - start)
+
+
+def main(size, requests):
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        owner = User.objects.create_user(
+            email="bench@example.com", password="benchpassword", first_name="B", last_name="B"
+        )
+        Tasks.objects.bulk_create(
+            Tasks(title=f"Task {i}", description="Lorem ipsum dolor sit amet", owner=owner)
+            for i in range(size)
+        )
+        client = APIClient()
+        client.force_authenticate(user=owner)
+        task = Tasks.objects.filter(owner=owner).first()
+        urls = [
+            reverse("task-list"),
+            reverse("task-list") + "?status=pending&page_size=50",
+            reverse("task-detail", args=[task.pk]),
+            reverse("task-dashboard"),
+        ]
+
+        with override_settings(TASK_RESPONSE_CACHE_TTL=0):
+            uncached = run(client, owner, urls, requests)
+        before = response_cache.stats()["total"]
+        # One process: the local memory cache is safe to enable here.
+        with override_settings(TASK_RESPONSE_CACHE_TTL=300):
+            cached = run(client, owner, urls, requests)
+        after = response_cache.stats()["total"]
+        hits, misses = after["hits"] - before["hits"], after["misses"] - before["misses"]
+        print(f"{size} tasks, {requests} requests, a write every {WRITE_EVERY}")
+        print(f"uncached: {uncached:8.0f} req/s")
+        print(f"cached:   {cached:8.0f} req/s ({cached / uncached:.1f}x, hit ratio {hits / (hits + misses):.2f})")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [DEFAULT_TASKS, DEFAULT_REQUESTS][len(args):]))
@@ -0,0 +1,76 @@
+"""
+Creating many accounts: one ``UserRegisterSerializer`` save per user versus
+``UserProvisioner``.
+
+Runs against a scratch in-memory database. Password hashing dominates both
+paths, so the provisioner's speed-up grows with PASSWORD_HASHING_WORKERS
+(bounded by the number of cores); ``--no-passwords`` measures the rest:
+
+    EMAIL_HOST_USER=x EMAIL_HOST_PASSWORD=x python benchmarks/user_provisioning.py --users 200
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_manager.settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.DATABASES["default"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from accounts.provisioning import UserProvisioner  # noqa: E402
+from accounts.serializers import UserRegisterSerializer  # noqa: E402
+
+
+def rows(prefix, count, passwords):
+    for i in range(count):
+        row = {"email": f"{prefix}{i}@example.com", "first_name": "Bench", "last_name": str(i)}
+        if passwords:
+            row["password"] = f"bench-password-{i}"
+        yield row
+
+
+def one_by_one(count, passwords):
+    for row in rows("single", count, passwords):
+        serializer = UserRegisterSerializer(data=row)
+        serializer.is_valid(raise_exception=True)
+        # What UserRegisterSerializer.create does, minus its random fallback
+        # password, so that --no-passwords compares like with like.
+        User.objects.create_user(**{"password": None, **serializer.validated_data}, is_active=True)
+
+
+def provisioned(count, passwords):
+    report = UserProvisioner().run(enumerate(rows("bulk", count, passwords), start=1))
+    assert report["created"] == count, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--no-passwords", action="store_true")
+    options = parser.parse_args()
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    passwords = not options.no_passwords
+    print(
+        f"{options.users} users, passwords {'hashed' if passwords else 'unusable'}, "
+        f"{settings.PASSWORD_HASHING_WORKERS} hashing workers, {os.cpu_count()} cores"
+    )
+    for label, function in (("one by one", one_by_one), ("provisioner", provisioned)):
+        started = time.perf_counter()
+        function(options.users, passwords)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<12} {elapsed:8.2f}s {options.users / elapsed:10.1f} users/s")
+    print(f"{User.objects.count()} users created")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Per-request database query instrumentation.
+
+``QueryBudgetMiddleware`` wraps every database connection for the duration
+of a request and records how many queries ran, how long they took and
+which SQL statements ran more than once (the usual sign of an N+1 access
+pattern). Viewsets may declare a budget per action, for instance (a made-up
+viewset; ``tasks.views.TaskViewSet`` has the real budgets)::
+
+    class ProjectViewSet(viewsets.ModelViewSet):
+        query_budgets = {"list": 2, "retrieve": 1}
+
+The stats are attached to the response as ``response.query_stats`` so the
+test suite can enforce the budgets (see ``task_manager.testing``), exposed
+as ``X-DB-*`` headers when ``DEBUG`` is on, and an over-budget request is
+logged. Instrumentation is enabled by the ``QUERY_INSTRUMENTATION`` setting,
+which defaults to ``DEBUG``.
+"""
+import logging
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.view = None
+        self.budget = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """SQL statements run more than once, with how many times they ran."""
+        return {sql: count for sql, count in self.statements.items() if count > 1}
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+
+def _budget_of(view_func, method):
+    """``(name, budget)`` declared by the viewset action serving ``method``."""
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return None, None
+    action = (getattr(view_func, "actions", None) or {}).get(method.lower())
+    name = f"{cls.__name__}.{action}" if action else cls.__name__
+    return name, getattr(cls, "query_budgets", {}).get(action)
+
+
+def _install(stats):
+    for connection in connections.all():
+        connection.execute_wrappers.append(stats)
+
+
+def _uninstall(stats):
+    for connection in connections.all():
+        if stats in connection.execute_wrappers:
+            connection.execute_wrappers.remove(stats)
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, "QUERY_INSTRUMENTATION", settings.DEBUG):
+            return self.get_response(request)
+
+        stats = request.query_stats = QueryStats()
+        _install(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _uninstall(stats)
+        return self.process_stats(response, stats)
+
+    async def __acall__(self, request):
+        if not getattr(settings, "QUERY_INSTRUMENTATION", settings.DEBUG):
+            return await self.get_response(request)
+
+        # Connections are per thread: the async ORM runs its queries in the
+        # request's thread-sensitive executor thread, so the wrapper is
+        # installed there rather than in the event loop thread.
+        stats = request.query_stats = QueryStats()
+        await sync_to_async(_install)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_uninstall)(stats)
+        return self.process_stats(response, stats)
+
+    def process_stats(self, response, stats):
+        response.query_stats = stats
+        if settings.DEBUG:
+            response.headers["X-DB-Query-Count"] = str(stats.count)
+            response.headers["X-DB-Query-Time"] = "%.3f" % (stats.duration * 1000)
+            response.headers["X-DB-Duplicate-Queries"] = str(
+                sum(count - 1 for count in stats.duplicates.values())
+            )
+            if stats.budget is not None:
+                response.headers["X-DB-Query-Budget"] = str(stats.budget)
+        if stats.over_budget:
+            logger.warning(
+                "%s ran %d queries, over its budget of %d.",
+                stats.view, stats.count, stats.budget,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = getattr(request, "query_stats", None)
+        if stats is not None:
+            stats.view, stats.budget = _budget_of(view_func, request.method)
@@ -0,0 +1,294 @@
+import json
+import operator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Estimated counts stop counting past this many rows.
+ESTIMATE_CAP = 10000
+
+
+def table_row_estimate(model, using):
+    """
+    Row count of ``model``'s table from the planner statistics (``ANALYZE``),
+    or ``None`` when there are none.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql, params = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]
+    elif connection.vendor == "sqlite":
+        sql, params = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NOT NULL LIMIT 1", [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 only exists once ANALYZE has run.
+        return None
+    if row is None:
+        return None
+    rows = int(str(row[0]).split()[0])
+    return rows if rows >= 0 else None
+
+
+def estimate_count(queryset, cap=ESTIMATE_CAP):
+    """
+    ``(count, exact)`` without a full ``COUNT(*)``.
+
+    An unfiltered queryset is answered from the planner statistics; a
+    filtered one is counted up to ``cap`` rows, past which the count is
+    reported as ``cap`` and not exact.
+    """
+    if not queryset.query.where:
+        rows = table_row_estimate(queryset.model, queryset.db)
+        if rows is not None:
+            return rows, False
+    # Only the primary key is selected, so annotations (e.g. a search rank)
+    # are not computed for the rows counted.
+    count = queryset.order_by().values("pk")[:cap + 1].count()
+    return min(count, cap), count <= cap
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Django ``Paginator`` counting with ``estimate_count``, for admin change
+    lists over large tables (set ``show_full_result_count = False`` too).
+    Past ``ESTIMATE_CAP`` rows the last pages are not reachable; narrow the
+    list with a filter or a search instead.
+    """
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)[0]
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the whole ordering tuple.
+
+    DRF's ``CursorPagination`` only filters on the first ordering field and
+    falls back to an OFFSET to step over ties. Here the cursor carries the
+    value of every ordering field of the boundary row and the next page is
+    selected with a lexicographic "after this row" predicate, so fetching a
+    page costs one index seek no matter how deep the client is, and rows
+    inserted concurrently never shift the pages that follow.
+
+    The ordering is the one already applied to the queryset (e.g. by an
+    ``OrderingFilter``) or ``ordering`` otherwise; the primary key is
+    appended as a tie-breaker when it is missing.
+
+    Pages carry no total by default. ``?count=exact`` adds one computed with
+    ``COUNT(*)``, ``?count=estimate`` one from ``estimate_count``; in both
+    cases ``count_exact`` tells whether it can be trusted as is.
+    """
+    ordering = ("-pk",)
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    count_query_param = "count"
+    estimate_cap = ESTIMATE_CAP
+    count_query_description = (
+        "exact : nombre total exact (COUNT(*)) ; estimate : estimation bon marché ; "
+        "absent : pas de total"
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        self.count = self.get_count(queryset, request)
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, fetching the page with the async ORM."""
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        self.count = await sync_to_async(self.get_count)(queryset, request)
+        return self.set_page([row async for row in page_queryset])
+
+    def get_count(self, queryset, request):
+        """``(count, exact)`` as requested with ``count_query_param``, or ``None``."""
+        mode = request.query_params.get(self.count_query_param)
+        if mode == "exact":
+            return queryset.count(), True
+        if mode == "estimate":
+            return estimate_count(queryset, self.estimate_cap)
+        return None
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "previous": self.get_previous_link()}
+        if self.count is not None:
+            payload["count"], payload["count_exact"] = self.count
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count"] = {"type": "integer", "example": 123}
+        schema["properties"]["count_exact"] = {"type": "boolean"}
+        return schema
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + [
+            coreapi.Field(
+                name=self.count_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.Enum(
+                    ["exact", "estimate"], title="Count", description=self.count_query_description
+                ),
+            )
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": self.count_query_description,
+                "schema": {"type": "string", "enum": ["exact", "estimate"]},
+            }
+        ]
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """The (lazy) queryset of the requested page plus one look-ahead row."""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor["reverse"])
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.cursor is not None:
+            try:
+                queryset = queryset.filter(
+                    self._keyset_filter(self.cursor["position"], reverse)
+                )
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        reverse = bool(self.cursor and self.cursor["reverse"])
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(queryset.query.order_by) or tuple(self.ordering)
+        assert all(isinstance(field, str) and "__" not in field for field in ordering), (
+            "Keyset pagination only supports orderings on plain field or "
+            "annotation names, got {ordering!r}.".format(ordering=ordering)
+        )
+        pk_name = queryset.model._meta.pk.name
+        if not {"pk", pk_name} & {field.lstrip("-") for field in ordering}:
+            ordering += ("-pk" if ordering[-1].startswith("-") else "pk",)
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor({"position": position, "reverse": False})
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor({"position": position, "reverse": True})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            tokens = json.loads(urlsafe_b64decode(padded.encode("ascii")))
+            position = tokens["p"]
+            reverse = bool(tokens.get("r", 0))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return {"position": position, "reverse": reverse}
+
+    def encode_cursor(self, cursor):
+        tokens = {"p": cursor["position"]}
+        if cursor["reverse"]:
+            tokens["r"] = 1
+        payload = json.dumps(tokens, separators=(",", ":"), default=str)
+        encoded = urlsafe_b64encode(payload.encode("ascii")).decode("ascii").rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            name = field.lstrip("-")
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(value if isinstance(value, (int, float)) else str(value))
+        return position
+
+    def _keyset_filter(self, position, reverse):
+        """
+        Build ``(f1, f2, ...) > (v1, v2, ...)`` honouring each field's direction.
+
+        The leading field is also bounded on its own so the database can seek
+        straight to the cursor instead of filtering the rows before it.
+        """
+        clauses = []
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != reverse
+            clauses.append(equal & Q(**{name + ("__lt" if descending else "__gt"): value}))
+            equal &= Q(**{name: value})
+
+        leading = self.ordering[0]
+        descending = leading.startswith("-") != reverse
+        bound = Q(**{leading.lstrip("-") + ("__lte" if descending else "__gte"): position[0]})
+        return bound & reduce(operator.or_, clauses)
+
+
+def _reverse_ordering(ordering_tuple):
+    return tuple(
+        field[1:] if field.startswith("-") else "-" + field
+        for field in ordering_tuple
+    )
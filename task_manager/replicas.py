@@ -0,0 +1,131 @@
+"""
+Read replicas.
+
+``ReplicaRouter`` sends the reads of safe (GET, HEAD, OPTIONS) requests to
+one of the ``DATABASE_REPLICAS`` aliases and everything else to
+``default``. A request sticks to the replica it first read from, so its
+queries (a page and its count, say) see the same snapshot.
+
+Replicas lag behind the primary, so a client must not read from one right
+after it wrote. ``ReplicaPinMiddleware`` pins the reads of a request to the
+primary:
+
+* for unsafe requests, and for the rest of a safe request once it wrote;
+* for ``REPLICA_PIN_SECONDS`` after a request that wrote, through a cookie,
+  so the client reads its own writes while the replicas catch up.
+
+Reads made outside a request (management commands, workers) and inside a
+transaction on the primary always go to the primary.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "db_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class _RequestState:
+    __slots__ = ("pinned", "wrote", "replica")
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+# Shared by reference with the threads the request's ORM calls run in under
+# ASGI, which is why the state is a mutable object rather than flags.
+_request_state = ContextVar("replica_request_state", default=None)
+
+
+def _replicas():
+    return getattr(settings, "DATABASE_REPLICAS", ())
+
+
+def current_replica():
+    """The replica the current request read from, or ``None``."""
+    state = _request_state.get()
+    return None if state is None else state.replica
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = _replicas()
+        if not replicas:
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db not in (DEFAULT_DB_ALIAS, *replicas):
+            # Follow objects loaded from an unrelated database.
+            return None
+        state = _request_state.get()
+        if state is None or state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in _replicas():
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = (DEFAULT_DB_ALIAS, *_replicas())
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        if db in _replicas():
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.request_state(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_state(response, state)
+
+    async def __acall__(self, request):
+        state = self.request_state(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_state(response, state)
+
+    def request_state(self, request):
+        return _RequestState(pinned=request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES)
+
+    def process_state(self, response, state):
+        if state.wrote and _replicas():
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
+
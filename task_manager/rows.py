@@ -0,0 +1,83 @@
+"""
+Read-only rendering of ``values()`` rows through a serializer's field list.
+
+Listing endpoints spend most of their time building model instances and
+walking ``Serializer.to_representation`` field by field. For plain
+``ModelSerializer`` fields the per-field work is known up front, so
+``compile_row_serializer`` generates one function that turns a ``values()``
+row into the same dict the serializer would produce, with the identity
+conversions (strings, choices, related primary keys) inlined away.
+
+Serializers with fields whose output cannot be derived from a single column
+(method fields, nested serializers, dotted sources, ...) are rejected; keep
+using the serializer for those, and for every write.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields, relations, serializers
+
+_MULTI_COLUMN_FIELDS = (
+    serializers.BaseSerializer,
+    relations.RelatedField,
+    relations.ManyRelatedField,
+    fields.SerializerMethodField,
+    fields.HiddenField,
+    fields.ListField,
+    fields.DictField,
+)
+
+
+def _converter(field):
+    """Callable giving ``field``'s representation of a column value, or ``None`` for identity."""
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        return None if field.pk_field is None else field.pk_field.to_representation
+    if isinstance(field, _MULTI_COLUMN_FIELDS):
+        _unsupported(field)
+    if isinstance(field, fields.ChoiceField):
+        if all(key == value for key, value in field.choice_strings_to_values.items()):
+            return None
+        return field.to_representation
+    if type(field) in (fields.CharField, fields.EmailField, fields.SlugField):
+        # Text columns already come back as ``str``.
+        return None
+    return field.to_representation
+
+
+def _unsupported(field):
+    raise ImproperlyConfigured(
+        "compile_row_serializer() cannot render {name!r} ({cls}) from a single column.".format(
+            name=field.field_name, cls=type(field).__name__
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def compile_row_serializer(serializer_class):
+    """
+    Return ``(columns, to_representation)`` for ``serializer_class``.
+
+    ``columns`` are the model field names to pass to ``values()``; the
+    function maps one such row to the dict ``serializer_class(instance).data``
+    would hold, in the same key order.
+    """
+    serializer = serializer_class()
+    columns = []
+    namespace = {}
+    items = []
+    for index, (name, field) in enumerate(serializer.fields.items()):
+        if field.write_only:
+            continue
+        if field.source == "*" or "." in field.source:
+            _unsupported(field)
+        converter = _converter(field)
+        columns.append(field.source)
+        value = "row[%r]" % field.source
+        if converter is not None:
+            namespace["c%d" % index] = converter
+            value = "(None if %s is None else c%d(%s))" % (value, index, value)
+        items.append("%r: %s" % (name, value))
+
+    source = "def to_representation(row):\n    return {%s}\n" % ", ".join(items)
+    exec(compile(source, "<%s rows>" % serializer_class.__name__, "exec"), namespace)
+    return tuple(columns), namespace["to_representation"]
@@ -33,6 +33,10 @@ SECRET_KEY = 'django-insecure-he8#x@wu(!b(4qumu3h2=yt3%3#$4slzl^x1^rgc(w!jug#kr!
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env.bool("DEBUG", default=False)
 
+# Record query count/time per request and check the viewsets' query
+# budgets (see task_manager/middleware.py); exposed as headers in DEBUG.
+QUERY_INSTRUMENTATION = env.bool("QUERY_INSTRUMENTATION", default=DEBUG)
+
 ALLOWED_HOSTS = ["*"]
 CORS_ORIGIN_ALLOW_ALL = True
 
@@ -62,6 +66,8 @@ INSTALLED_APPS = [
 ] + LOCAL_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
+    'task_manager.replicas.ReplicaPinMiddleware',
+    'task_manager.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -95,7 +101,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
     'DATETIME_FORMAT': 'timestamp',
@@ -121,6 +127,22 @@ WSGI_APPLICATION = 'task_manager.wsgi.application'
 AUTH_USER_MODEL = 'accounts.User'
 
 # Simple JWT settings
+# Authenticated users are cached per process for AUTH_USER_CACHE_TTL seconds
+# (and in the AUTH_USER_CACHE_ALIAS cache, when set, shared between
+# processes); see accounts/authentication.py.
+AUTH_USER_CACHE_TTL = env.int("AUTH_USER_CACHE_TTL", default=30)
+AUTH_USER_CACHE_SIZE = env.int("AUTH_USER_CACHE_SIZE", default=10000)
+AUTH_USER_CACHE_ALIAS = env("AUTH_USER_CACHE_ALIAS", default=None)
+
+# Passwords are hashed and checked in a pool of PASSWORD_HASHING_WORKERS
+# processes (0 hashes on the request thread); at most PASSWORD_HASHING_QUEUE
+# operations per worker are in flight, and callers that cannot get a slot
+# within PASSWORD_HASHING_QUEUE_TIMEOUT seconds get a 503. See
+# accounts/hashing.py.
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=2)
+PASSWORD_HASHING_QUEUE = env.int("PASSWORD_HASHING_QUEUE", default=8)
+PASSWORD_HASHING_QUEUE_TIMEOUT = env.float("PASSWORD_HASHING_QUEUE_TIMEOUT", default=2.0)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=2),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=5),
@@ -144,19 +166,91 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_SERIALIZER': 'rest_framework.simplejwt.serializers.TokenRefreshSlidingSerializer',
 }
 
+# Tasks delta sync: deletion tombstones older than this are compacted and
+# sync cursors issued before it are rejected (see tasks/changes.py).
+TASK_TOMBSTONE_RETENTION_DAYS = env.int("TASK_TOMBSTONE_RETENTION_DAYS", default=30)
+
+# Due-date reminders: tasks due within this many days (or overdue) are
+# mailed to their owner (see tasks/reminders.py).
+TASK_REMINDER_LEAD_DAYS = env.int("TASK_REMINDER_LEAD_DAYS", default=1)
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite is set up for several worker processes writing at once: with WAL
+# readers do not block the writer, writers wait up to SQLITE_BUSY_TIMEOUT ms
+# for the write lock, and transactions take that lock when they start
+# (BEGIN IMMEDIATE) so they queue instead of failing with "database is
+# locked". Connections are reused for CONN_MAX_AGE seconds.
+# See task_manager/sqlite3/base.py.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'task_manager.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': env.int("CONN_MAX_AGE", default=600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                # busy_timeout first: switching to WAL needs the lock.
+                'busy_timeout': env.int("SQLITE_BUSY_TIMEOUT", default=5000),
+                'journal_mode': env("SQLITE_JOURNAL_MODE", default="wal"),
+                'synchronous': env("SQLITE_SYNCHRONOUS", default="normal"),
+                'mmap_size': env.int("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024),
+                # Negative: KiB rather than pages.
+                'cache_size': env.int("SQLITE_CACHE_SIZE", default=-64000),
+                'temp_store': 'memory',
+            },
+        },
     },
     'test': {
         'NAME': f"test_{env('DB_NAME', default='test_db')}",
     }
 }
 
+# Read replicas: safe requests read from one of DATABASE_REPLICAS, writes
+# and the reads of a client that wrote in the last REPLICA_PIN_SECONDS go
+# to "default" (see task_manager/replicas.py). Locally, list SQLite files
+# in SQLITE_REPLICAS and copy the primary into them with
+# "manage.py sync_replicas".
+for index, name in enumerate(env.list("SQLITE_REPLICAS", default=[]), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+
+# Task shards: an owner's tasks live in one of TASK_SHARDS, users stay in
+# "default" (see tasks/shards.py). Locally, list SQLite files in
+# SQLITE_TASK_SHARDS to add them as shards tasks1..N next to "default";
+# create their tables with "manage.py migrate --database tasksN" and spread
+# the existing owners with "manage.py rebalance_task_shards --all".
+for index, name in enumerate(env.list("SQLITE_TASK_SHARDS", default=[]), start=1):
+    DATABASES[f'tasks{index}'] = {**DATABASES['default'], 'NAME': name}
+TASK_SHARDS = ['default'] + [alias for alias in DATABASES if alias.startswith('tasks')]
+
+DATABASE_ROUTERS = ['tasks.shards.TaskShardRouter', 'task_manager.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=5)
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# CACHE_URL picks the backend: locmemcache:// (per process, the default),
+# filecache:///var/tmp/task_manager (shared by the processes of a host),
+# redis://... or pymemcache://... The task list, detail and dashboard
+# responses are cached per user for TASK_RESPONSE_CACHE_TTL seconds (0
+# disables it) in TASK_RESPONSE_CACHE_ALIAS; see tasks/cache.py. A write only
+# invalidates the entries of the cache it reaches, so the TTL defaults to 0
+# when that cache is local to the process.
+CACHES = {
+    'default': env.cache_url("CACHE_URL", default="locmemcache://"),
+}
+TASK_RESPONSE_CACHE_ALIAS = env("TASK_RESPONSE_CACHE_ALIAS", default="default")
+TASK_RESPONSE_CACHE_TTL = env.int(
+    "TASK_RESPONSE_CACHE_TTL",
+    default=0 if CACHES.get(TASK_RESPONSE_CACHE_ALIAS, {}).get('BACKEND', '').endswith('.LocMemCache') else 300,
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -209,3 +303,13 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
+
+# Emails are queued in the outbox and sent by `manage.py send_outbox_emails`
+# (see accounts/outbox.py); an email is given up after this many attempts.
+# The worker's SMTP connection is closed after EMAIL_OUTBOX_IDLE_TIMEOUT
+# seconds without anything to send.
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int("EMAIL_OUTBOX_MAX_ATTEMPTS", default=8)
+EMAIL_OUTBOX_IDLE_TIMEOUT = env.float("EMAIL_OUTBOX_IDLE_TIMEOUT", default=30.0)
+
+# Base URL of the front-end, used in the links sent by email.
+FRONTEND_URL = env("FRONTEND_URL", default="http://localhost:3000")
@@ -0,0 +1,55 @@
+"""
+SQLite backend for several worker processes writing to the same file.
+
+It accepts two ``OPTIONS`` on top of the stock backend:
+
+* ``pragmas``: ``{name: value}`` applied to every new connection (WAL
+  journaling, busy timeout, cache sizes, ...);
+* ``transaction_mode``: ``"IMMEDIATE"`` makes ``transaction.atomic`` start
+  with ``BEGIN IMMEDIATE``, like the option Django 5.1 adds. A deferred
+  transaction that reads before it writes has to upgrade its lock, and
+  SQLite fails that upgrade with "database is locked" at once, without
+  waiting for ``busy_timeout``, when another connection is writing. Taking
+  the write lock up front makes writers queue on the busy timeout instead.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+_PRAGMA_NAME = re.compile(r"[a-z_]+", re.IGNORECASE)
+_PRAGMA_VALUE = re.compile(r"-?\w+")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    transaction_modes = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+    pragmas = {}
+    transaction_mode = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        pragmas = kwargs.pop("pragmas", {})
+        for name, value in pragmas.items():
+            if not _PRAGMA_NAME.fullmatch(name) or not _PRAGMA_VALUE.fullmatch(str(value)):
+                raise ImproperlyConfigured(f"Invalid SQLite pragma {name} = {value!r}.")
+        transaction_mode = kwargs.pop("transaction_mode", None)
+        if transaction_mode is not None:
+            transaction_mode = transaction_mode.upper()
+            if transaction_mode not in self.transaction_modes:
+                raise ImproperlyConfigured(
+                    f"transaction_mode must be one of {', '.join(self.transaction_modes)}."
+                )
+        self.pragmas, self.transaction_mode = pragmas, transaction_mode
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
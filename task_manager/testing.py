@@ -0,0 +1,38 @@
+"""
+Test helpers shared by the apps' test suites.
+"""
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+@override_settings(QUERY_INSTRUMENTATION=True)
+class QueryBudgetTestCase(APITestCase):
+    """
+    Enforce the ``query_budgets`` declared by viewsets.
+
+    Requests made through the test client carry the stats recorded by
+    ``task_manager.middleware.QueryBudgetMiddleware``; call
+    ``assertWithinQueryBudget`` on the response. Use ``authenticate`` rather
+    than ``force_authenticate`` so the budget covers the JWT authentication
+    as it runs in production.
+    """
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+    def assertWithinQueryBudget(self, response):
+        stats = getattr(response, "query_stats", None)
+        self.assertIsNotNone(stats, "The request was not instrumented.")
+        self.assertIsNotNone(stats.budget, f"{stats.view} does not declare a query budget.")
+        statements = "\n".join(stats.statements)
+        self.assertLessEqual(
+            stats.count,
+            stats.budget,
+            f"{stats.view} ran {stats.count} queries, over its budget of {stats.budget}:\n{statements}",
+        )
+        self.assertEqual(
+            stats.duplicates,
+            {},
+            f"{stats.view} ran the same statement several times (N+1?).",
+        )
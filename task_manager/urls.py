@@ -47,4 +47,5 @@ urlpatterns = [
     path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('', include('accounts.urls')),
     path('', include('tasks.urls')),
+    path('async/', include('tasks.async_urls')),
 ]
@@ -1,3 +1,105 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
 
-# Register your models here.
+from task_manager.pagination import EstimatedCountPaginator
+from .models import Tasks
+from .search import search_tasks
+from .shards import is_sharded, task_databases
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """The task database the change list reads: shards cannot be listed together."""
+    title = _("shard")
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in task_databases()]
+
+    def value(self):
+        value = super().value()
+        return value if value in task_databases() else DEFAULT_DB_ALIAS
+
+    def choices(self, changelist):
+        for lookup, title in self.lookup_choices:
+            yield {
+                "selected": self.value() == lookup,
+                "query_string": changelist.get_query_string({self.parameter_name: lookup}),
+                "display": title,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset.using(self.value())
+
+
+@admin.register(Tasks)
+class TasksAdmin(admin.ModelAdmin):
+    """
+    With several task shards (``tasks.shards``), the change list shows one
+    shard at a time, ``default`` unless another is picked in the filter.
+    Owners are read from ``default`` rather than joined, and the owner of a
+    task cannot be changed here: that would leave it in the wrong shard.
+    """
+    list_display = (
+        'title',
+        'owner',
+        'status',
+        'due_date',
+        'updated_at',
+    )
+    list_filter = ('status',)
+    list_select_related = ('owner',)
+    autocomplete_fields = ('owner',)
+    search_fields = ('title', 'description')
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('-updated_at',)
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if is_sharded():
+            # The shards have no user table to join: see TaskShardRouter.
+            return queryset.prefetch_related('owner')
+        return queryset
+
+    def get_list_select_related(self, request):
+        if is_sharded():
+            return ()
+        return super().get_list_select_related(request)
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if is_sharded():
+            return (ShardListFilter, *list_filter)
+        return list_filter
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = super().get_readonly_fields(request, obj)
+        if obj is not None and is_sharded():
+            return (*readonly_fields, 'owner')
+        return readonly_fields
+
+    def get_object(self, request, object_id, from_field=None):
+        if not is_sharded():
+            return super().get_object(request, object_id, from_field)
+        # Change links do not say which shard the task is in.
+        field = self.model._meta.pk if from_field is None else self.model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+        except ValidationError:
+            return None
+        queryset = self.get_queryset(request)
+        for alias in task_databases():
+            obj = queryset.using(alias).filter(**{field.name: object_id}).first()
+            if obj is not None:
+                return obj
+        return None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        # The change list applies its own ordering: skip the relevance rank.
+        return search_tasks(queryset, search_term, ranked=False), False
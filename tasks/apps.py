@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
+
+    def ready(self):
+        from .models import Tasks
+        from .signals import install_database_objects, invalidate_cached_responses, release_sharded_tasks
+
+        post_migrate.connect(install_database_objects, sender=self)
+        post_delete.connect(release_sharded_tasks, sender=settings.AUTH_USER_MODEL)
+        post_save.connect(invalidate_cached_responses, sender=Tasks)
+        post_delete.connect(invalidate_cached_responses, sender=Tasks)
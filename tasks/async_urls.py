@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .async_views import TaskDashboardView, TaskDetailView, TaskListView
+
+urlpatterns = [
+    path('tasks/', TaskListView.as_view(), name='async-task-list'),
+    path('tasks/dashboard/', TaskDashboardView.as_view(), name='async-task-dashboard'),
+    path('tasks/<uuid:pk>/', TaskDetailView.as_view(), name='async-task-detail'),
+]
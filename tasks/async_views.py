@@ -0,0 +1,132 @@
+"""
+Native async implementations of the hot task endpoints, for ASGI deployments.
+
+DRF views are synchronous: under ASGI every request to ``TaskViewSet`` is
+handed to a worker thread through ``sync_to_async``. The views below serve
+the same list, retrieve, create and dashboard operations as coroutines.
+JWT authentication and every query go through the async ORM (``aget``,
+``afirst``, ``asave``, async iteration), and validation reuses
+``TaskSerializer``, ``TaskFilter`` and ``TaskPagination``, so responses
+match the sync routes byte for byte.
+
+They are mounted under ``/async/`` (see ``tasks/async_urls.py``); the sync
+routes are unchanged.
+"""
+from django.http import Http404, HttpResponse
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import exceptions, status
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from accounts.authentication import AsyncJWTAuthentication
+from task_manager.rows import compile_row_serializer
+
+from .conditional import alist_validators, not_modified, payload_etag, set_validators, task_etag
+from .counters import astatus_distribution
+from .filters import TaskFilter
+from .models import Tasks
+from .pagination import TaskPagination
+from .serializers import TaskSerializer
+
+
+class AsyncTaskView(View):
+    """Authenticates the request and turns API exceptions into JSON responses, like ``APIView``."""
+    authentication = AsyncJWTAuthentication()
+    parsers = (JSONParser(), FormParser(), MultiPartParser())
+    renderer = JSONRenderer()
+    filterset_class = TaskFilter
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Authentication is header based, as on the DRF routes.
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, parsers=self.parsers, authenticators=())
+        self.request = request
+        try:
+            authenticated = await self.authentication.aauthenticate(request)
+            if authenticated is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = authenticated
+            return await super().dispatch(request, *args, **kwargs)
+        except (exceptions.APIException, Http404) as exc:
+            return self.handle_exception(exc)
+
+    def handle_exception(self, exc):
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.status_code = status.HTTP_401_UNAUTHORIZED
+            headers["WWW-Authenticate"] = self.authentication.authenticate_header(self.request)
+        response = exception_handler(exc, {"view": self, "request": self.request})
+        response = self.render(response.data, response.status_code)
+        for header, value in headers.items():
+            response.headers[header] = value
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status_code,
+            content_type="application/json",
+        )
+
+    def get_queryset(self):
+        # Through the user, so the shard router reads from their shard.
+        return self.request.user.tasks.all()
+
+
+class TaskListView(AsyncTaskView):
+    async def get(self, request):
+        queryset = DjangoFilterBackend().filter_queryset(request, self.get_queryset(), self)
+        etag, last_modified = await alist_validators(request, queryset)
+        cached = not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
+
+        paginator = TaskPagination()
+        columns, to_representation = compile_row_serializer(TaskSerializer)
+        keys = set(columns)
+        keys.update(field.lstrip("-") for field in paginator.get_ordering(request, queryset, self))
+        page = await paginator.apaginate_queryset(queryset.values(*keys), request, self)
+        data = paginator.get_paginated_response([to_representation(row) for row in page]).data
+        return set_validators(self.render(data), etag, last_modified)
+
+    async def post(self, request):
+        serializer = TaskSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        task = Tasks(owner=request.user, **serializer.validated_data)
+        await task.asave()
+        return self.render(TaskSerializer(task).data, status.HTTP_201_CREATED)
+
+
+class TaskDetailView(AsyncTaskView):
+    async def get(self, request, pk):
+        try:
+            instance = await self.get_queryset().aget(pk=pk)
+        except Tasks.DoesNotExist:
+            raise exceptions.NotFound()
+        etag = task_etag(instance)
+        cached = not_modified(request, etag, instance.updated_at)
+        if cached is not None:
+            return cached
+        return set_validators(self.render(TaskSerializer(instance).data), etag, instance.updated_at)
+
+
+class TaskDashboardView(AsyncTaskView):
+    async def get(self, request):
+        distribution = await astatus_distribution(request.user, using=self.get_queryset().db)
+        data = {
+            "total_tasks" : sum(row["count"] for row in distribution),
+            "status_distribution": distribution,
+        }
+        etag = payload_etag(data)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        return set_validators(self.render(data), etag)
@@ -0,0 +1,171 @@
+"""
+Per-user response cache for the task read endpoints.
+
+``GET /tasks/`` (keyed by its normalized query string), ``GET /tasks/<id>/``
+and ``GET /tasks/dashboard/`` keep what they rendered, with its ETag and
+Last-Modified, in the ``TASK_RESPONSE_CACHE_ALIAS`` cache. A hit is served
+without touching the database, conditional requests included.
+
+Entries are never deleted. Every key embeds the owner's generation, a
+counter kept in the same cache that ``invalidate_owner`` bumps whenever one
+of the owner's tasks is written. The ``Tasks`` post_save/post_delete
+receivers (``tasks.signals``) call it, and so do the write paths that skip
+those signals (``QuerySet.update``, ``bulk_create``, the importer's raw
+INSERT). Invalidation is one increment, whatever the number of cached
+entries, and stale entries simply age out. The repair commands, which
+rewrite what responses are computed from (search index, status counters),
+bump every owner of the database with ``invalidate_database``.
+
+The generation is bumped on the write and again when its transaction
+commits, so a read that ran in between cannot keep pre-commit data under
+the new generation. A response read from a replica (``task_manager.replicas``)
+may lag behind the primary and is only kept for ``REPLICA_PIN_SECONDS``.
+
+Hits and misses are counted per endpoint in the cache too, and exposed by
+``GET /tasks/cache-stats/``; each response says which it was in ``X-Cache``.
+The backend is any Django cache (``CACHE_URL``) shared by the processes
+serving requests (``filecache://``, Redis, Memcached): a write has to
+invalidate the entries of every process. The local memory default is per
+process, so with it ``TASK_RESPONSE_CACHE_TTL`` defaults to 0 and the cache
+is off; set the TTL explicitly to use it in a single-process deployment.
+The file-based backend does not increment atomically, so its hit/miss
+counts are approximate.
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.response import Response
+
+from task_manager.replicas import current_replica
+
+from .conditional import not_modified, set_validators
+from .models import Tasks
+
+ENDPOINTS = ("list", "retrieve", "dashboard")
+
+
+class TaskResponseCache:
+    key_prefix = "task-response"
+
+    @property
+    def ttl(self):
+        return settings.TASK_RESPONSE_CACHE_TTL
+
+    @property
+    def cache(self):
+        return caches[settings.TASK_RESPONSE_CACHE_ALIAS]
+
+    def _generation_key(self, owner_id):
+        return f"{self.key_prefix}:gen:{owner_id}"
+
+    def _stats_key(self, endpoint, outcome):
+        return f"{self.key_prefix}:stats:{endpoint}:{outcome}"
+
+    def generation(self, owner_id):
+        key = self._generation_key(owner_id)
+        generation = self.cache.get(key)
+        if generation is None:
+            # Start from the clock rather than 0, so a counter that was
+            # evicted never comes back to a value earlier entries used.
+            self.cache.add(key, time.time_ns(), None)
+            generation = self.cache.get(key, time.time_ns())
+        return generation
+
+    def bump(self, owner_id):
+        key = self._generation_key(owner_id)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, time.time_ns(), None)
+
+    def _count(self, endpoint, outcome):
+        key = self._stats_key(endpoint, outcome)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            if not self.cache.add(key, 1, None):
+                self.cache.incr(key)
+
+    def lookup(self, request, endpoint):
+        """
+        Return ``(key, entry)`` for ``request``; ``entry`` is ``None`` on a
+        miss, and ``key`` is ``None`` when the cache is disabled.
+        """
+        if self.ttl <= 0:
+            return None, None
+        query = sorted(
+            (name, values) for name, values in request.query_params.lists() if any(values)
+        )
+        digest = hashlib.sha256(
+            "|".join([request.build_absolute_uri(request.path), str(query)]).encode()
+        ).hexdigest()[:32]
+        key = f"{self.key_prefix}:{request.user.pk}:{self.generation(request.user.pk)}:{digest}"
+        entry = self.cache.get(key)
+        self._count(endpoint, "miss" if entry is None else "hit")
+        return key, entry
+
+    def store(self, key, response, etag, last_modified=None):
+        """Keep ``response``'s data and validators under ``key``; returns ``response``."""
+        if key is not None:
+            ttl = self.ttl
+            if current_replica() is not None:
+                ttl = min(ttl, settings.REPLICA_PIN_SECONDS)
+            self.cache.set(key, (response.data, etag, last_modified), ttl)
+            response.headers["X-Cache"] = "MISS"
+        return set_validators(response, etag, last_modified)
+
+    def respond(self, request, entry):
+        """The response to ``request`` for a cached ``entry``: a 304 or the cached data."""
+        data, etag, last_modified = entry
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = set_validators(Response(data), etag, last_modified)
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+    def stats(self):
+        """Hits, misses and hit ratio of each endpoint, and overall."""
+        keys = {
+            (endpoint, outcome): self._stats_key(endpoint, outcome)
+            for endpoint in ENDPOINTS
+            for outcome in ("hit", "miss")
+        }
+        counts = self.cache.get_many(keys.values())
+        stats = {}
+        for endpoint in (*ENDPOINTS, "total"):
+            if endpoint == "total":
+                hits = sum(row["hits"] for row in stats.values())
+                misses = sum(row["misses"] for row in stats.values())
+            else:
+                hits = counts.get(keys[endpoint, "hit"], 0)
+                misses = counts.get(keys[endpoint, "miss"], 0)
+            lookups = hits + misses
+            stats[endpoint] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            }
+        return stats
+
+
+response_cache = TaskResponseCache()
+
+
+def invalidate_owner(owner_id, using=DEFAULT_DB_ALIAS):
+    """Make every cached response of ``owner_id`` stale, now and when ``using`` commits."""
+    if owner_id is None or response_cache.ttl <= 0:
+        return
+    response_cache.bump(owner_id)
+    if connections[using].in_atomic_block:
+        transaction.on_commit(partial(response_cache.bump, owner_id), using=using)
+
+
+def invalidate_database(using=DEFAULT_DB_ALIAS):
+    """Make the cached responses of every owner with tasks in ``using`` stale (after a repair)."""
+    owners = Tasks.objects.using(using).exclude(owner=None).values_list("owner_id", flat=True).distinct()
+    for owner_id in owners.order_by().iterator():
+        invalidate_owner(owner_id, using)
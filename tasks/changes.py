@@ -0,0 +1,162 @@
+"""
+Change log behind the delta sync endpoint (``GET /tasks/changes/``).
+
+On SQLite, triggers on ``tasks_tasks`` keep one ``TaskChange`` row per
+(task, owner) and give it a fresh, monotonic sequence number on every
+write. Deleting a task, or moving it to another owner, turns the previous
+owner's row into a tombstone. A client that remembers the last sequence
+it has seen only needs the rows above it, so sync traffic is proportional
+to what changed rather than to the number of tasks.
+
+Tombstones are purged once older than ``TASK_TOMBSTONE_RETENTION_DAYS``;
+cursors issued before that horizon are rejected with 410 so the client
+falls back to a full resync instead of missing deletions.
+"""
+import json
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import TaskChange, Tasks
+
+TASKS_TABLE = Tasks._meta.db_table
+CHANGE_TABLE = TaskChange._meta.db_table
+TRIGGER_PREFIX = f"{CHANGE_TABLE}_on"
+
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _record(row, owner, deleted):
+    return f"""
+    DELETE FROM {CHANGE_TABLE} WHERE task_id = {row}.id AND owner_id = {owner};
+    INSERT INTO {CHANGE_TABLE}(task_id, owner_id, deleted, changed_at)
+    VALUES ({row}.id, {owner}, {deleted}, {_NOW});
+    """
+
+
+CHANGE_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_insert AFTER INSERT ON {TASKS_TABLE}
+    WHEN new.owner_id IS NOT NULL BEGIN {_record("new", "new.owner_id", 0)} END
+    """,
+    # An owner set to NULL only happens when the user is deleted, and their
+    # change rows go with them, so no tombstone is written in that case.
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_update_old AFTER UPDATE ON {TASKS_TABLE}
+    WHEN old.owner_id IS NOT NULL AND new.owner_id IS NOT NULL AND old.owner_id != new.owner_id
+    BEGIN {_record("old", "old.owner_id", 1)} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_update_new AFTER UPDATE ON {TASKS_TABLE}
+    WHEN new.owner_id IS NOT NULL BEGIN {_record("new", "new.owner_id", 0)} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_delete AFTER DELETE ON {TASKS_TABLE}
+    WHEN old.owner_id IS NOT NULL BEGIN {_record("old", "old.owner_id", 1)} END
+    """,
+]
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = _("This sync cursor is too old, fetch the full task list again.")
+    default_code = "cursor_expired"
+
+
+def is_supported(using):
+    return connections[using].vendor == "sqlite"
+
+
+def install_change_triggers(using="default"):
+    """Create the change log triggers, seeding the log the first time they are installed."""
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+            [f"{TRIGGER_PREFIX}_insert"],
+        )
+        installed = cursor.fetchone() is not None
+        for statement in CHANGE_TRIGGERS_SQL:
+            cursor.execute(statement)
+        if not installed:
+            cursor.execute(
+                f"""
+                INSERT OR IGNORE INTO {CHANGE_TABLE}(task_id, owner_id, deleted, changed_at)
+                SELECT id, owner_id, 0, updated_at FROM {TASKS_TABLE}
+                WHERE owner_id IS NOT NULL
+                ORDER BY updated_at
+                """
+            )
+
+
+def retention():
+    return timedelta(days=settings.TASK_TOMBSTONE_RETENTION_DAYS)
+
+
+def encode_cursor(sequence):
+    payload = json.dumps({"s": sequence, "t": int(time.time())}, separators=(",", ":"))
+    return urlsafe_b64encode(payload.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(encoded):
+    """Return the sequence stored in ``encoded`` (0 when there is no cursor)."""
+    if not encoded:
+        return 0
+    try:
+        padded = encoded + "=" * (-len(encoded) % 4)
+        tokens = json.loads(urlsafe_b64decode(padded.encode("ascii")))
+        sequence, issued_at = int(tokens["s"]), int(tokens["t"])
+    except (TypeError, ValueError, KeyError):
+        raise ValidationError({"since": [_("Invalid cursor.")]})
+    if time.time() - issued_at > retention().total_seconds():
+        raise CursorExpired()
+    return sequence
+
+
+def changes_since(owner, sequence, limit, using="default"):
+    """Return up to ``limit`` change rows of ``owner`` after ``sequence`` and whether more follow."""
+    rows = list(
+        TaskChange.objects.using(using)
+        .filter(owner=owner, pk__gt=sequence)
+        .order_by("pk")[:limit + 1]
+    )
+    return rows[:limit], len(rows) > limit
+
+
+def _latest_change_queryset(owner, using):
+    return (
+        TaskChange.objects.using(using)
+        .filter(owner=owner)
+        .order_by("-pk")
+        .values_list("pk", "changed_at")
+    )
+
+
+def latest_change(owner, using="default"):
+    """``(sequence, changed_at)`` of the most recent change of ``owner``'s tasks."""
+    return _latest_change_queryset(owner, using).first() or (0, None)
+
+
+async def alatest_change(owner, using="default"):
+    return await _latest_change_queryset(owner, using).afirst() or (0, None)
+
+
+def compact_tombstones(before=None, batch_size=10000, using="default"):
+    """Delete tombstones older than ``before`` in short batches; returns how many went."""
+    before = before or timezone.now() - retention()
+    expired = TaskChange.objects.using(using).filter(deleted=True, changed_at__lt=before)
+    removed = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(expired.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                return removed
+            removed += TaskChange.objects.using(using).filter(pk__in=batch).delete()[0]
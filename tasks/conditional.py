@@ -0,0 +1,110 @@
+"""
+HTTP validators (ETag / Last-Modified) for the task endpoints.
+
+Validators are computed from cheap, index-covered data before anything is
+serialized, so a client polling an unchanged resource gets a 304 for the
+price of one small query:
+
+* a task list is identified by the user, the query string and the user's
+  latest change sequence from the change log (``tasks.changes``), which
+  moves on every insert, update and delete. Without the change log the
+  number of matching rows and their latest ``updated_at`` are used instead;
+  that ``Last-Modified`` cannot observe deletions, which is why the ETag
+  takes precedence whenever the client sends both.
+* a single task by its id and ``updated_at``. The same ETag is the version
+  a client sends back in ``If-Match`` to make a PUT/PATCH conditional.
+* the dashboard by a digest of its (already cheap) payload.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import changes
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _("The task has changed since it was fetched, reload it and retry.")
+    default_code = "precondition_failed"
+
+
+class EditConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("The task was modified by another request, retry.")
+    default_code = "edit_conflict"
+
+
+def _digest(*parts):
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+
+def _list_stats(queryset):
+    return queryset.order_by().aggregate(count=Count("pk"), last_modified=Max("updated_at"))
+
+
+def _list_etag(request, *state):
+    query = sorted(request.query_params.lists())
+    return '"%s"' % _digest(request.user.pk, request.path, query, *state)
+
+
+def list_validators(request, queryset):
+    """Return ``(etag, last_modified)`` for a filtered task list."""
+    if changes.is_supported(queryset.db):
+        sequence, last_modified = changes.latest_change(request.user, using=queryset.db)
+        return _list_etag(request, sequence), last_modified
+    stats = _list_stats(queryset)
+    last_modified = stats["last_modified"]
+    return _list_etag(request, stats["count"], last_modified.isoformat() if last_modified else ""), last_modified
+
+
+async def alist_validators(request, queryset):
+    if changes.is_supported(queryset.db):
+        sequence, last_modified = await changes.alatest_change(request.user, using=queryset.db)
+        return _list_etag(request, sequence), last_modified
+    # QuerySet.aaggregate() only exists from Django 5.0.
+    stats = await sync_to_async(_list_stats)(queryset)
+    last_modified = stats["last_modified"]
+    return _list_etag(request, stats["count"], last_modified.isoformat() if last_modified else ""), last_modified
+
+
+def task_etag(task):
+    """Strong ETag of one task: its id and ``updated_at`` in microseconds."""
+    version = (task.updated_at - _EPOCH) // timedelta(microseconds=1)
+    return '"%s-%x"' % (task.pk.hex, version)
+
+
+def payload_etag(data):
+    return '"%s"' % _digest(json.dumps(data, sort_keys=True, default=str))
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 (or 412) response if the request preconditions allow it, else ``None``."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    # Responses are per user: shared caches must not store them and clients
+    # must revalidate before reusing them.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Authorization",))
+    return response
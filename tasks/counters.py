@@ -0,0 +1,159 @@
+"""
+Per-owner task counts by status.
+
+On SQLite the ``TaskStatusCounter`` rows are maintained by triggers on
+``tasks_tasks``: inserts, deletes and changes of ``status`` or ``owner``
+adjust the matching rows in the same transaction as the write, whichever
+code path issued it (``save``, ``bulk_create``, ``bulk_update``,
+``QuerySet.update``/``delete`` or an owner being deleted). Reading the
+dashboard is then a lookup on the ``(owner, status)`` unique index.
+
+``reconcile_status_counters`` recomputes every row from ``tasks_tasks``.
+Other backends aggregate over the tasks table directly.
+"""
+from collections import defaultdict
+
+from django.db import connections, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Tasks, TaskStatusCounter
+from .shards import shard_for
+
+TASKS_TABLE = Tasks._meta.db_table
+COUNTER_TABLE = TaskStatusCounter._meta.db_table
+TRIGGER_PREFIX = f"{COUNTER_TABLE}_on"
+
+_INCREMENT = f"""
+    INSERT INTO {COUNTER_TABLE}(owner_id, status, count) VALUES (new.owner_id, new.status, 1)
+    ON CONFLICT(owner_id, status) DO UPDATE SET count = count + 1;
+"""
+_DECREMENT = f"""
+    UPDATE {COUNTER_TABLE} SET count = count - 1
+    WHERE owner_id = old.owner_id AND status = old.status;
+"""
+
+COUNTER_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_insert AFTER INSERT ON {TASKS_TABLE}
+    WHEN new.owner_id IS NOT NULL BEGIN {_INCREMENT} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_delete AFTER DELETE ON {TASKS_TABLE}
+    WHEN old.owner_id IS NOT NULL BEGIN {_DECREMENT} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_update_old AFTER UPDATE OF status, owner_id ON {TASKS_TABLE}
+    WHEN old.owner_id IS NOT NULL
+        AND (old.status IS NOT new.status OR old.owner_id IS NOT new.owner_id)
+    BEGIN {_DECREMENT} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_update_new AFTER UPDATE OF status, owner_id ON {TASKS_TABLE}
+    WHEN new.owner_id IS NOT NULL
+        AND (old.status IS NOT new.status OR old.owner_id IS NOT new.owner_id)
+    BEGIN {_INCREMENT} END
+    """,
+]
+
+
+def is_supported(using):
+    return connections[using].vendor == "sqlite"
+
+
+def install_counter_triggers(using="default"):
+    """
+    Create the counter triggers if they do not exist yet.
+
+    Counters start from a reconciliation the first time the triggers are
+    installed, so a database that already holds tasks is counted correctly.
+    """
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+            [f"{TRIGGER_PREFIX}_insert"],
+        )
+        installed = cursor.fetchone() is not None
+        for statement in COUNTER_TRIGGERS_SQL:
+            cursor.execute(statement)
+    if not installed:
+        reconcile_status_counters(using)
+
+
+def reconcile_status_counters(using="default"):
+    """Rebuild every counter row from the tasks table; returns the number of rows written."""
+    with transaction.atomic(using=using):
+        TaskStatusCounter.objects.using(using).all().delete()
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {COUNTER_TABLE}(owner_id, status, count)
+                SELECT owner_id, status, COUNT(*) FROM {TASKS_TABLE}
+                WHERE owner_id IS NOT NULL
+                GROUP BY owner_id, status
+                """
+            )
+            return cursor.rowcount
+
+
+def _distribution_queryset(owner, using):
+    if is_supported(using):
+        return (
+            TaskStatusCounter.objects.using(using)
+            .filter(owner=owner, count__gt=0)
+            .order_by("status")
+            .values("status", "count")
+        )
+    return (
+        Tasks.objects.using(using)
+        .filter(owner=owner)
+        .values("status")
+        .annotate(count=Count("status"))
+        .order_by("status")
+    )
+
+
+def task_count(using="default"):
+    """
+    Expression for the number of tasks of the user of each row, to annotate
+    a ``User`` queryset with. Evaluated only for the rows returned, through
+    the counter rows (or the tasks owner index on other backends).
+    """
+    if is_supported(using):
+        counts = TaskStatusCounter.objects.using(using).filter(owner=OuterRef("pk")).values("owner")
+        total = Sum("count")
+    else:
+        counts = Tasks.objects.using(using).filter(owner=OuterRef("pk")).order_by().values("owner")
+        total = Count("*")
+    return Coalesce(Subquery(counts.annotate(total=total).values("total")), 0)
+
+
+def owner_task_counts(owners):
+    """
+    ``{owner id: number of tasks}`` for ``owners``, read from each owner's
+    shard: the sharded counterpart of ``task_count``, for one page of users.
+    """
+    by_shard = defaultdict(list)
+    for owner in owners:
+        by_shard[shard_for(owner)].append(owner.pk)
+    counts = {}
+    for using, owner_ids in by_shard.items():
+        if is_supported(using):
+            rows = TaskStatusCounter.objects.using(using).filter(owner__in=owner_ids).values("owner")
+            rows = rows.annotate(total=Sum("count"))
+        else:
+            rows = Tasks.objects.using(using).filter(owner__in=owner_ids).values("owner")
+            rows = rows.annotate(total=Count("*"))
+        counts.update(rows.order_by().values_list("owner", "total"))
+    return {owner.pk: counts.get(owner.pk) or 0 for owner in owners}
+
+
+def status_distribution(owner, using="default"):
+    """Return ``[{"status": ..., "count": ...}]`` for the statuses ``owner`` has tasks in."""
+    return list(_distribution_queryset(owner, using))
+
+
+async def astatus_distribution(owner, using="default"):
+    return [row async for row in _distribution_queryset(owner, using)]
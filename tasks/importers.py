@@ -0,0 +1,208 @@
+"""
+Streaming bulk import of tasks from CSV or NDJSON files.
+
+The file is read row by row; each row goes through the ``TaskSerializer``
+field validation (``validate_due_date`` included) using a single serializer
+instance, so fields are bound once rather than per row. Valid rows are
+written in batches with one prepared multi-row INSERT (what ``bulk_create``
+would issue, minus building a model instance per row), each batch inside
+its own savepoint: when a batch is rejected by the database it is rolled
+back and replayed row by row so only the offending rows are reported.
+"""
+import csv
+import json
+import uuid
+
+from django.db import DatabaseError, connections, router, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .cache import invalidate_owner
+from .models import Tasks
+from .serializers import TaskSerializer
+
+IMPORT_FORMATS = ("csv", "ndjson")
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(filename):
+    for input_format in IMPORT_FORMATS:
+        if filename.lower().endswith(f".{input_format}"):
+            return input_format
+    if filename.lower().endswith(".jsonl"):
+        return "ndjson"
+    return None
+
+
+class UnreadableRow(str):
+    """Why a line of the input could not be read; ``read_rows`` yields it in place of the row."""
+
+
+NOT_UTF8 = UnreadableRow("The line is not valid UTF-8.")
+NOT_AN_OBJECT = UnreadableRow("Expected a JSON object.")
+
+
+def _decoded_lines(stream, encoding, bad_lines):
+    """
+    Decode ``stream`` line by line, so one badly encoded line is reported
+    (its number goes to ``bad_lines``) instead of aborting the whole file.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        try:
+            yield line.decode(encoding)
+        except UnicodeDecodeError:
+            bad_lines.add(line_number)
+            yield line.decode(encoding, errors="replace")
+
+
+def _csv_rows(stream):
+    bad_lines = set()
+    reader = csv.DictReader(_decoded_lines(stream, "utf-8-sig", bad_lines))
+    # The underlying reader's line_num: DictReader only copies it after a
+    # row was read successfully.
+    lines = reader.reader
+    while True:
+        first_line = lines.line_num + 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            if lines.line_num < first_line:
+                return
+            # The reader starts afresh on the next line.
+            yield lines.line_num, UnreadableRow(f"Malformed CSV: {exc}.")
+            continue
+        if bad_lines.intersection(range(first_line, lines.line_num + 1)):
+            yield lines.line_num, NOT_UTF8
+            continue
+        # Empty cells mean "not provided" so that optional columns fall back
+        # to their defaults instead of failing to parse.
+        yield lines.line_num, {key: value for key, value in row.items() if key and value != ""}
+
+
+def _ndjson_rows(stream):
+    for line_number, line in enumerate(stream, start=1):
+        try:
+            line = line.decode("utf-8")
+        except UnicodeDecodeError:
+            yield line_number, NOT_UTF8
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, NOT_AN_OBJECT
+            continue
+        yield line_number, row if isinstance(row, dict) else NOT_AN_OBJECT
+
+
+def read_rows(stream, input_format):
+    """
+    ``(line_number, row)`` pairs of the binary ``stream``; ``row`` is an
+    ``UnreadableRow`` when the line cannot be decoded or parsed.
+    """
+    return _csv_rows(stream) if input_format == "csv" else _ndjson_rows(stream)
+
+
+class TaskImporter:
+    def __init__(self, owner, batch_size=DEFAULT_BATCH_SIZE):
+        self.owner = owner
+        self.batch_size = batch_size
+        self.using = router.db_for_write(Tasks, instance=Tasks(owner=owner))
+        self.connection = connections[self.using]
+        self.serializer = TaskSerializer()
+        self.fields = Tasks._meta.concrete_fields
+        self.fields_by_name = {field.name: field for field in self.fields}
+        quote = self.connection.ops.quote_name
+        self.insert_sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+            quote(Tasks._meta.db_table),
+            ", ".join(quote(field.column) for field in self.fields),
+            ", ".join(["%s"] * len(self.fields)),
+        )
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, stream, input_format):
+        """Import every row of the binary ``stream`` and return the report."""
+        rows = read_rows(stream, input_format)
+        batch = []
+        with transaction.atomic(using=self.using):
+            for line_number, row in rows:
+                data = self._validate(line_number, row)
+                if data is None:
+                    continue
+                batch.append((line_number, data))
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+            invalidate_owner(self.owner.pk, self.using)
+        return self.report()
+
+    def report(self):
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+    def _validate(self, line_number, row):
+        if isinstance(row, UnreadableRow):
+            self._error(line_number, {"non_field_errors": [str(row)]})
+            return None
+        try:
+            data = self.serializer.run_validation(row)
+        except serializers.ValidationError as exc:
+            self._error(line_number, exc.detail)
+            return None
+        return data
+
+    def _rows(self, batch):
+        """Database-ready value tuples; values shared by the whole batch are prepared once."""
+        now = timezone.now()
+        constants = {"owner": self.owner.pk, "created_at": now, "updated_at": now}
+        prepared = {
+            name: self.fields_by_name[name].get_db_prep_save(value, self.connection)
+            for name, value in constants.items()
+        }
+        for _, data in batch:
+            values = []
+            for field in self.fields:
+                if field.name in prepared:
+                    values.append(prepared[field.name])
+                    continue
+                if field.name == "id":
+                    value = uuid.uuid4()
+                else:
+                    value = data.get(field.name, field.get_default())
+                values.append(field.get_db_prep_save(value, self.connection))
+            yield values
+
+    def _insert(self, batch):
+        with transaction.atomic(using=self.using):
+            with self.connection.cursor() as cursor:
+                cursor.executemany(self.insert_sql, list(self._rows(batch)))
+
+    def _flush(self, batch):
+        try:
+            self._insert(batch)
+        except DatabaseError:
+            for line_number, data in batch:
+                try:
+                    self._insert([(line_number, data)])
+                except DatabaseError as exc:
+                    self._error(line_number, {"non_field_errors": [str(exc)]})
+                else:
+                    self.imported += 1
+        else:
+            self.imported += len(batch)
+
+    def _error(self, line_number, detail):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "errors": detail})
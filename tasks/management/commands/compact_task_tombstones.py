@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.changes import compact_tombstones, retention
+from tasks.shards import task_databases
+
+
+class Command(BaseCommand):
+    help = "Delete task deletion tombstones older than the sync retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Retention in days (defaults to TASK_TOMBSTONE_RETENTION_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--database",
+            help="Database alias to compact (every task shard by default).",
+        )
+
+    def handle(self, *args, **options):
+        window = timedelta(days=options["days"]) if options["days"] is not None else retention()
+        databases = [options["database"]] if options["database"] else task_databases()
+        removed = sum(
+            compact_tombstones(
+                before=timezone.now() - window,
+                batch_size=options["batch_size"],
+                using=using,
+            )
+            for using in databases
+        )
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} task tombstones."))
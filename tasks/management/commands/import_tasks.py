@@ -0,0 +1,46 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.importers import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, TaskImporter, detect_format
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Import tasks for a user from a CSV or NDJSON file, streaming it in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or NDJSON file to import.")
+        parser.add_argument("--owner", required=True, help="Email of the user owning the tasks.")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="File format, detected from the extension when omitted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        input_format = options["format"] or detect_format(options["path"])
+        if input_format is None:
+            raise CommandError("Cannot detect the file format, pass --format.")
+        try:
+            owner = User.objects.get(email=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['owner']}.")
+
+        importer = TaskImporter(owner, batch_size=options["batch_size"])
+        started = time.perf_counter()
+        with open(options["path"], "rb") as stream:
+            report = importer.run(stream, input_format)
+        elapsed = time.perf_counter() - started
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        rate = report["imported"] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} tasks ({report['failed']} rejected) "
+            f"in {elapsed:.2f}s, {rate:,.0f} rows/s."
+        ))
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.rebalance import DEFAULT_BATCH_SIZE, move_owners
+from tasks.shards import hash_shard, shard_for, task_shards
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Move owners' tasks to another shard while the service runs: the given owners, "
+        "or with --all every owner not on the shard its id hashes to (e.g. after adding a shard)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", action="append", default=[], help="Email of an owner to move (repeatable).")
+        parser.add_argument("--all", action="store_true", help="Move every owner to the shard its id hashes to.")
+        parser.add_argument("--to", help="Target shard of --owner (defaults to the shard the owner hashes to).")
+        parser.add_argument(
+            "--grace",
+            type=float,
+            help="Seconds between the cut-over and the clean-up of the old shards "
+                 "(defaults to AUTH_USER_CACHE_TTL + 5).",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Only list the moves.")
+
+    def handle(self, *args, **options):
+        if options["to"] is not None and options["to"] not in task_shards():
+            raise CommandError(f"{options['to']} is not one of TASK_SHARDS ({', '.join(task_shards())}).")
+        if options["all"] == bool(options["owner"]):
+            raise CommandError("Pass either --owner or --all.")
+
+        if options["all"]:
+            owners = User.objects.order_by("pk").iterator()
+        else:
+            owners = list(User.objects.filter(email__in=options["owner"]))
+            unknown = set(options["owner"]) - {owner.email for owner in owners}
+            if unknown:
+                raise CommandError(f"Unknown owners: {', '.join(sorted(unknown))}.")
+        moves = [
+            (owner, target)
+            for owner in owners
+            for target in [options["to"] or hash_shard(owner.pk)]
+            if shard_for(owner) != target
+        ]
+
+        if options["dry_run"]:
+            for owner, target in moves:
+                self.stdout.write(f"{owner.email}: {shard_for(owner)} -> {target}")
+            self.stdout.write(self.style.SUCCESS(f"{len(moves)} owners to move."))
+            return
+
+        grace = options["grace"]
+        if grace is None:
+            grace = settings.AUTH_USER_CACHE_TTL + 5
+        moved = move_owners(moves, grace, batch_size=options["batch_size"], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} owners."))
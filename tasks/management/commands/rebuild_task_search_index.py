@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from tasks.cache import invalidate_database
+from tasks.search import is_supported, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of tasks from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias whose search index should be rebuilt.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not is_supported(using):
+            raise CommandError("Full-text search is only available on SQLite databases.")
+        rebuild_search_index(using)
+        invalidate_database(using)
+        self.stdout.write(self.style.SUCCESS("Task search index rebuilt."))
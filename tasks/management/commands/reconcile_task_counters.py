@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from tasks.cache import invalidate_database
+from tasks.counters import is_supported, reconcile_status_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user task status counters from the tasks table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias whose counters should be recomputed.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not is_supported(using):
+            raise CommandError("Task status counters are only maintained on SQLite databases.")
+        rows = reconcile_status_counters(using)
+        invalidate_database(using)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} task status counters."))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.reminders import OWNER_CHUNK, send_reminders
+from tasks.shards import task_databases
+
+
+class Command(BaseCommand):
+    help = "Email each owner a digest of their overdue and soon-due tasks, then repeat every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run a single pass and exit (e.g. from cron).",
+        )
+        parser.add_argument("--interval", type=int, default=3600, help="Seconds between two passes.")
+        parser.add_argument(
+            "--lead-days",
+            type=int,
+            help="Remind tasks due within this many days (defaults to TASK_REMINDER_LEAD_DAYS).",
+        )
+        parser.add_argument("--owner-chunk", type=int, default=OWNER_CHUNK)
+        parser.add_argument(
+            "--database",
+            help="Database alias to read tasks from (every task shard by default).",
+        )
+
+    def handle(self, *args, **options):
+        databases = [options["database"]] if options["database"] else task_databases()
+        while True:
+            stats = {"digests": 0, "tasks": 0, "failed": 0}
+            for using in databases:
+                for key, value in send_reminders(
+                    lead_days=options["lead_days"],
+                    owner_chunk=options["owner_chunk"],
+                    using=using,
+                ).items():
+                    stats[key] += value
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Sent {stats['digests']} reminder digests covering {stats['tasks']} tasks "
+                    f"({stats['failed']} failed)."
+                )
+            )
+            if options["once"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,37 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the SQLite read replicas (DATABASE_REPLICAS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias of the primary to copy from.",
+        )
+
+    def handle(self, *args, **options):
+        source = connections[options["database"]]
+        replicas = [connections[alias] for alias in settings.DATABASE_REPLICAS]
+        if not replicas:
+            raise CommandError("No read replica is configured (DATABASE_REPLICAS).")
+        if any(connection.vendor != "sqlite" for connection in (source, *replicas)):
+            raise CommandError("Replicas can only be copied between SQLite databases.")
+
+        source.ensure_connection()
+        for replica in replicas:
+            # The online backup API copies a consistent snapshot while the
+            # primary keeps serving writes, and replaces the replica's pages
+            # under its readers' locks rather than the file under their feet.
+            target = sqlite3.connect(replica.settings_dict["NAME"])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"{source.alias} copied to {replica.alias}.")
+        self.stdout.write(self.style.SUCCESS("Replicas in sync."))
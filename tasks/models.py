@@ -34,10 +34,132 @@ class Tasks(models.Model):
         on_delete=models.SET_NULL,
         related_name='tasks',
         blank=True,
-        null=True
+        null=True,
+        db_index=False,
+        # Users live in "default", tasks in their owner's shard (see
+        # tasks.shards): the database cannot enforce the key.
+        db_constraint=False
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Every query is owner-scoped, so owner leads each index; the
+        # composite indexes make the plain foreign key index redundant.
+        indexes = [
+            models.Index(fields=["owner", "updated_at", "id"], name="task_owner_updated_idx"),
+            models.Index(fields=["owner", "status", "updated_at", "id"], name="task_owner_status_idx"),
+            models.Index(fields=["owner", "title"], name="task_owner_title_idx"),
+            models.Index(fields=["owner", "due_date"], name="task_owner_due_date_idx"),
+            # The admin change list is not owner-scoped: it pages all tasks
+            # by -updated_at.
+            models.Index(fields=["updated_at", "id"], name="task_updated_idx"),
+            # The reminder scheduler is the one cross-owner scan: a range on
+            # due_date over open tasks only (see tasks.reminders).
+            models.Index(
+                fields=["due_date", "owner"],
+                condition=models.Q(due_date__isnull=False) & ~models.Q(status=COMPLETED),
+                name="task_open_due_date_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class TaskStatusCounter(models.Model):
+    """
+    Number of tasks per (owner, status), maintained by database triggers.
+
+    See ``tasks.counters``; the dashboard reads these rows instead of
+    aggregating over every task of the user.
+    """
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='task_status_counters',
+        db_constraint=False
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=TASKS_STATUS_CHOICES
+    )
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "status"], name="task_status_counter_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} {self.status}: {self.count}"
+
+
+class TaskChange(models.Model):
+    """
+    Latest change of a task as seen by one owner, maintained by database triggers.
+
+    The auto-incremented primary key is the change sequence used by the
+    delta sync endpoint. A task keeps a single row per owner: every write
+    replaces it with a new, higher sequence, and deleting the task (or
+    handing it to another owner) leaves a tombstone until compaction.
+    See ``tasks.changes``.
+    """
+    task_id = models.UUIDField()
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='task_changes',
+        db_constraint=False
+    )
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["task_id", "owner"], name="task_change_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "id"], name="task_change_owner_seq_idx"),
+            models.Index(
+                fields=["changed_at"],
+                condition=models.Q(deleted=True),
+                name="task_change_tombstone_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.pk} {self.task_id}{' (deleted)' if self.deleted else ''}"
+
+
+class TaskReminder(models.Model):
+    """
+    A reminder email sent about a task, so the scheduler never sends the
+    same one twice: one row per task, kind and due date. Moving the due date
+    makes the task eligible again.
+    """
+    DUE_SOON = "due_soon"
+    OVERDUE = "overdue"
+    KIND_CHOICES = (
+        (DUE_SOON, "due soon"),
+        (OVERDUE, "overdue"),
+    )
+
+    task = models.ForeignKey(
+        Tasks,
+        on_delete=models.CASCADE,
+        related_name='reminders',
+        db_index=False
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    due_date = models.DateField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["task", "kind", "due_date"], name="task_reminder_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} {self.kind} {self.due_date}"
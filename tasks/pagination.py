@@ -0,0 +1,5 @@
+from task_manager.pagination import KeysetPagination
+
+
+class TaskPagination(KeysetPagination):
+    ordering = ("-updated_at", "-id")
@@ -0,0 +1,206 @@
+"""
+Moving owners between task shards while the service runs
+(``manage.py rebalance_task_shards``); see ``tasks.shards``.
+
+1. copy: the owner's tasks and reminders are copied to the target in short
+   batches, while the owner keeps reading and writing the source;
+2. cut-over: in one transaction holding the source's write lock (SQLite
+   takes it when the transaction starts, see task_manager/sqlite3), what
+   changed during the copy is copied again, the change log is carried over
+   and ``User.task_shard`` is switched. Only this step blocks writers, and
+   only those of the source shard;
+3. after ``grace`` seconds, enough for every process to drop its cached
+   copy of the user (``AUTH_USER_CACHE_TTL``), writes that still reached
+   the source are copied over and the owner's rows are deleted from it. A
+   deletion that still reached the source in that window is lost; one made
+   on the target is kept, its tombstone stops the source's copy coming back.
+
+Copies are diffs on ``(id, updated_at)``, read from the owner index, so
+running them again only moves what changed, and an interrupted move can
+simply be restarted. The target's triggers keep its status counters and
+search index up to date as rows arrive. The change log is carried over
+with sequence numbers above any the source has handed out, so a client
+syncing from a cursor issued by the source gets all of the owner's changes
+again, tombstones included, rather than missing some.
+"""
+import time
+
+from django.db import connections, transaction
+
+from .cache import invalidate_owner
+from .models import TaskChange, TaskReminder, Tasks, TaskStatusCounter
+from .shards import shard_for
+
+DEFAULT_BATCH_SIZE = 1000
+
+REMINDER_KEY = ("task_id", "kind", "due_date")
+
+
+def _batches(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _insert(model, rows, using, fields, conflict=None, update=False):
+    """
+    Insert ``rows`` (value tuples of ``fields``) with their values as they
+    are: unlike ``bulk_create``, ``auto_now`` fields are not reset.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = [quote(field.column) for field in fields]
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        quote(model._meta.db_table), ", ".join(columns), ", ".join(["%s"] * len(columns))
+    )
+    if conflict:
+        action = "NOTHING"
+        if update:
+            action = "UPDATE SET " + ", ".join(
+                f"{column} = excluded.{column}" for column in columns if column not in conflict
+            )
+        sql += " ON CONFLICT (%s) DO %s" % (", ".join(quote(column) for column in conflict), action)
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+            for row in rows
+        ])
+
+
+def _versions(owner_id, using):
+    return dict(
+        Tasks.objects.using(using).filter(owner_id=owner_id).values_list("id", "updated_at").iterator()
+    )
+
+
+def _reminder_keys(owner_id, using):
+    return set(
+        TaskReminder.objects.using(using).filter(task__owner_id=owner_id).values_list(*REMINDER_KEY).iterator()
+    )
+
+
+def sync_owner(owner_id, source, target, batch_size=DEFAULT_BATCH_SIZE, mirror=True):
+    """
+    Copy the owner's tasks and reminders from ``source`` to ``target``;
+    returns the number of rows written.
+
+    With ``mirror``, while ``source`` is still the owner's shard, ``target``
+    is made identical to it. Otherwise, once ``target`` has taken over and
+    receives writes of its own, only tasks it lacks or holds an older
+    version of are copied, and never those it has a tombstone for.
+    """
+    copied = _versions(owner_id, source)
+    existing = _versions(owner_id, target)
+    if mirror:
+        stale = [pk for pk, updated_at in copied.items() if existing.get(pk) != updated_at]
+        gone = [pk for pk in existing if pk not in copied]
+    else:
+        # Deleted on the target since the cut-over (the carried-over log
+        # only has tombstones of tasks the source no longer holds).
+        deleted = set(
+            TaskChange.objects.using(target).filter(owner_id=owner_id, deleted=True)
+            .values_list("task_id", flat=True).iterator()
+        )
+        copied = {pk: updated_at for pk, updated_at in copied.items() if pk not in deleted}
+        stale = [pk for pk, updated_at in copied.items() if pk not in existing or existing[pk] < updated_at]
+        gone = []
+
+    task_fields = Tasks._meta.concrete_fields
+    for batch in _batches(stale, batch_size):
+        rows = Tasks.objects.using(source).filter(pk__in=batch).values_list(
+            *[field.attname for field in task_fields]
+        )
+        with transaction.atomic(using=target):
+            _insert(Tasks, rows, target, task_fields, conflict=["id"], update=True)
+    for batch in _batches(gone, batch_size):
+        with transaction.atomic(using=target):
+            Tasks.objects.using(target).filter(pk__in=batch).delete()
+
+    reminder_fields = [field for field in TaskReminder._meta.concrete_fields if not field.primary_key]
+    missing = [
+        key for key in _reminder_keys(owner_id, source) - _reminder_keys(owner_id, target)
+        if key[0] in copied
+    ]
+    for batch in _batches(missing, batch_size):
+        keys = set(batch)
+        rows = [
+            row for row in TaskReminder.objects.using(source)
+            .filter(task_id__in={key[0] for key in keys})
+            .values_list(*[field.attname for field in reminder_fields])
+            if row[:3] in keys
+        ]
+        with transaction.atomic(using=target):
+            _insert(TaskReminder, rows, target, reminder_fields, conflict=REMINDER_KEY)
+    return len(stale) + len(gone) + len(missing)
+
+
+def _carry_change_log(owner_id, source, target):
+    """Replace the owner's change rows in ``target`` with the source's, renumbered above both logs."""
+    fields = list(TaskChange._meta.concrete_fields)
+    rows = list(
+        TaskChange.objects.using(source).filter(owner_id=owner_id).order_by("pk")
+        .values_list(*[field.attname for field in fields if not field.primary_key])
+    )
+    TaskChange.objects.using(target).filter(owner_id=owner_id).delete()
+    base = max(
+        TaskChange.objects.using(alias).order_by("-pk").values_list("pk", flat=True).first() or 0
+        for alias in (source, target)
+    )
+    _insert(TaskChange, [(base + index, *row) for index, row in enumerate(rows, start=1)], target, fields)
+
+
+def cut_over(owner, target, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Copy ``owner``'s tasks to ``target`` and make it their shard; returns
+    the previous shard, from which ``finish_move`` deletes them.
+    """
+    source = shard_for(owner)
+    if source == target:
+        return source
+    sync_owner(owner.pk, source, target, batch_size)
+    with transaction.atomic(using=source):
+        sync_owner(owner.pk, source, target, batch_size)
+        with transaction.atomic(using=target):
+            _carry_change_log(owner.pk, source, target)
+        owner.task_shard = target
+        # save() rather than update(): the receivers drop cached copies of the user.
+        owner.save(update_fields=["task_shard"])
+    return source
+
+
+def finish_move(owner, source, batch_size=DEFAULT_BATCH_SIZE):
+    """Copy the writes that still reached ``source`` after the cut-over, then delete the owner's rows there."""
+    target = shard_for(owner)
+    if source == target:
+        return
+    if sync_owner(owner.pk, source, target, batch_size, mirror=False):
+        invalidate_owner(owner.pk, target)
+    tasks = Tasks.objects.using(source).filter(owner_id=owner.pk)
+    while True:
+        with transaction.atomic(using=source):
+            batch = list(tasks.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                break
+            Tasks.objects.using(source).filter(pk__in=batch).delete()
+    with transaction.atomic(using=source):
+        TaskChange.objects.using(source).filter(owner_id=owner.pk).delete()
+        TaskStatusCounter.objects.using(source).filter(owner_id=owner.pk).delete()
+
+
+def move_owners(moves, grace, batch_size=DEFAULT_BATCH_SIZE, log=None):
+    """
+    Move each ``(owner, target)`` of ``moves``: every cut-over first, then a
+    single ``grace`` period, then the clean-up of the sources.
+    """
+    log = log or (lambda message: None)
+    sources = []
+    for owner, target in moves:
+        source = cut_over(owner, target, batch_size)
+        if source != target:
+            log(f"{owner.email}: {source} -> {target}")
+            sources.append((owner, source))
+    if sources:
+        time.sleep(grace)
+    for owner, source in sources:
+        finish_move(owner, source, batch_size)
+    return len(sources)
@@ -0,0 +1,172 @@
+"""
+Due-date reminder emails (``manage.py send_task_reminders``).
+
+Each owner of open tasks that are overdue or due within
+``TASK_REMINDER_LEAD_DAYS`` gets a single digest listing them. A run never
+holds more than one chunk of owners in memory:
+
+1. the owners concerned are read ``owner_chunk`` at a time, in id order
+   from the last one handled, owner ids only, from an index: the partial
+   ``task_open_due_date_idx`` or ``task_owner_due_date_idx``, whichever
+   the planner finds cheaper for the page;
+2. for each chunk, the owners' due tasks that have not been reminded yet
+   are streamed in (owner, due date) order, at most ``DIGEST_LIMIT`` per
+   digest, the remainder being picked up by the next run;
+3. digests go out over one SMTP connection, and each is recorded in
+   ``TaskReminder`` right after it is sent, so a rerun (or a crash halfway)
+   never mails the same reminder twice.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Case, Exists, OuterRef, Value, When
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .constants import COMPLETED
+from .models import TaskReminder, Tasks
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+OWNER_CHUNK = 500
+DIGEST_LIMIT = 50
+FETCH_SIZE = 2000
+
+
+def due_tasks(today, lead_days, using="default"):
+    """Open tasks overdue or due within ``lead_days`` of ``today``."""
+    return (
+        Tasks.objects.using(using)
+        .filter(due_date__isnull=False, due_date__lte=today + timedelta(days=lead_days))
+        .exclude(status=COMPLETED)
+        .filter(owner__isnull=False)
+    )
+
+
+def _owner_chunks(today, lead_days, owner_chunk, using):
+    """Yield the ids of the owners with due tasks, ``owner_chunk`` at a time."""
+    owners = due_tasks(today, lead_days, using).order_by("owner_id").values_list("owner_id", flat=True).distinct()
+    last = None
+    while True:
+        page = owners if last is None else owners.filter(owner_id__gt=last)
+        chunk = list(page[:owner_chunk])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def _pending(owner_ids, today, lead_days, using):
+    """Due tasks of ``owner_ids`` without a reminder of their kind for their due date."""
+    reminded = TaskReminder.objects.using(using).filter(
+        task=OuterRef("pk"), kind=OuterRef("reminder_kind"), due_date=OuterRef("due_date")
+    )
+    return (
+        due_tasks(today, lead_days, using)
+        .filter(owner_id__in=owner_ids)
+        .annotate(
+            reminder_kind=Case(
+                When(due_date__lt=today, then=Value(TaskReminder.OVERDUE)),
+                default=Value(TaskReminder.DUE_SOON),
+            )
+        )
+        .filter(~Exists(reminded))
+        .order_by("owner_id", "due_date", "id")
+        .values_list("id", "owner_id", "title", "due_date", "reminder_kind")
+    )
+
+
+def _digests(owner_ids, today, lead_days, using):
+    """Yield ``(owner_id, tasks, remaining)`` for the owners of one chunk."""
+    current, tasks, remaining = None, [], 0
+    for task_id, owner_id, title, due_date, kind in _pending(owner_ids, today, lead_days, using).iterator(
+        chunk_size=FETCH_SIZE
+    ):
+        if owner_id != current:
+            if tasks:
+                yield current, tasks, remaining
+            current, tasks, remaining = owner_id, [], 0
+        if len(tasks) < DIGEST_LIMIT:
+            tasks.append({"id": task_id, "title": title, "due_date": due_date, "kind": kind})
+        else:
+            remaining += 1
+    if tasks:
+        yield current, tasks, remaining
+
+
+def build_message(owner, tasks, remaining, today, connection=None):
+    context = {
+        "full_name": owner.get_full_name() or owner.email,
+        "overdue": [task for task in tasks if task["kind"] == TaskReminder.OVERDUE],
+        "due_soon": [task for task in tasks if task["kind"] == TaskReminder.DUE_SOON],
+        "remaining": remaining,
+        "today": today,
+    }
+    count = len(tasks) + remaining
+    message = EmailMultiAlternatives(
+        subject=f"Rappel : {count} tâche{'s' if count > 1 else ''} à échéance",
+        body=render_to_string("emails/task_reminder.txt", context),
+        from_email=settings.EMAIL_HOST_USER,
+        to=[owner.email],
+        connection=connection,
+    )
+    message.attach_alternative(render_to_string("emails/task_reminder.html", context), "text/html")
+    return message
+
+
+def _reconnect(connection):
+    """The connection may be unusable after a failed send: start over on a fresh one."""
+    connection.close()
+    try:
+        connection.open()
+    except (smtplib.SMTPException, OSError):
+        # The next send_messages() tries again, and fails that digest, if
+        # the server is still unreachable.
+        pass
+
+
+def send_reminders(today=None, lead_days=None, owner_chunk=OWNER_CHUNK, connection=None, using="default"):
+    """Send one digest per owner with due tasks; returns counters for the run."""
+    today = today or timezone.localdate()
+    lead_days = settings.TASK_REMINDER_LEAD_DAYS if lead_days is None else lead_days
+    stats = {"digests": 0, "tasks": 0, "failed": 0}
+
+    chunks = _owner_chunks(today, lead_days, owner_chunk, using)
+    first = next(chunks, None)
+    if first is None:
+        return stats
+
+    connection = connection or get_connection(fail_silently=False)
+    with connection:
+        for chunk in chain([first], chunks):
+            # Users are not sharded: they are read from default whatever ``using`` is.
+            owners = User.objects.filter(pk__in=chunk, is_active=True).in_bulk()
+            for owner_id, tasks, remaining in _digests(chunk, today, lead_days, using):
+                owner = owners.get(owner_id)
+                if owner is None:
+                    continue
+                message = build_message(owner, tasks, remaining, today, connection=connection)
+                try:
+                    connection.send_messages([message])
+                except (smtplib.SMTPException, OSError):
+                    logger.exception("Could not send the task reminder digest to %s.", owner.email)
+                    stats["failed"] += 1
+                    _reconnect(connection)
+                    continue
+                TaskReminder.objects.using(using).bulk_create(
+                    [
+                        TaskReminder(task_id=task["id"], kind=task["kind"], due_date=task["due_date"])
+                        for task in tasks
+                    ],
+                    ignore_conflicts=True,
+                )
+                stats["digests"] += 1
+                stats["tasks"] += len(tasks)
+    return stats
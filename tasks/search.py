@@ -0,0 +1,138 @@
+"""
+Full-text search over task titles and descriptions.
+
+On SQLite the ``tasks_tasks`` table is mirrored into an external-content
+FTS5 table kept in sync by triggers, so every write path (``save``,
+``bulk_create``, ``QuerySet.update``/``delete``) updates the index in the
+same transaction. The FTS table is keyed on the implicit rowid of
+``tasks_tasks``; ``VACUUM`` may renumber those, so run
+``manage.py rebuild_task_search_index`` after vacuuming.
+
+Other database backends fall back to ``icontains`` lookups.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Tasks
+
+TASKS_TABLE = Tasks._meta.db_table
+SEARCH_TABLE = f"{TASKS_TABLE}_fts"
+
+SEARCH_INDEX_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title,
+        description,
+        content='{TASKS_TABLE}',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON {TASKS_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON {TASKS_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title, description ON {TASKS_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_supported(using):
+    return connections[using].vendor == "sqlite"
+
+
+def install_search_index(using="default"):
+    """Create the FTS5 table and its triggers if they do not exist yet."""
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        for statement in SEARCH_INDEX_SQL:
+            cursor.execute(statement)
+
+
+def rebuild_search_index(using="default"):
+    """Repopulate the FTS5 table from ``tasks_tasks`` and refresh planner statistics."""
+    install_search_index(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"ANALYZE {TASKS_TABLE}")
+
+
+def match_expression(value):
+    """
+    Turn free user input into a safe FTS5 query.
+
+    Every word becomes a quoted prefix term so FTS5 operators typed by the
+    user are matched literally; terms are implicitly AND-ed.
+    """
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(value))
+
+
+def match_filter(table, search_table, expression):
+    """``table`` rows whose FTS5 mirror ``search_table`` matches ``expression``."""
+    # rowid IN (...) lets SQLite drive the lookup from the FTS matches
+    # instead of walking every row of the table.
+    return RawSQL(
+        f'"{table}".rowid IN '
+        f"(SELECT rowid FROM {search_table} WHERE {search_table} MATCH %s)",
+        (expression,),
+        output_field=BooleanField(),
+    )
+
+
+def match_rank(table, search_table, expression):
+    """
+    FTS5 rank of each ``table`` row for ``expression`` (lower is better).
+
+    The matches are computed once per query into a materialized CTE, which
+    SQLite indexes on rowid; a ``MATCH ... AND rowid = ...`` subquery would
+    instead re-run the whole full-text query for every row.
+    """
+    return RawSQL(
+        f"(WITH matches AS MATERIALIZED ("
+        f"SELECT rowid AS match_rowid, rank AS match_rank FROM {search_table} "
+        f"WHERE {search_table} MATCH %s) "
+        f'SELECT match_rank FROM matches WHERE match_rowid = "{table}".rowid)',
+        (expression,),
+        output_field=FloatField(),
+    )
+
+
+def search_tasks(queryset, value, ranked=True):
+    """
+    Restrict ``queryset`` to tasks matching ``value``, best matches first
+    unless ``ranked`` is false (when the caller applies its own ordering).
+    """
+    if not is_supported(queryset.db):
+        return queryset.filter(
+            Q(title__icontains=value) | Q(description__icontains=value)
+        )
+
+    expression = match_expression(value)
+    if not expression:
+        return queryset
+
+    queryset = queryset.filter(match_filter(TASKS_TABLE, SEARCH_TABLE, expression))
+    if not ranked:
+        return queryset
+    return queryset.annotate(search_rank=match_rank(TASKS_TABLE, SEARCH_TABLE, expression)).order_by("search_rank")
@@ -1,5 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Tasks
+from .cache import invalidate_owner
+from .conditional import EditConflict
+from .shards import shard_for
 from django.utils import timezone
 
 
@@ -26,3 +30,128 @@ class TaskSerializer(serializers.ModelSerializer):
         if value and value < timezone.now().date():
             raise serializers.ValidationError("The due date can't be in the past")
         return value
+
+    def create(self, validated_data):
+        # Through Model.save rather than the manager, so the router places
+        # the task in its owner's shard (see tasks.shards).
+        task = Tasks(**validated_data)
+        task.save(force_insert=True)
+        return task
+
+    def update(self, instance, validated_data):
+        """
+        Write the changes with a single UPDATE that only applies if the row
+        still has the ``updated_at`` it had when ``instance`` was read, so a
+        concurrent write is reported instead of silently overwritten.
+        """
+        now = timezone.now()
+        updated = (
+            Tasks.objects.using(instance._state.db)
+            .filter(pk=instance.pk, updated_at=instance.updated_at)
+            .update(updated_at=now, **validated_data)
+        )
+        if not updated:
+            raise EditConflict()
+        # QuerySet.update sends no post_save.
+        invalidate_owner(instance.owner_id, instance._state.db)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.updated_at = now
+        return instance
+
+
+class TaskBulkUpdateSerializer(TaskSerializer):
+    id = serializers.UUIDField()
+
+    class Meta(TaskSerializer.Meta):
+        read_only_fields = [
+            'owner',
+            'created_at',
+            'updated_at'
+        ]
+
+
+class TaskBulkSerializer(serializers.Serializer):
+    """
+    Batch of task operations applied in one transaction.
+
+    ``create`` items are validated like a POST, ``update`` items like a PATCH
+    (plus their ``id``) and ``delete`` is a list of task ids. Writes go through
+    ``bulk_create``, ``bulk_update`` and a single filtered DELETE.
+    """
+    max_operations = 5000
+
+    def get_fields(self):
+        # Declared here rather than as class attributes, which would shadow
+        # the serializer's own create()/update() methods.
+        return {
+            "create": serializers.ListField(child=serializers.DictField(), required=False, default=list),
+            "update": serializers.ListField(child=serializers.DictField(), required=False, default=list),
+            "delete": serializers.ListField(child=serializers.UUIDField(), required=False, default=list),
+        }
+
+    def validate_create(self, value):
+        serializer = TaskSerializer(data=value, many=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def validate_update(self, value):
+        serializer = TaskBulkUpdateSerializer(data=value, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def validate(self, attrs):
+        total = len(attrs["create"]) + len(attrs["update"]) + len(attrs["delete"])
+        if total > self.max_operations:
+            raise serializers.ValidationError(
+                f"A batch can contain at most {self.max_operations} operations."
+            )
+        ids = [item["id"] for item in attrs["update"]]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError({"update": ["Each task can only be updated once per batch."]})
+        return attrs
+
+    def create(self, validated_data):
+        owner = validated_data["owner"]
+        tasks = Tasks.objects.using(shard_for(owner))
+        with transaction.atomic(using=tasks.db):
+            created = tasks.bulk_create(
+                [Tasks(owner=owner, **item) for item in validated_data["create"]]
+            )
+            updated = self._bulk_update(tasks, owner, validated_data["update"])
+            delete_ids = validated_data["delete"]
+            existing = set(
+                tasks.filter(owner=owner, pk__in=delete_ids).values_list("pk", flat=True)
+            )
+            if existing:
+                tasks.filter(owner=owner, pk__in=existing).delete()
+            # bulk_create and bulk_update send no post_save.
+            invalidate_owner(owner.pk, tasks.db)
+
+        return {
+            "create": TaskSerializer(created, many=True).data,
+            "update": TaskSerializer(updated, many=True).data,
+            "delete": [{"id": str(pk), "deleted": pk in existing} for pk in delete_ids],
+        }
+
+    def _bulk_update(self, queryset, owner, items):
+        if not items:
+            return []
+        tasks = queryset.filter(owner=owner).in_bulk([item["id"] for item in items])
+        errors = [{} if item["id"] in tasks else {"id": ["Task not found."]} for item in items]
+        if any(errors):
+            raise serializers.ValidationError({"update": errors})
+
+        now = timezone.now()
+        fields = {"updated_at"}
+        updated = []
+        for item in items:
+            task = tasks[item["id"]]
+            for field, value in item.items():
+                if field != "id":
+                    setattr(task, field, value)
+                    fields.add(field)
+            task.updated_at = now
+            updated.append(task)
+        queryset.bulk_update(updated, sorted(fields))
+        return updated
@@ -0,0 +1,138 @@
+"""
+Owner-sharded task storage.
+
+Tasks, and the rows kept alongside them (status counters, change log,
+reminders), live in one of the ``TASK_SHARDS`` databases, the same one for
+all the tasks of an owner. Users and everything else stay in ``default``.
+
+``User.task_shard`` records where an owner's tasks are. A new user gets the
+shard its id hashes to with rendezvous hashing (BLAKE2b, stable across
+processes), so adding a shard only claims about 1/N of the owners; an empty
+value (users created before sharding) means ``default``. Owners are moved
+between shards online with ``manage.py rebalance_task_shards``.
+
+``TaskShardRouter`` places task rows from the hints Django gives it:
+
+* querysets reached from a user (``user.tasks``) go to that user's shard;
+* a new task goes to its owner's shard, and a row read from a shard is
+  written back there;
+* the owner of a task read from a shard is read from ``default``.
+
+A task queryset built from ``Tasks.objects`` carries no hint and is not
+routed: start from ``user.tasks`` or call ``.using(shard_for(user))``. The
+admin lists one shard at a time (``tasks.admin``).
+With a single shard (the default, ``["default"]``) the router stays out of
+the way.
+"""
+from hashlib import blake2b
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+
+APP_LABEL = "tasks"
+
+
+def task_shards():
+    return getattr(settings, "TASK_SHARDS", [DEFAULT_DB_ALIAS])
+
+
+def task_databases():
+    """Every alias that may hold tasks: the shards, and ``default`` for unsharded owners."""
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *task_shards()]))
+
+
+def is_sharded():
+    return task_shards() != [DEFAULT_DB_ALIAS]
+
+
+def hash_shard(owner_id):
+    """The shard ``owner_id`` hashes to."""
+    key = str(owner_id).encode()
+    return max(
+        task_shards(),
+        key=lambda alias: blake2b(key, digest_size=8, key=alias.encode()).digest(),
+    )
+
+
+def shard_for(owner):
+    """Alias holding the tasks of ``owner`` (a user, or ``None`` for unowned tasks)."""
+    if owner is None or not is_sharded():
+        return DEFAULT_DB_ALIAS
+    if "task_shard" in owner.get_deferred_fields():
+        # E.g. a user built from token claims: loading the field here would
+        # hide a query, and guessing "default" would read the wrong shard.
+        raise ImproperlyConfigured(
+            f"The task shard of {owner.pk} is not loaded; authenticate task requests "
+            "with a class that loads the user (not StatelessJWTAuthentication)."
+        )
+    return owner.task_shard or DEFAULT_DB_ALIAS
+
+
+def _shard_of_instance(instance):
+    if instance._state.db in task_databases():
+        return instance._state.db
+    # New, or read from elsewhere (a read replica): find the owner's shard.
+    opts = instance._meta
+    if not any(field.name == "owner" for field in opts.concrete_fields):
+        return None
+    owner_field = opts.get_field("owner")
+    if owner_field.is_cached(instance):
+        return shard_for(instance.owner)
+    if instance.owner_id is None:
+        return DEFAULT_DB_ALIAS
+    task_shard = (
+        get_user_model()._default_manager.filter(pk=instance.owner_id)
+        .values_list("task_shard", flat=True)
+        .first()
+    )
+    return task_shard or DEFAULT_DB_ALIAS
+
+
+class TaskShardRouter:
+    def _db_for(self, model, hints):
+        if not is_sharded():
+            return None
+        instance = hints.get("instance")
+        if instance is None:
+            return None
+        if model._meta.app_label != APP_LABEL:
+            if (
+                issubclass(model, get_user_model())
+                and instance._meta.app_label == APP_LABEL
+                and instance._state.db != DEFAULT_DB_ALIAS
+                and instance._state.db in task_shards()
+            ):
+                # task.owner: users only live in default.
+                return DEFAULT_DB_ALIAS
+            return None
+        if isinstance(instance, get_user_model()):
+            return shard_for(instance)
+        if instance._meta.app_label == APP_LABEL:
+            return _shard_of_instance(instance)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Task rows point at their owner across databases (those foreign
+        # keys have no database constraint).
+        if not is_sharded():
+            return None
+        user_model = get_user_model()
+        for obj, other in ((obj1, obj2), (obj2, obj1)):
+            if obj._meta.app_label == APP_LABEL and isinstance(other, user_model):
+                return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not is_sharded() or db == DEFAULT_DB_ALIAS:
+            return None
+        if db in task_shards():
+            return app_label == APP_LABEL
+        return None
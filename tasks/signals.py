@@ -0,0 +1,41 @@
+from django.db import router, transaction
+
+from .cache import invalidate_owner
+from .changes import install_change_triggers
+from .counters import install_counter_triggers
+from .models import TaskChange, Tasks, TaskStatusCounter
+from .search import install_search_index
+from .shards import shard_for
+
+
+def install_database_objects(sender, using, **kwargs):
+    """
+    Create the SQL objects Django migrations do not manage (FTS table, triggers).
+
+    Connected to ``post_migrate`` for the tasks app, so it runs on every
+    ``migrate`` and when the test database is created.
+    """
+    if not router.allow_migrate_model(using, Tasks):
+        return
+    install_search_index(using)
+    install_counter_triggers(using)
+    install_change_triggers(using)
+
+
+def invalidate_cached_responses(sender, instance, using, **kwargs):
+    """Make the cached responses of a saved or deleted task's owner stale; see tasks.cache."""
+    invalidate_owner(instance.owner_id, using)
+
+
+def release_sharded_tasks(sender, instance, using, **kwargs):
+    """
+    Apply the ``on_delete`` rules of a deleted user's task rows when they
+    live in another shard, where Django's cascade does not reach.
+    """
+    shard = shard_for(instance)
+    if shard == using:
+        return
+    with transaction.atomic(using=shard):
+        TaskChange.objects.using(shard).filter(owner_id=instance.pk).delete()
+        TaskStatusCounter.objects.using(shard).filter(owner_id=instance.pk).delete()
+        Tasks.objects.using(shard).filter(owner_id=instance.pk).update(owner=None)
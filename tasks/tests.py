@@ -1,3 +1,1501 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+import uuid
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import connection, router, transaction
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from task_manager.replicas import PIN_COOKIE, ReplicaPinMiddleware
+from task_manager.rows import compile_row_serializer
+from task_manager.sqlite3.base import DatabaseWrapper
+from task_manager.testing import QueryBudgetTestCase
+
+from .conditional import EditConflict, task_etag
+from .importers import TaskImporter
+from .models import TaskChange, TaskReminder, Tasks, TaskStatusCounter
+from .rebalance import move_owners
+from .reminders import OWNER_CHUNK, _digests, due_tasks, send_reminders
+from .serializers import TaskSerializer
+from .shards import hash_shard, task_shards
+
+User = get_user_model()
+
+# Tests of the task features set up and check rows through ``Tasks.objects``,
+# which is not routed to the owner's shard: keep every task in ``default``
+# even when SQLITE_TASK_SHARDS is set. TaskShardTests covers the shards.
+one_task_database = override_settings(TASK_SHARDS=["default"])
+
+
+def cursor_of(link):
+    return parse_qs(urlparse(link).query)["cursor"][0]
+
+
+@one_task_database
+class TaskPaginationTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="owner@example.com",
+            password="testpassword123",
+            first_name="Task",
+            last_name="Owner",
+        )
+        self.client.force_authenticate(user=self.user)
+        now = timezone.now()
+        for index in range(7):
+            task = Tasks.objects.create(title=f"Task {index}", owner=self.user)
+            # Tasks 2, 3 and 4 share a timestamp so the id tie-breaker is exercised.
+            updated_at = now - timedelta(minutes=3 if 2 <= index <= 4 else index)
+            Tasks.objects.filter(pk=task.pk).update(updated_at=updated_at)
+        self.expected = [
+            str(pk) for pk in Tasks.objects.order_by("-updated_at", "-id").values_list("pk", flat=True)
+        ]
+        self.url = reverse("task-list")
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(task["id"] for task in response.data["results"])
+            url = response.data[link]
+        return ids
+
+    def test_forward_pages_cover_every_task_once(self):
+        ids = self.walk(f"{self.url}?page_size=3", "next")
+        self.assertEqual(ids, self.expected)
+
+    def test_previous_link_returns_the_preceding_page(self):
+        first = self.client.get(f"{self.url}?page_size=3")
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual(
+            [task["id"] for task in back.data["results"]],
+            [task["id"] for task in first.data["results"]],
+        )
+        self.assertIsNone(first.data["previous"])
+
+    def test_insert_between_pages_does_not_shift_following_page(self):
+        first = self.client.get(f"{self.url}?page_size=3")
+        Tasks.objects.create(title="Newest", owner=self.user)
+        second = self.client.get(first.data["next"])
+        self.assertEqual(
+            [task["id"] for task in second.data["results"]], self.expected[3:6]
+        )
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_only_own_tasks_are_listed(self):
+        other = User.objects.create_user(
+            email="other@example.com",
+            password="testpassword123",
+            first_name="Other",
+            last_name="Owner",
+        )
+        Tasks.objects.create(title="Not mine", owner=other)
+        response = self.client.get(self.url, {"page_size": 50})
+        self.assertEqual(len(response.data["results"]), len(self.expected))
+        self.assertIsNone(response.data["next"])
+
+
+@one_task_database
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class TaskQueryPlanTests(APITestCase):
+    """
+    Every query issued by TaskViewSet must be answered through an index.
+
+    SQLite reports a full table read as ``SCAN tasks_tasks``; a composite
+    index that no longer matches an access pattern shows up here long
+    before the table is large enough for anyone to notice.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="planner@example.com",
+            password="testpassword123",
+            first_name="Query",
+            last_name="Planner",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tasks = [
+            Tasks.objects.create(title=f"Task {index}", owner=self.user)
+            for index in range(5)
+        ]
+
+    def assertIndexedQueries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400, response.content)
+        table_scan = re.compile(rf"SCAN {Tasks._meta.db_table}\b(?!_)")
+        checked = 0
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if Tasks._meta.db_table not in sql or sql.lstrip().upper().startswith("INSERT"):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            scans = [step for step in plan if table_scan.match(step)]
+            self.assertEqual(scans, [], f"table scan for {sql!r}: {plan}")
+            checked += 1
+        self.assertGreater(checked, 0)
+        return response
+
+    def test_list(self):
+        response = self.assertIndexedQueries("get", reverse("task-list"), {"page_size": 2})
+        self.assertIndexedQueries("get", response.data["next"])
+
+    def test_list_filtered_by_status(self):
+        self.assertIndexedQueries("get", reverse("task-list"), {"status": "pending"})
+
+    def test_list_filtered_by_title(self):
+        self.assertIndexedQueries("get", reverse("task-list"), {"title": "Task 1"})
+
+    def test_list_search(self):
+        self.assertIndexedQueries("get", reverse("task-list"), {"search": "task"})
+
+    def test_retrieve(self):
+        self.assertIndexedQueries("get", reverse("task-detail", args=[self.tasks[0].pk]))
+
+    def test_partial_update(self):
+        self.assertIndexedQueries(
+            "patch", reverse("task-detail", args=[self.tasks[0].pk]), {"status": "completed"}
+        )
+
+    def test_destroy(self):
+        self.assertIndexedQueries("delete", reverse("task-detail", args=[self.tasks[0].pk]))
+
+    def test_dashboard(self):
+        self.assertIndexedQueries("get", reverse("task-dashboard"))
+
+
+@one_task_database
+class TaskSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="searcher@example.com",
+            password="testpassword123",
+            first_name="Task",
+            last_name="Searcher",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("task-list")
+        self.invoice = Tasks.objects.create(
+            title="Send invoice", description="Invoice for the March invoice run", owner=self.user
+        )
+        self.report = Tasks.objects.create(
+            title="Write report", description="Mention the invoice total", owner=self.user
+        )
+        Tasks.objects.create(title="Water plants", owner=self.user)
+
+    def search(self, term):
+        response = self.client.get(self.url, {"search": term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task["id"] for task in response.data["results"]]
+
+    def test_matches_title_and_description_by_relevance(self):
+        self.assertEqual(self.search("invoice"), [str(self.invoice.pk), str(self.report.pk)])
+
+    def test_prefix_and_accent_insensitive_match(self):
+        Tasks.objects.create(title="Réunion équipe", owner=self.user)
+        self.assertEqual(len(self.search("reun")), 1)
+
+    def test_fts_operators_are_matched_literally(self):
+        self.assertEqual(self.search('invoice" OR "plants'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.report.description = "Nothing to see"
+        self.report.save()
+        self.invoice.delete()
+        self.assertEqual(self.search("invoice"), [])
+        self.assertEqual(self.search("nothing"), [str(self.report.pk)])
+
+    def test_results_are_owner_scoped(self):
+        other = User.objects.create_user(
+            email="neighbour@example.com",
+            password="testpassword123",
+            first_name="Other",
+            last_name="Owner",
+        )
+        Tasks.objects.create(title="Invoice", owner=other)
+        self.assertEqual(len(self.search("invoice")), 2)
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 is SQLite specific")
+    def test_rebuild_command_restores_the_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO tasks_tasks_fts(tasks_tasks_fts) VALUES ('delete-all')")
+        self.assertEqual(self.search("invoice"), [])
+        call_command("rebuild_task_search_index", stdout=StringIO())
+        self.assertEqual(len(self.search("invoice")), 2)
+
+
+@one_task_database
+class TaskBulkTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="sync@example.com",
+            password="testpassword123",
+            first_name="Bulk",
+            last_name="Sync",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("task-bulk")
+        self.existing = [
+            Tasks.objects.create(title=f"Existing {index}", owner=self.user) for index in range(3)
+        ]
+
+    def test_applies_every_operation(self):
+        payload = {
+            "create": [{"title": "New A"}, {"title": "New B", "status": "in progress"}],
+            "update": [{"id": str(self.existing[0].pk), "status": "completed"}],
+            "delete": [str(self.existing[1].pk), str(uuid.uuid4())],
+        }
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([task["title"] for task in response.data["create"]], ["New A", "New B"])
+        self.assertEqual(response.data["update"][0]["status"], "completed")
+        self.assertEqual([item["deleted"] for item in response.data["delete"]], [True, False])
+        self.assertEqual(
+            set(Tasks.objects.filter(owner=self.user).values_list("title", flat=True)),
+            {"Existing 0", "Existing 2", "New A", "New B"},
+        )
+        self.existing[0].refresh_from_db()
+        self.assertEqual(self.existing[0].status, "completed")
+        self.assertEqual(self.existing[0].title, "Existing 0")
+
+    def test_large_sync_uses_a_handful_of_queries(self):
+        payload = {
+            "create": [{"title": f"Synced {index}"} for index in range(1000)],
+            "update": [{"id": str(task.pk), "title": "Renamed"} for task in self.existing],
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(len(context.captured_queries), 20)
+        self.assertEqual(Tasks.objects.filter(owner=self.user).count(), 1003)
+
+    def test_invalid_item_rolls_back_the_whole_batch(self):
+        payload = {
+            "create": [{"title": "Valid"}, {"title": "Late", "due_date": "2000-01-01"}],
+            "delete": [str(self.existing[0].pk)],
+        }
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["create"][0], {})
+        self.assertIn("due_date", response.data["create"][1])
+        self.assertEqual(Tasks.objects.filter(owner=self.user).count(), 3)
+
+    def test_cannot_update_tasks_of_another_user(self):
+        other = User.objects.create_user(
+            email="victim@example.com",
+            password="testpassword123",
+            first_name="Other",
+            last_name="Owner",
+        )
+        foreign = Tasks.objects.create(title="Foreign", owner=other)
+        payload = {
+            "create": [{"title": "Should not persist"}],
+            "update": [{"id": str(foreign.pk), "title": "Hijacked"}],
+        }
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["update"][0]["id"], ["Task not found."])
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.title, "Foreign")
+        self.assertFalse(Tasks.objects.filter(title="Should not persist").exists())
+
+
+@one_task_database
+class TaskStatusCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="counted@example.com",
+            password="testpassword123",
+            first_name="Counted",
+            last_name="Owner",
+        )
+        self.other = User.objects.create_user(
+            email="other-counted@example.com",
+            password="testpassword123",
+            first_name="Other",
+            last_name="Owner",
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def counters(self, owner):
+        return dict(
+            TaskStatusCounter.objects.filter(owner=owner, count__gt=0).values_list("status", "count")
+        )
+
+    def expected(self, owner):
+        return dict(
+            Tasks.objects.filter(owner=owner).values("status").annotate(count=Count("pk")).values_list("status", "count")
+        )
+
+    def test_counters_follow_every_write_path(self):
+        task = Tasks.objects.create(title="One", owner=self.user)
+        Tasks.objects.bulk_create([Tasks(title=f"Bulk {index}", owner=self.user) for index in range(3)])
+        task.status = "completed"
+        task.save()
+        Tasks.objects.filter(title="Bulk 0").update(status="in progress")
+        Tasks.objects.filter(title="Bulk 1").update(owner=self.other)
+        Tasks.objects.filter(title="Bulk 2").delete()
+        self.client.post(
+            reverse("task-bulk"),
+            {"create": [{"title": "Synced"}], "update": [{"id": str(task.pk), "status": "pending"}]},
+            format="json",
+        )
+        self.assertEqual(self.counters(self.user), self.expected(self.user))
+        self.assertEqual(self.counters(self.other), {"pending": 1})
+
+    def test_dashboard_reads_counters(self):
+        Tasks.objects.create(title="Todo", owner=self.user)
+        Tasks.objects.create(title="Done", owner=self.user, status="completed")
+        Tasks.objects.create(title="Not mine", owner=self.other)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("task-dashboard"))
+        self.assertEqual(response.data["total_tasks"], 2)
+        self.assertEqual(
+            response.data["status_distribution"],
+            [{"status": "completed", "count": 1}, {"status": "pending", "count": 1}],
+        )
+
+    def test_reconcile_command_repairs_drift(self):
+        Tasks.objects.create(title="Todo", owner=self.user)
+        TaskStatusCounter.objects.filter(owner=self.user).update(count=42)
+        call_command("reconcile_task_counters", stdout=StringIO())
+        self.assertEqual(self.counters(self.user), {"pending": 1})
+
+
+# The validators themselves, without the response cache answering first.
+@one_task_database
+@override_settings(TASK_RESPONSE_CACHE_TTL=0)
+class TaskConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="poller@example.com",
+            password="testpassword123",
+            first_name="Polling",
+            last_name="Client",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Tasks.objects.create(title="Polled", owner=self.user)
+        self.other_task = Tasks.objects.create(title="Also polled", owner=self.user)
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_list_is_not_modified(self):
+        url = reverse("task-list")
+        first = self.client.get(url)
+        self.assertTrue(first.has_header("Last-Modified"))
+        with self.assertNumQueries(1):
+            second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_list_etag_changes_on_update_delete_and_filters(self):
+        url = reverse("task-list")
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first, status="pending").status_code, status.HTTP_200_OK)
+
+        self.other_task.delete()
+        self.assertEqual(self.revalidate(url, first).status_code, status.HTTP_200_OK)
+
+        second = self.client.get(url)
+        self.task.title = "Renamed"
+        self.task.save()
+        self.assertEqual(self.revalidate(url, second).status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since_on_list(self):
+        url = reverse("task-list")
+        first = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_is_not_modified_until_the_task_changes(self):
+        url = reverse("task-detail", args=[self.task.pk])
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.task.status = "completed"
+        self.task.save()
+        self.assertEqual(self.revalidate(url, first).status_code, status.HTTP_200_OK)
+
+    def test_dashboard_etag(self):
+        url = reverse("task-dashboard")
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, status.HTTP_304_NOT_MODIFIED)
+        Tasks.objects.create(title="New", owner=self.user)
+        self.assertEqual(self.revalidate(url, first).status_code, status.HTTP_200_OK)
+
+
+@one_task_database
+@override_settings(TASK_RESPONSE_CACHE_TTL=300)
+class TaskResponseCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="cached@example.com",
+            password="testpassword123",
+            first_name="Cached",
+            last_name="Reader",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Tasks.objects.create(title="Cached", owner=self.user)
+        self.list_url = reverse("task-list")
+        self.detail_url = reverse("task-detail", args=[self.task.pk])
+
+    def get(self, url, *args, **kwargs):
+        response = self.client.get(url, *args, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_repeated_reads_are_served_from_the_cache(self):
+        for url in (self.list_url, self.detail_url, reverse("task-dashboard")):
+            first = self.get(url)
+            self.assertEqual(first["X-Cache"], "MISS")
+            with self.assertNumQueries(0):
+                second = self.get(url)
+            self.assertEqual(second["X-Cache"], "HIT")
+            self.assertEqual(second.data, first.data)
+            self.assertEqual(second["ETag"], first["ETag"])
+            with self.assertNumQueries(0):
+                revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_key_is_the_normalized_query(self):
+        self.get(self.list_url, {"status": "pending", "title": "Cach"})
+        self.assertEqual(self.get(f"{self.list_url}?title=Cach&status=pending&search=")["X-Cache"], "HIT")
+        self.assertEqual(self.get(self.list_url, {"status": "completed"})["X-Cache"], "MISS")
+
+    def test_entries_are_per_user(self):
+        self.get(self.list_url)
+        other = User.objects.create_user(
+            email="other-reader@example.com",
+            password="testpassword123",
+            first_name="Other",
+            last_name="Reader",
+        )
+        self.client.force_authenticate(user=other)
+        response = self.get(self.list_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"], [])
+
+    def test_writes_invalidate_the_owners_entries(self):
+        writes = [
+            lambda: Tasks.objects.create(title="Created", owner=self.user),
+            lambda: self.client.patch(self.detail_url, {"status": "completed"}, format="json"),
+            lambda: self.client.post(
+                reverse("task-bulk"), {"create": [{"title": "Bulk"}]}, format="json"
+            ),
+            lambda: self.client.post(
+                reverse("task-import-tasks"),
+                {"file": SimpleUploadedFile("tasks.csv", b"title\nImported\n")},
+                format="multipart",
+            ),
+            lambda: Tasks.objects.filter(title="Created").get().delete(),
+        ]
+        for write in writes:
+            before = [self.get(url).data for url in (self.list_url, self.detail_url, reverse("task-dashboard"))]
+            write()
+            after = [self.get(url) for url in (self.list_url, self.detail_url, reverse("task-dashboard"))]
+            self.assertEqual([response["X-Cache"] for response in after], ["MISS"] * 3)
+            self.assertNotEqual(after[0].data, before[0])
+        self.assertEqual(after[1].data["status"], "completed")
+
+    def test_generation_is_bumped_again_on_commit(self):
+        self.get(self.list_url)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            with transaction.atomic():
+                Tasks.objects.create(title="Pending commit", owner=self.user)
+                # A read between the write and the commit is cached...
+                self.get(self.list_url)
+        self.assertEqual(self.get(self.list_url)["X-Cache"], "HIT")
+        # ...until the commit bumps the generation once more.
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.get(self.list_url)["X-Cache"], "MISS")
+
+    def test_repair_commands_invalidate(self):
+        self.get(self.list_url)
+        call_command("reconcile_task_counters", stdout=StringIO())
+        self.assertEqual(self.get(self.list_url)["X-Cache"], "MISS")
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location}
+            with override_settings(CACHES={"default": backend}):
+                self.assertEqual(self.get(self.detail_url)["X-Cache"], "MISS")
+                self.assertEqual(self.get(self.detail_url)["X-Cache"], "HIT")
+                self.task.title = "Renamed"
+                self.task.save()
+                response = self.get(self.detail_url)
+                self.assertEqual((response["X-Cache"], response.data["title"]), ("MISS", "Renamed"))
+                self.assertTrue(os.listdir(location))
+
+    @override_settings(TASK_RESPONSE_CACHE_TTL=0)
+    def test_disabled(self):
+        self.get(self.list_url)
+        self.assertNotIn("X-Cache", self.get(self.list_url))
+
+    def test_stats(self):
+        self.assertEqual(self.client.get(reverse("task-cache-stats")).status_code, status.HTTP_403_FORBIDDEN)
+        admin = User.objects.create_superuser(
+            email="cache-admin@example.com",
+            password="testpassword123",
+            first_name="Cache",
+            last_name="Admin",
+        )
+        self.client.force_authenticate(user=admin)
+        before = self.get(reverse("task-cache-stats")).data
+        self.client.force_authenticate(user=self.user)
+        for _ in range(3):
+            self.get(self.detail_url)
+        self.client.force_authenticate(user=admin)
+        stats = self.get(reverse("task-cache-stats")).data
+        self.assertEqual(stats["retrieve"]["hits"] - before["retrieve"]["hits"], 2)
+        self.assertEqual(stats["retrieve"]["misses"] - before["retrieve"]["misses"], 1)
+        self.assertEqual(
+            stats["total"]["hits"],
+            sum(stats[endpoint]["hits"] for endpoint in ("list", "retrieve", "dashboard")),
+        )
+        self.assertEqual(
+            stats["retrieve"]["hit_ratio"],
+            round(stats["retrieve"]["hits"] / (stats["retrieve"]["hits"] + stats["retrieve"]["misses"]), 4),
+        )
+
+
+@one_task_database
+class TaskChangesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="mobile@example.com",
+            password="testpassword123",
+            first_name="Mobile",
+            last_name="Client",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("task-changes")
+        self.kept = Tasks.objects.create(title="Kept", owner=self.user)
+        self.removed = Tasks.objects.create(title="Removed", owner=self.user)
+
+    def sync(self, since=None, **params):
+        if since:
+            params["since"] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def test_initial_sync_returns_every_task(self):
+        data = self.sync()
+        self.assertEqual([change["id"] for change in data["changes"]], [str(self.kept.pk), str(self.removed.pk)])
+        self.assertEqual(data["changes"][0]["task"]["title"], "Kept")
+        self.assertFalse(data["has_more"])
+
+    def test_incremental_sync_returns_updates_and_tombstones_only(self):
+        cursor = self.sync()["next"]
+        Tasks.objects.create(title="Unrelated", owner=User.objects.create_user(
+            email="someone@example.com", password="testpassword123", first_name="Some", last_name="One",
+        ))
+        self.kept.status = "completed"
+        self.kept.save()
+        removed_id = str(self.removed.pk)
+        self.removed.delete()
+
+        changes = self.sync(cursor)["changes"]
+        self.assertEqual(
+            [(change["id"], change["deleted"]) for change in changes],
+            [(str(self.kept.pk), False), (removed_id, True)],
+        )
+        self.assertEqual(changes[0]["task"]["status"], "completed")
+        self.assertIsNone(changes[1]["task"])
+
+    def test_bulk_writes_are_recorded(self):
+        cursor = self.sync()["next"]
+        self.client.post(
+            reverse("task-bulk"),
+            {"create": [{"title": "Bulk"}], "delete": [str(self.kept.pk)]},
+            format="json",
+        )
+        changes = self.sync(cursor)["changes"]
+        self.assertEqual(sorted(change["deleted"] for change in changes), [False, True])
+
+    def test_pages_follow_the_change_sequence(self):
+        first = self.sync(limit=1)
+        self.assertTrue(first["has_more"])
+        second = self.sync(first["next"], limit=1)
+        self.assertEqual(second["changes"][0]["id"], str(self.removed.pk))
+        self.assertFalse(second["has_more"])
+        self.assertEqual(self.sync(second["next"])["changes"], [])
+
+    def test_cursor_older_than_retention_is_gone(self):
+        cursor = self.sync()["next"]
+        with self.settings(TASK_TOMBSTONE_RETENTION_DAYS=0):
+            response = self.client.get(self.url, {"since": cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_compaction_removes_old_tombstones_only(self):
+        self.removed.delete()
+        TaskChange.objects.filter(deleted=True).update(changed_at=timezone.now() - timedelta(days=90))
+        call_command("compact_task_tombstones", stdout=StringIO())
+        self.assertEqual(list(TaskChange.objects.values_list("task_id", flat=True)), [self.kept.pk])
+
+    def test_deleting_an_owner_leaves_no_dangling_rows(self):
+        self.user.delete()
+        connection.check_constraints()
+        self.assertFalse(TaskChange.objects.exists())
+        self.assertFalse(TaskStatusCounter.objects.exists())
+        self.assertEqual(Tasks.objects.filter(owner__isnull=True).count(), 2)
+
+
+@one_task_database
+class TaskExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="analyst@example.com",
+            password="testpassword123",
+            first_name="Data",
+            last_name="Analyst",
+        )
+        self.admin = User.objects.create_superuser(
+            email="admin-export@example.com",
+            password="adminpassword123",
+            first_name="Admin",
+            last_name="User",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("task-export")
+        Tasks.objects.create(title="Mine", description="héllo, \"quoted\"", owner=self.user)
+        Tasks.objects.create(title="Admin's", owner=self.admin)
+
+    def content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content)
+
+    def test_ndjson_export_of_own_tasks(self):
+        lines = self.content(self.client.get(self.url)).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row["title"], "Mine")
+        self.assertEqual(row["owner"], str(self.user.pk))
+
+    def test_csv_export_with_gzip(self):
+        response = self.client.get(self.url, {"output": "csv", "compress": "gzip"}, HTTP_ACCEPT="text/csv")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        rows = list(csv.DictReader(StringIO(gzip.decompress(self.content(response)).decode())))
+        self.assertEqual([row["description"] for row in rows], ['héllo, "quoted"'])
+
+    def test_all_users_export_is_admin_only(self):
+        response = self.client.get(self.url, {"owner": "all"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        lines = self.content(self.client.get(self.url, {"owner": "all"})).splitlines()
+        self.assertEqual(len(lines), 2)
+        lines = self.content(self.client.get(self.url, {"owner": str(self.user.pk)})).splitlines()
+        self.assertEqual(len(lines), 1)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(self.url, {"output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@one_task_database
+class TaskImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="importer@example.com",
+            password="testpassword123",
+            first_name="Bulk",
+            last_name="Importer",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("task-import-tasks")
+
+    def upload(self, name, content, **data):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(self.url, {"file": upload, **data}, format="multipart")
+
+    def test_csv_import_reports_rejected_rows(self):
+        content = (
+            "title,description,due_date,status\n"
+            "First,,,\n"
+            ",Missing title,,\n"
+            "Late,,2000-01-01,\n"
+            "Started,Going,,in progress\n"
+        )
+        response = self.upload("tasks.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["imported"], response.data["failed"]), (2, 2))
+        self.assertEqual([error["line"] for error in response.data["errors"]], [3, 4])
+        self.assertIn("due_date", response.data["errors"][1]["errors"])
+        self.assertEqual(
+            dict(Tasks.objects.filter(owner=self.user).values_list("title", "status")),
+            {"First": "pending", "Started": "in progress"},
+        )
+
+    def test_ndjson_import_in_small_batches(self):
+        lines = [json.dumps({"title": f"Task {index}"}) for index in range(25)] + ["not json"]
+        with open(self.tmp_file("tasks.ndjson", "\n".join(lines)), "rb") as stream:
+            report = TaskImporter(self.user, batch_size=10).run(stream, "ndjson")
+        self.assertEqual((report["imported"], report["failed"]), (25, 1))
+        self.assertEqual(report["errors"][0]["line"], 26)
+        self.assertEqual(Tasks.objects.filter(owner=self.user).count(), 25)
+
+    def test_unreadable_lines_are_reported(self):
+        content = "title,description\nCafé,latin-1\nFine,\n".encode("latin-1")
+        response = self.client.post(
+            self.url, {"file": SimpleUploadedFile("tasks.csv", content)}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["imported"], response.data["failed"]), (1, 1))
+        self.assertEqual(response.data["errors"][0]["line"], 2)
+
+        content = b'{"title": "Ok"}\n{"title": "caf\xe9"}\n'
+        response = self.client.post(
+            self.url, {"file": SimpleUploadedFile("tasks.ndjson", content)}, format="multipart"
+        )
+        self.assertEqual((response.data["imported"], response.data["failed"]), (1, 1))
+        self.assertEqual(response.data["errors"][0]["line"], 2)
+
+    def test_oversized_csv_field_is_reported(self):
+        content = f"title,description\nHuge,{'x' * (csv.field_size_limit() + 1)}\nAfter,\n"
+        response = self.upload("tasks.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["imported"], response.data["failed"]), (1, 1))
+        self.assertEqual(response.data["errors"][0]["line"], 2)
+        self.assertIn("Malformed CSV", response.data["errors"][0]["errors"]["non_field_errors"][0])
+        self.assertTrue(Tasks.objects.filter(owner=self.user, title="After").exists())
+
+    def test_management_command(self):
+        path = self.tmp_file("backlog.csv", "title\nOne\nTwo\n")
+        call_command("import_tasks", path, owner=self.user.email, stdout=StringIO())
+        self.assertEqual(Tasks.objects.filter(owner=self.user).count(), 2)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.upload("tasks.xlsx", "title\nOne\n")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def tmp_file(self, name, content):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, "w") as handle:
+            handle.write(content)
+        return path
+
+
+@one_task_database
+class TaskListRenderingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="reader@example.com",
+            password="testpassword123",
+            first_name="Fast",
+            last_name="Reader",
+        )
+        self.client.force_authenticate(user=self.user)
+        today = timezone.now().date()
+        Tasks.objects.create(title="Plain", owner=self.user)
+        Tasks.objects.create(
+            title="Dated",
+            description="ünïcode, \"quotes\" and </script>",
+            due_date=today + timedelta(days=3),
+            status="COMPLETED",
+            owner=self.user,
+        )
+        Tasks.objects.create(title="Empty description", description="", owner=self.user)
+
+    def test_rows_render_like_the_serializer(self):
+        columns, to_representation = compile_row_serializer(TaskSerializer)
+        self.assertEqual(list(columns), list(TaskSerializer.Meta.fields))
+        tasks = Tasks.objects.order_by("title")
+        rows = tasks.values(*columns)
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render([to_representation(row) for row in rows]),
+            renderer.render(TaskSerializer(tasks, many=True).data),
+        )
+
+    def test_list_response_is_unchanged(self):
+        response = self.client.get(reverse("task-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = TaskSerializer(Tasks.objects.order_by("-updated_at", "-id"), many=True).data
+        self.assertEqual(
+            JSONRenderer().render(response.data["results"]), JSONRenderer().render(expected)
+        )
+
+    def test_unsupported_fields_are_rejected(self):
+        class WithMethodField(serializers.ModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Tasks
+                fields = ["id", "label"]
+
+        with self.assertRaises(ImproperlyConfigured):
+            compile_row_serializer(WithMethodField)
+
+
+@one_task_database
+class TaskConcurrencyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="writer@example.com",
+            password="testpassword123",
+            first_name="Con",
+            last_name="Current",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Tasks.objects.create(title="Draft", owner=self.user)
+        self.url = reverse("task-detail", args=[self.task.pk])
+
+    def test_patch_is_a_single_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {"status": "completed"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "completed")
+        writes = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(writes), 1)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, "completed")
+        self.assertEqual(response["ETag"], task_etag(self.task))
+
+    def test_if_match_with_current_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.put(
+            self.url, {"title": "Final", "status": "pending"}, HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, "Final")
+
+    def test_stale_if_match_is_rejected(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.patch(self.url, {"title": "Someone else"})
+        response = self.client.patch(self.url, {"title": "Mine"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, "Someone else")
+
+    def test_write_racing_another_write_is_not_lost(self):
+        stale = Tasks.objects.get(pk=self.task.pk)
+        Tasks.objects.filter(pk=self.task.pk).update(
+            title="Concurrent", updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        serializer = TaskSerializer(stale, data={"status": "completed"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(EditConflict):
+            serializer.save()
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.status), ("Concurrent", "pending"))
+
+
+@one_task_database
+class TaskQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="budget@example.com",
+            password="testpassword123",
+            first_name="Query",
+            last_name="Budget",
+        )
+        self.authenticate(self.user)
+        for index, state in enumerate(["pending", "in_progress", "completed"] * 4):
+            Tasks.objects.create(title=f"Task {index}", status=state, owner=self.user)
+
+    def test_list(self):
+        self.assertWithinQueryBudget(self.client.get(reverse("task-list"), {"page_size": 5}))
+
+    def test_dashboard(self):
+        self.assertWithinQueryBudget(self.client.get(reverse("task-dashboard")))
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        response = self.client.get(reverse("task-dashboard"))
+        self.assertEqual(response["X-DB-Query-Count"], str(response.query_stats.count))
+        self.assertEqual(response["X-DB-Query-Budget"], "2")
+        self.assertEqual(response["X-DB-Duplicate-Queries"], "0")
+        self.assertIn("X-DB-Query-Time", response)
+
+
+@one_task_database
+class TaskAsyncViewTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="async@example.com",
+            password="testpassword123",
+            first_name="Async",
+            last_name="Owner",
+        )
+        self.other = User.objects.create_user(
+            email="async-other@example.com",
+            password="testpassword123",
+            first_name="Other",
+            last_name="Owner",
+        )
+        self.task = Tasks.objects.create(title="Write docs", status="in_progress", owner=self.user)
+        Tasks.objects.create(title="Review", owner=self.user)
+        self.foreign = Tasks.objects.create(title="Not mine", owner=self.other)
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.client.force_authenticate(user=self.user)
+        # The async views route from the event loop's context, where the
+        # default connection is not the test's transaction, so with
+        # SQLITE_REPLICAS set their reads would go to a replica that cannot
+        # see the test data: pin them to the primary.
+        self.async_client.cookies[PIN_COOKIE] = "1"
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse("async-task-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(response["WWW-Authenticate"].startswith("Bearer"))
+
+    async def test_list_matches_sync_route(self):
+        response = await self.async_client.get(
+            reverse("async-task-list"), {"status": "in_progress"}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = await sync_to_async(self.client.get)(reverse("task-list"), {"status": "in_progress"})
+        self.assertEqual(response.content, expected.content)
+
+    async def test_retrieve_and_revalidate(self):
+        url = reverse("async-task-detail", args=[self.task.pk])
+        response = await self.async_client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)["title"], "Write docs")
+        cached = await self.async_client.get(
+            url, headers={**self.headers, "If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        foreign = await self.async_client.get(
+            reverse("async-task-detail", args=[self.foreign.pk]), headers=self.headers
+        )
+        self.assertEqual(foreign.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_create(self):
+        response = await self.async_client.post(
+            reverse("async-task-list"),
+            {"title": "From ASGI", "status": "pending"},
+            content_type="application/json",
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task = await Tasks.objects.aget(pk=json.loads(response.content)["id"])
+        self.assertEqual(task.owner_id, self.user.pk)
+
+        invalid = await self.async_client.post(
+            reverse("async-task-list"), {"status": "pending"},
+            content_type="application/json", headers=self.headers,
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("title", json.loads(invalid.content))
+
+    async def test_dashboard_matches_sync_route(self):
+        response = await self.async_client.get(reverse("async-task-dashboard"), headers=self.headers)
+        expected = await sync_to_async(self.client.get)(reverse("task-dashboard"))
+        self.assertEqual(response.content, expected.content)
+
+
+@one_task_database
+class TaskReminderTests(APITestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.user = User.objects.create_user(
+            email="forgetful@example.com",
+            password="testpassword123",
+            first_name="Forgetful",
+            last_name="Owner",
+        )
+        self.other = User.objects.create_user(
+            email="busy@example.com",
+            password="testpassword123",
+            first_name="Busy",
+            last_name="Owner",
+        )
+        self.late = Tasks.objects.create(
+            title="Pay invoice", due_date=self.today - timedelta(days=2), owner=self.user
+        )
+        self.soon = Tasks.objects.create(
+            title="Book train", due_date=self.today + timedelta(days=1), owner=self.user
+        )
+        Tasks.objects.create(title="Plan holidays", due_date=self.today + timedelta(days=30), owner=self.user)
+        Tasks.objects.create(title="Done already", due_date=self.today - timedelta(days=1), status="completed", owner=self.user)
+        Tasks.objects.create(title="No deadline", owner=self.user)
+        Tasks.objects.create(title="Call back", due_date=self.today, owner=self.other)
+
+    def test_one_digest_per_owner_over_one_connection(self):
+        with mock.patch("tasks.reminders.get_connection", wraps=get_connection) as connect:
+            stats = send_reminders(today=self.today, lead_days=1)
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(stats, {"digests": 2, "tasks": 3, "failed": 0})
+        messages = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(set(messages), {"forgetful@example.com", "busy@example.com"})
+        body = messages["forgetful@example.com"].body
+        self.assertIn("Pay invoice", body)
+        self.assertIn("Book train", body)
+        self.assertNotIn("Plan holidays", body)
+        self.assertNotIn("Done already", body)
+        self.assertEqual(
+            set(TaskReminder.objects.values_list("task_id", "kind")),
+            {
+                (self.late.pk, TaskReminder.OVERDUE),
+                (self.soon.pk, TaskReminder.DUE_SOON),
+                (Tasks.objects.get(title="Call back").pk, TaskReminder.DUE_SOON),
+            },
+        )
+
+    def test_connection_is_reopened_after_a_failure(self):
+        connection = get_connection()
+        send = connection.send_messages
+        calls = []
+
+        def drop_first(messages):
+            calls.append(messages)
+            if len(calls) == 1:
+                raise OSError("Connection reset by peer")
+            return send(messages)
+
+        with mock.patch.object(connection, "send_messages", side_effect=drop_first), \
+                mock.patch.object(connection, "open", wraps=connection.open) as reopen:
+            stats = send_reminders(today=self.today, lead_days=1, connection=connection)
+        self.assertEqual((stats["digests"], stats["failed"]), (1, 1))
+        # Once by ``with connection``, once after the failure.
+        self.assertEqual(reopen.call_count, 2)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_reruns_are_idempotent(self):
+        send_reminders(today=self.today, lead_days=1)
+        mail.outbox.clear()
+        self.assertEqual(send_reminders(today=self.today, lead_days=1)["digests"], 0)
+        self.assertEqual(mail.outbox, [])
+
+        # A task that slips past its due date is reminded once more, as overdue.
+        stats = send_reminders(today=self.today + timedelta(days=2), lead_days=1)
+        self.assertEqual(stats["tasks"], 2)
+        messages = {message.to[0]: message.body for message in mail.outbox}
+        self.assertIn("Book train", messages["forgetful@example.com"])
+
+    def test_rescheduled_task_is_reminded_again(self):
+        send_reminders(today=self.today, lead_days=1)
+        mail.outbox.clear()
+        Tasks.objects.filter(pk=self.late.pk).update(due_date=self.today)
+        send_reminders(today=self.today, lead_days=1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Pay invoice", mail.outbox[0].body)
+
+    def test_owners_are_read_one_chunk_at_a_time(self):
+        owners = sorted([self.user.pk, self.other.pk])
+        with mock.patch("tasks.reminders._digests", wraps=_digests) as digests:
+            stats = send_reminders(today=self.today, lead_days=1, owner_chunk=1)
+        self.assertEqual(stats, {"digests": 2, "tasks": 3, "failed": 0})
+        self.assertEqual([call.args[0] for call in digests.call_args_list], [[owners[0]], [owners[1]]])
+
+    def test_owner_pages_use_an_index(self):
+        owners = due_tasks(self.today, 1).order_by("owner_id").values_list("owner_id", flat=True).distinct()
+        for page in (owners, owners.filter(owner_id__gt=self.user.pk)):
+            sql, params = page[:OWNER_CHUNK].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plan = " ".join(row[-1] for row in cursor.fetchall())
+            self.assertRegex(plan, r"SEARCH tasks_tasks USING INDEX task_(open|owner)_due_date_idx")
+
+    def test_command(self):
+        out = StringIO()
+        call_command("send_task_reminders", "--once", stdout=out)
+        self.assertIn("Sent 2 reminder digests", out.getvalue())
+
+
+@one_task_database
+class AdminChangeListTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            password="adminpassword123",
+            first_name="Admin",
+            last_name="User",
+        )
+        self.client.force_login(self.admin)
+
+    def add_owners(self, count, tasks_each=2):
+        for index in range(count):
+            owner = User.objects.create_user(
+                email=f"owner{User.objects.count()}@example.com",
+                password=None,
+                first_name="Owner",
+                last_name=str(index),
+            )
+            Tasks.objects.bulk_create(
+                Tasks(title=f"Task {n}", owner=owner) for n in range(tasks_each)
+            )
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries.captured_queries)
+
+    def test_changelists_have_no_n_plus_one(self):
+        for name in ("admin:tasks_tasks_changelist", "admin:accounts_user_changelist"):
+            self.add_owners(2)
+            _, few = self.changelist_queries(reverse(name))
+            self.add_owners(6)
+            _, more = self.changelist_queries(reverse(name))
+            self.assertEqual(few, more, name)
+
+    def test_user_task_count_column(self):
+        self.add_owners(2, tasks_each=3)
+        response, _ = self.changelist_queries(reverse("admin:accounts_user_changelist"))
+        counts = {user.email: user.task_count for user in response.context["cl"].result_list}
+        self.assertEqual(counts, {"admin@example.com": 0, "owner1@example.com": 3, "owner2@example.com": 3})
+
+    def test_counts_are_estimated(self):
+        self.add_owners(3)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Tasks._meta.db_table}")
+        response, _ = self.changelist_queries(reverse("admin:tasks_tasks_changelist"))
+        changelist = response.context["cl"]
+        self.assertEqual(changelist.result_count, 6)
+        self.assertFalse(changelist.show_full_result_count)
+
+        Tasks.objects.bulk_create(Tasks(title="Unanalyzed") for _ in range(4))
+        response, _ = self.changelist_queries(reverse("admin:tasks_tasks_changelist"))
+        self.assertEqual(response.context["cl"].result_count, 6)
+        response, _ = self.changelist_queries(reverse("admin:tasks_tasks_changelist") + "?status__exact=pending")
+        self.assertEqual(response.context["cl"].result_count, 10)
+
+    def test_search_uses_the_indexes(self):
+        self.add_owners(2)
+        Tasks.objects.create(title="Réunion budget", owner=self.admin)
+        response, _ = self.changelist_queries(reverse("admin:tasks_tasks_changelist") + "?q=reun")
+        self.assertEqual([task.title for task in response.context["cl"].result_list], ["Réunion budget"])
+        response, _ = self.changelist_queries(reverse("admin:accounts_user_changelist") + "?q=owner2")
+        self.assertEqual([user.email for user in response.context["cl"].result_list], ["owner2@example.com"])
+
+
+@one_task_database
+class SQLiteTuningTests(TransactionTestCase):
+    """BEGIN statements are only visible outside the test case transaction."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="writer@example.com",
+            password="testpassword123",
+            first_name="Task",
+            last_name="Writer",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def pragma(self, cursor, name):
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(self.pragma(cursor, "busy_timeout"), 5000)
+            self.assertEqual(self.pragma(cursor, "synchronous"), 1)  # NORMAL
+            self.assertEqual(self.pragma(cursor, "cache_size"), -64000)
+            self.assertEqual(self.pragma(cursor, "temp_store"), 2)  # MEMORY
+
+    def test_file_database_uses_wal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({**connection.settings_dict, "NAME": os.path.join(directory, "db.sqlite3")})
+            try:
+                with wrapper.cursor() as cursor:
+                    self.assertEqual(self.pragma(cursor, "journal_mode"), "wal")
+                    self.assertEqual(self.pragma(cursor, "mmap_size"), 256 * 1024 * 1024)
+            finally:
+                wrapper.close()
+
+    def test_invalid_options_are_rejected(self):
+        for options in (
+            {"transaction_mode": "LAZY"},
+            {"pragmas": {"journal_mode": "wal; DROP TABLE tasks_tasks"}},
+        ):
+            wrapper = DatabaseWrapper({**connection.settings_dict, "OPTIONS": options})
+            with self.subTest(options=options), self.assertRaises(ImproperlyConfigured):
+                wrapper.get_connection_params()
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                Tasks.objects.count()
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
+
+    def test_task_writes_run_in_short_transactions(self):
+        def statements(method, *args, **kwargs):
+            with CaptureQueriesContext(connection) as queries:
+                response = method(*args, format="json", **kwargs)
+            sql = [query["sql"].split()[0] for query in queries]
+            return response, sql[sql.index("BEGIN"):]
+
+        response, sql = statements(self.client.post, reverse("task-list"), {"title": "Write"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sql[-1], "COMMIT")
+        self.assertNotIn("SELECT", sql)
+
+        url = reverse("task-detail", args=[response.data["id"]])
+        response, sql = statements(self.client.patch, url, {"status": "completed"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sql, ["BEGIN", "UPDATE", "COMMIT"])
+
+        response, sql = statements(self.client.delete, url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(sql[-1], "COMMIT")
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_PIN_SECONDS=5)
+class ReadReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions only: ``QuerySet.db`` asks the routers without querying."""
+
+    def serve(self, method, write=False, cookies=None):
+        aliases = []
+
+        def view(request):
+            aliases.append(Tasks.objects.all().db)
+            if write:
+                router.db_for_write(Tasks)
+            aliases.append(Tasks.objects.all().db)
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)("/tasks/")
+        request.COOKIES.update(cookies or {})
+        return aliases, ReplicaPinMiddleware(view)(request)
+
+    def test_safe_requests_read_from_a_replica(self):
+        aliases, response = self.serve("get")
+        self.assertEqual(aliases, ["replica1", "replica1"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_unsafe_requests_use_the_primary(self):
+        aliases, response = self.serve("post", write=True)
+        self.assertEqual(aliases, ["default", "default"])
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+    def test_reads_after_a_write_use_the_primary(self):
+        aliases, response = self.serve("get", write=True)
+        self.assertEqual(aliases, ["replica1", "default"])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pin_cookie_keeps_reads_on_the_primary(self):
+        aliases, _ = self.serve("get", cookies={PIN_COOKIE: "1"})
+        self.assertEqual(aliases, ["default", "default"])
+
+    async def test_writes_from_the_async_orm_pin_the_request(self):
+        aliases = []
+
+        async def view(request):
+            aliases.append(Tasks.objects.all().db)
+            await sync_to_async(router.db_for_write)(Tasks)
+            aliases.append(Tasks.objects.all().db)
+            return HttpResponse()
+
+        response = await ReplicaPinMiddleware(view)(RequestFactory().get("/tasks/"))
+        self.assertEqual(aliases, ["replica1", "default"])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(Tasks.objects.all().db, "default")
+
+    def test_objects_read_from_a_replica_are_written_to_the_primary(self):
+        task = Tasks(title="Replica")
+        task._state.db = "replica1"
+        self.assertEqual(router.db_for_write(Tasks, instance=task), "default")
+        self.assertFalse(router.allow_migrate("replica1", "tasks", model_name="tasks"))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        aliases, response = self.serve("get", write=True)
+        self.assertEqual(aliases, ["default", "default"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class TaskShardHashTests(SimpleTestCase):
+    def test_owners_are_spread_and_stay_put(self):
+        owners = [uuid.UUID(int=index) for index in range(3000)]
+        with override_settings(TASK_SHARDS=["default", "tasks1", "tasks2"]):
+            before = {owner: hash_shard(owner) for owner in owners}
+            self.assertEqual(before, {owner: hash_shard(owner) for owner in owners})
+        counts = Counter(before.values())
+        self.assertTrue(all(800 < counts[alias] < 1200 for alias in ("default", "tasks1", "tasks2")), counts)
+
+        with override_settings(TASK_SHARDS=["default", "tasks1", "tasks2", "tasks3"]):
+            after = {owner: hash_shard(owner) for owner in owners}
+        # Adding a shard only moves owners to the new shard, about 1/4 of them.
+        moved = {owner for owner in owners if after[owner] != before[owner]}
+        self.assertEqual({after[owner] for owner in moved}, {"tasks3"})
+        self.assertTrue(600 < len(moved) < 900, len(moved))
+
+
+@skipUnless(len(task_shards()) > 1, "Set SQLITE_TASK_SHARDS to run the sharding tests.")
+class TaskShardTests(APITestCase):
+    databases = {"default", *task_shards()}
+
+    def setUp(self):
+        self.shard = task_shards()[1]
+        self.user = User.objects.create_user(
+            email="sharded@example.com",
+            password="testpassword123",
+            first_name="Sharded",
+            last_name="Owner",
+            task_shard=self.shard,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_requests_use_the_owners_shard(self):
+        response = self.client.post(reverse("task-list"), {"title": "On the shard"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = reverse("task-detail", args=[response.data["id"]])
+        self.assertEqual(self.client.patch(url, {"status": "completed"}, format="json").status_code, 200)
+        response = self.client.post(
+            reverse("task-bulk"), {"create": [{"title": "Bulk"}], "update": [], "delete": []}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(Tasks.objects.using(self.shard).filter(owner=self.user).count(), 2)
+        self.assertFalse(Tasks.objects.using("default").exists())
+        response = self.client.get(reverse("task-list"))
+        self.assertEqual({task["title"] for task in response.data["results"]}, {"On the shard", "Bulk"})
+        response = self.client.get(reverse("task-dashboard"))
+        self.assertEqual(response.data["total_tasks"], 2)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Tasks.objects.using(self.shard).count(), 1)
+
+    def test_rebalance_moves_an_owner(self):
+        self.user.task_shard = "default"
+        self.user.save(update_fields=["task_shard"])
+        tasks = [self.user.tasks.create(title=f"Task {index}", due_date=timezone.localdate()) for index in range(5)]
+        TaskReminder.objects.create(task=tasks[0], kind=TaskReminder.DUE_SOON, due_date=tasks[0].due_date)
+        ids = [task.pk for task in tasks]
+        tasks[1].delete()
+        cursor = self.client.get(reverse("task-changes")).data["next"]
+        tasks[2].title = "Renamed"
+        tasks[2].save()
+
+        call_command("rebalance_task_shards", owner=[self.user.email], to=self.shard, grace=0, stdout=StringIO())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.task_shard, self.shard)
+        for model in (Tasks, TaskChange, TaskStatusCounter, TaskReminder):
+            self.assertFalse(model.objects.using("default").exists(), model)
+        moved = Tasks.objects.using(self.shard).in_bulk()
+        self.assertEqual(set(moved), set(ids) - {ids[1]})
+        self.assertEqual(moved[tasks[2].pk].title, "Renamed")
+        self.assertEqual(
+            (moved[tasks[2].pk].created_at, moved[tasks[2].pk].updated_at),
+            (tasks[2].created_at, tasks[2].updated_at),
+        )
+        self.assertEqual(TaskReminder.objects.using(self.shard).get().task_id, tasks[0].pk)
+        self.assertEqual(self.client.get(reverse("task-dashboard")).data["total_tasks"], 4)
+
+        # A cursor from the old shard gets every change again, deletion included.
+        changes = self.client.get(reverse("task-changes"), {"since": cursor}).data["changes"]
+        self.assertEqual({change["id"] for change in changes}, set(map(str, ids)))
+        self.assertEqual([change["id"] for change in changes if change["deleted"]], [str(ids[1])])
+
+    def test_rebalance_catches_late_writes(self):
+        self.user.task_shard = "default"
+        self.user.save(update_fields=["task_shard"])
+        stale_user = User.objects.get(pk=self.user.pk)
+        self.user.tasks.create(title="Before")
+
+        def late_write(seconds):
+            # A process still holding the old copy of the user writes to the old shard.
+            stale_user.tasks.create(title="Late")
+
+        with mock.patch("tasks.rebalance.time.sleep", late_write):
+            move_owners([(self.user, self.shard)], grace=1)
+        titles = Tasks.objects.using(self.shard).values_list("title", flat=True)
+        self.assertEqual(sorted(titles), ["Before", "Late"])
+        self.assertFalse(Tasks.objects.using("default").exists())
+
+    def test_rebalance_keeps_deletions_made_on_the_target(self):
+        self.user.task_shard = "default"
+        self.user.save(update_fields=["task_shard"])
+        self.user.tasks.create(title="Keep")
+        self.user.tasks.create(title="Deleted after cut-over")
+
+        def delete_on_target(seconds):
+            # The owner, now served from the new shard, deletes a task.
+            self.user.tasks.get(title="Deleted after cut-over").delete()
+
+        with mock.patch("tasks.rebalance.time.sleep", delete_on_target):
+            move_owners([(self.user, self.shard)], grace=1)
+        titles = Tasks.objects.using(self.shard).values_list("title", flat=True)
+        self.assertEqual(list(titles), ["Keep"])
+        self.assertFalse(Tasks.objects.using("default").exists())
+
+    def test_admin_counts_tasks_in_each_shard(self):
+        admin = User.objects.create_superuser(
+            email="admin@example.com", password="adminpassword123", first_name="Admin", last_name="User",
+            task_shard="default",
+        )
+        self.user.tasks.create(title="Sharded")
+        admin.tasks.create(title="Default")
+        admin.tasks.create(title="Default")
+        self.client.force_login(admin)
+        response = self.client.get(reverse("admin:accounts_user_changelist"))
+        counts = {user.email: user.task_count for user in response.context["cl"].result_list}
+        self.assertEqual(counts, {"admin@example.com": 2, "sharded@example.com": 1})
+
+    def test_admin_lists_and_edits_tasks_of_each_shard(self):
+        admin = User.objects.create_superuser(
+            email="admin@example.com", password="adminpassword123", first_name="Admin", last_name="User",
+            task_shard="default",
+        )
+        task = self.user.tasks.create(title="Sharded")
+        admin.tasks.create(title="Default")
+        self.client.force_login(admin)
+        url = reverse("admin:tasks_tasks_changelist")
+
+        response = self.client.get(url)
+        self.assertEqual([task.title for task in response.context["cl"].result_list], ["Default"])
+        response = self.client.get(url, {"shard": self.shard})
+        self.assertEqual(
+            [(task.title, task.owner.email) for task in response.context["cl"].result_list],
+            [("Sharded", "sharded@example.com")],
+        )
+
+        change_url = reverse("admin:tasks_tasks_change", args=[task.pk])
+        self.assertEqual(self.client.get(change_url).status_code, status.HTTP_200_OK)
+        response = self.client.post(change_url, {"title": "Renamed", "description": "", "status": "pending"})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        task.refresh_from_db()
+        self.assertEqual((task.title, task.owner_id), ("Renamed", self.user.pk))
+        self.assertFalse(Tasks.objects.using("default").filter(title="Renamed").exists())
+
+    def test_deleting_a_user_releases_their_tasks(self):
+        self.user.tasks.create(title="Orphan")
+        self.user.delete()
+        self.assertIsNone(Tasks.objects.using(self.shard).get().owner_id)
+        self.assertFalse(TaskStatusCounter.objects.using(self.shard).exists())
+        self.assertFalse(TaskChange.objects.using(self.shard).exists())
@@ -1,17 +1,37 @@
+import uuid
+from django.db import transaction
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from django.core.exceptions import PermissionDenied
-from django.db.models import Count
 from rest_framework.permissions import IsAuthenticated
-from .models import Tasks
+from .models import Tasks, User
 from rest_framework.response import Response
 from .filters import TaskFilter
 from rest_framework import viewsets
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from drf_yasg import openapi
 from django_filters.rest_framework import DjangoFilterBackend
-from .serializers import TaskSerializer
+from .serializers import TaskSerializer, TaskBulkSerializer
+from .pagination import TaskPagination
+from .cache import response_cache
+from .counters import status_distribution
+from .shards import shard_for, task_databases
+from .changes import changes_since, decode_cursor, encode_cursor
+from .export import EXPORT_FORMATS, IgnoreClientContentNegotiation, stream_export
+from .importers import IMPORT_FORMATS, TaskImporter, detect_format
+from .conditional import (
+    EditConflict,
+    PreconditionFailed,
+    list_validators,
+    not_modified,
+    payload_etag,
+    set_validators,
+    task_etag,
+)
 from .constants import *
+from task_manager.rows import compile_row_serializer
 
 # Create your views here.
 
@@ -20,42 +40,86 @@ class TaskViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = TaskFilter
     serializer_class = TaskSerializer
+    pagination_class = TaskPagination
     permission_classes = [IsAuthenticated]
+    # Enforced by the test suite, see task_manager.middleware.
+    query_budgets = {"list": 3, "dashboard": 2}
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Tasks.objects.none()
         if not self.request.user.is_authenticated:
             raise PermissionDenied("You must be authenticated to access this resource.")
-        return Tasks.objects.filter(owner=self.request.user)
+        # Through the user, so the shard router reads from their shard.
+        return self.request.user.tasks.all()
 
     @swagger_auto_schema(operation_description="Create a task")
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(owner=self.request.user)
+        # Writes run in their own short transaction, after validation, so the
+        # insert and the rows its triggers maintain take the write lock once.
+        with transaction.atomic(using=shard_for(self.request.user)):
+            serializer.save(owner=self.request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    @swagger_auto_schema(operation_description="Update a task")
+    @swagger_auto_schema(
+        operation_description="Update a task",
+        manual_parameters=[
+            openapi.Parameter(
+                'If-Match',
+                openapi.IN_HEADER,
+                description="ETag de la tâche lue précédemment ; 412 si elle a été modifiée depuis",
+                type=openapi.TYPE_STRING
+            ),
+        ]
+    )
     def update(self, request, *args, **kwargs):
-        return super().update(request, *args, **kwargs)
-    
-    @swagger_auto_schema(operation_description="Partial Update of a task")
+        return self._conditional_update(request, partial=False)
+
+    @swagger_auto_schema(
+        operation_description="Partial Update of a task",
+        manual_parameters=[
+            openapi.Parameter(
+                'If-Match',
+                openapi.IN_HEADER,
+                description="ETag de la tâche lue précédemment ; 412 si elle a été modifiée depuis",
+                type=openapi.TYPE_STRING
+            ),
+        ]
+    )
     def partial_update(self, request, *args, **kwargs):
+        return self._conditional_update(request, partial=True)
+
+    def _conditional_update(self, request, partial):
         instance = self.get_object()
-        if instance.owner != self.request.user:
+        if instance.owner_id != self.request.user.pk:
             raise PermissionDenied("You can only update your tasks")
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
+        precondition = not_modified(request, task_etag(instance), instance.updated_at)
+        if precondition is not None:
+            return precondition
+
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return super().partial_update(request, *args, **kwargs)
-    
+        try:
+            with transaction.atomic(using=instance._state.db):
+                serializer.save()
+        except EditConflict:
+            # The row changed between our read and our write: with If-Match
+            # the client's version is stale too.
+            if "HTTP_IF_MATCH" in request.META:
+                raise PreconditionFailed()
+            raise
+        instance = serializer.instance
+        return set_validators(Response(serializer.data), task_etag(instance), instance.updated_at)
+
     @swagger_auto_schema(operation_description="Delete a task")
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        if instance.owner != self.request.user:
+        if instance.owner_id != self.request.user.pk:
             raise PermissionDenied("You can only delete your tasks")
-        instance.delete()
+        with transaction.atomic(using=instance._state.db):
+            instance.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @swagger_auto_schema(
@@ -73,29 +137,216 @@ class TaskViewSet(viewsets.ModelViewSet):
                 description="Rechercher par titre (partie ou totalité)",
                 type=openapi.TYPE_STRING
             ),
+            openapi.Parameter(
+                'search',
+                openapi.IN_QUERY,
+                description="Recherche plein texte dans le titre et la description, par pertinence",
+                type=openapi.TYPE_STRING
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
+        key, entry = response_cache.lookup(request, "list")
+        if entry is not None:
+            return response_cache.respond(request, entry)
+
         queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
+        etag, last_modified = list_validators(request, queryset)
+        cached = not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
+
+        # Listings are read-only: fetch plain rows and render them with the
+        # precompiled TaskSerializer representation instead of instantiating
+        # a model and a serializer per task.
+        columns, to_representation = compile_row_serializer(self.get_serializer_class())
+        keys = set(columns)
+        if self.paginator is not None:
+            keys.update(field.lstrip("-") for field in self.paginator.get_ordering(request, queryset, self))
+        rows = queryset.values(*keys)
+
+        page = self.paginate_queryset(rows)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            response = self.get_paginated_response([to_representation(row) for row in page])
+        else:
+            response = Response([to_representation(row) for row in rows])
+        return response_cache.store(key, response, etag, last_modified)
+
+    @swagger_auto_schema(operation_description="Retrieve a task")
+    def retrieve(self, request, *args, **kwargs):
+        key, entry = response_cache.lookup(request, "retrieve")
+        if entry is not None:
+            return response_cache.respond(request, entry)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        instance = self.get_object()
+        etag = task_etag(instance)
+        cached = not_modified(request, etag, instance.updated_at)
+        if cached is not None:
+            return cached
+
+        serializer = self.get_serializer(instance)
+        return response_cache.store(key, Response(serializer.data), etag, instance.updated_at)
     
 
     @action(detail=False, methods=["get"], url_path="dashboard")
     def dashboard(self, request):
-        user_tasks = self.get_queryset()
-        total_tasks = user_tasks.count()
+        key, entry = response_cache.lookup(request, "dashboard")
+        if entry is not None:
+            return response_cache.respond(request, entry)
+
+        distribution = status_distribution(self.request.user, using=self.get_queryset().db)
+        data = {
+            "total_tasks" : sum(row["count"] for row in distribution),
+            "status_distribution": distribution,
+        }
+        etag = payload_etag(data)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        return response_cache.store(key, Response(data), etag)
 
-        status_distribution = (
-            user_tasks.values("status").annotate(count=Count("status")).order_by("status")
-        )
+    @swagger_auto_schema(operation_description="Hit and miss counts of the task response cache (administrators)")
+    @action(detail=False, methods=["get"], url_path="cache-stats")
+    def cache_stats(self, request):
+        if not request.user.is_superuser:
+            raise PermissionDenied("Only administrators can read the cache statistics")
+        return Response(response_cache.stats())
+
+    @swagger_auto_schema(
+        operation_description="Create, update and delete tasks in a single transaction",
+        request_body=TaskBulkSerializer,
+    )
+    @action(detail=False, methods=["post"], url_path="bulk", serializer_class=TaskBulkSerializer)
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save(owner=self.request.user)
+        return Response(results, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Tasks created, updated or deleted since a sync cursor",
+        manual_parameters=[
+            openapi.Parameter(
+                'since',
+                openapi.IN_QUERY,
+                description="Curseur renvoyé par la synchronisation précédente (vide pour tout récupérer)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'limit',
+                openapi.IN_QUERY,
+                description="Nombre maximum de changements (max 1000)",
+                type=openapi.TYPE_INTEGER
+            ),
+        ]
+    )
+    @action(detail=False, methods=["get"], url_path="changes")
+    def changes(self, request):
+        sequence = decode_cursor(request.query_params.get("since"))
+        try:
+            limit = min(max(int(request.query_params.get("limit", 500)), 1), 1000)
+        except ValueError:
+            limit = 500
+
+        queryset = self.get_queryset()
+        rows, has_more = changes_since(request.user, sequence, limit, using=queryset.db)
+        tasks = queryset.in_bulk([row.task_id for row in rows if not row.deleted])
+
+        changes = []
+        for row in rows:
+            task = tasks.get(row.task_id)
+            changes.append({
+                "seq": row.pk,
+                "id": str(row.task_id),
+                # A task deleted after its change row was read is reported as deleted;
+                # its tombstone follows in a later page.
+                "deleted": task is None,
+                "task": TaskSerializer(task).data if task is not None else None,
+            })
 
         return Response({
-            "total_tasks" : total_tasks,
-            "status_distribution": status_distribution,
+            "changes": changes,
+            "next": encode_cursor(rows[-1].pk if rows else sequence),
+            "has_more": has_more,
         })
+
+    @swagger_auto_schema(
+        operation_description="Stream an export of tasks",
+        manual_parameters=[
+            openapi.Parameter(
+                'output',
+                openapi.IN_QUERY,
+                description="Format de l'export (ndjson, csv)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'compress',
+                openapi.IN_QUERY,
+                description="gzip pour compresser l'export à la volée",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'owner',
+                openapi.IN_QUERY,
+                description="Administrateurs : id d'un utilisateur, ou all pour tous les utilisateurs",
+                type=openapi.TYPE_STRING
+            ),
+        ]
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export",
+        content_negotiation_class=IgnoreClientContentNegotiation,
+    )
+    def export(self, request):
+        output = request.query_params.get("output", "ndjson")
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({"output": [f"Choose one of: {', '.join(EXPORT_FORMATS)}."]})
+        compress = request.query_params.get("compress") == "gzip"
+
+        owner = request.query_params.get("owner")
+        if owner is None:
+            queryset = self.get_queryset()
+        elif not request.user.is_superuser:
+            raise PermissionDenied("Only administrators can export other users' tasks")
+        elif owner == "all":
+            queryset = [Tasks.objects.using(alias) for alias in task_databases()]
+        else:
+            try:
+                user = User.objects.filter(pk=uuid.UUID(owner)).first()
+            except ValueError:
+                raise ValidationError({"owner": ["Expected a user id or 'all'."]})
+            queryset = user.tasks.all() if user is not None else Tasks.objects.none()
+
+        return stream_export(queryset, output=output, compress=compress)
+
+    @swagger_auto_schema(
+        operation_description="Import tasks from an uploaded CSV or NDJSON file",
+        manual_parameters=[
+            openapi.Parameter(
+                'file',
+                openapi.IN_FORM,
+                description="Fichier CSV ou NDJSON",
+                type=openapi.TYPE_FILE,
+                required=True
+            ),
+            openapi.Parameter(
+                'format',
+                openapi.IN_FORM,
+                description="csv ou ndjson (déduit de l'extension si absent)",
+                type=openapi.TYPE_STRING
+            ),
+        ]
+    )
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+    def import_tasks(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": ["No file was submitted."]})
+        input_format = request.data.get("format") or detect_format(upload.name)
+        if input_format not in IMPORT_FORMATS:
+            raise ValidationError({"format": [f"Choose one of: {', '.join(IMPORT_FORMATS)}."]})
+
+        report = TaskImporter(request.user).run(upload, input_format)
+        return Response(report, status=status.HTTP_200_OK)